@@ -2,23 +2,37 @@
 # Auteur : Yoann CURE
 # MIT Licence
 
-import copy
-import os
 import sys
 from functools import partial
-from inspect import signature, Parameter
 
 from PyQt6.QtCore import QCoreApplication
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QScrollArea, QWidget, QCheckBox, QSpinBox, QLabel, QDoubleSpinBox, \
-    QLineEdit, QComboBox, QApplication, QHBoxLayout, QPushButton, QFileDialog, QWidgetItem
-
-from example_class import ProcessImage
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QScrollArea, QWidget, QLabel, QComboBox, QApplication, \
+    QHBoxLayout, QPushButton, QFileDialog, QCheckBox, QMessageBox
+
+from attribute_model import AttributeTreeView
+from call_history_panel import CallHistoryPanel
+from change_tracker import ChangeTracker
+from class_schema import get_schema, own_attribute
+from field_editors import editor_for, NestedEditor, str_to_list  # str_to_list reste importable depuis ce module
+from instance_group import InstanceGroup, is_mixed, fill_missing
+from method_runner import MethodRunner, is_running
+from parameter_forms import ParameterForms
+from presets import save_preset, load_preset, mixed_attributes
+from run_profiling import RunProfiler
+from snapshot import History, take_snapshot
+
+# Au-delà de ce nombre d'attributs, la fenêtre utilise la vue virtualisée
+VIRTUALIZE_THRESHOLD = 200
+# Attente maximale des exécutions annulées à la fermeture de la fenêtre, en millisecondes
+STOP_RUNS_TIMEOUT_MS = 3000
 
 
 class DynamicConfigWindow(QDialog):
     app_initiated = False  # Variable de classe pour suivre si l'application a été initiée
 
-    def __init__(self, config_class, execute_method: bool = True):
+    def __init__(self, config_class, execute_method: bool = True, virtualized: bool = None,
+                 on_change=None, history=None, exec_dialog: bool = True):
         # Vérifier s'il existe déjà une QApplication
         app = QCoreApplication.instance()
 
@@ -29,11 +43,23 @@ class DynamicConfigWindow(QDialog):
 
         super().__init__()
         self.modified_config = None
+        self.run_names = {}
         self.config_class = config_class  # ajout de l'attribut config_class
-
-        self.original_config = copy.deepcopy(config_class) if not execute_method else None
-
-        self.setWindowTitle("Class GUI maker")
+        # Une liste ou un tuple d'instances d'une même classe est édité en une fois à travers un InstanceGroup
+        if isinstance(config_class, (list, tuple)):
+            config_class = InstanceGroup(config_class)
+
+        # Instantané des seuls attributs annotés pour pouvoir restaurer l'objet sur Cancel
+        self.snapshot = take_snapshot(config_class) if not execute_method else None
+        # Éditeurs des attributs indexés par chemin pointé ("config.angle"), avec l'objet qui porte l'attribut
+        self.attribute_editors = {}
+        self.editor_owners = {}
+        # Objet affiché par chaque section imbriquée déjà construite
+        self.section_objects = {}
+        self.param_editors = {}
+
+        self.setWindowTitle("Class GUI maker" if not isinstance(config_class, InstanceGroup)
+                            else f"Class GUI maker - {len(config_class)} instances")
 
         # Configuration de la disposition principale
         main_layout = QVBoxLayout(self)
@@ -50,128 +76,33 @@ class DynamicConfigWindow(QDialog):
         # Ajoutez un QLabel pour séparer les attributs de la classe
         attributes_title = QLabel("Attributes")
         attributes_title.setStyleSheet("font-weight: bold;")
-        scroll_content.layout().addWidget(attributes_title)
 
         self.config = config_class
-
-        for attr_name, attr_type in self.config.__annotations__.items():
-
-            # Exclure les attributs spéciaux et méthodes
-            if not attr_name.startswith("__") and not callable(getattr(self.config, attr_name)) and attr_name in self.config.__annotations__:
-                attr_value = getattr(self.config, attr_name)
-
-                if attr_type is bool:
-                    # Création d'une QCheckBox pour les booléens
-                    checkbox = QCheckBox(attr_name)
-                    checkbox.setChecked(attr_value)
-                    checkbox.stateChanged.connect(lambda state, attr_name=attr_name: setattr(self.config, attr_name, state == 2))
-                    scroll_content.layout().addWidget(checkbox)
-
-                elif attr_type is int:
-                    # Création d'une QSpinBox pour les entiers
-                    spinbox = QSpinBox()
-                    spinbox.setMinimum(-2147483648)
-                    spinbox.setMaximum(2147483647)
-                    spinbox.setSingleStep(1)
-                    spinbox.setValue(attr_value)
-                    spinbox.valueChanged.connect(lambda value, attr_name=attr_name: setattr(self.config, attr_name, value))
-                    scroll_content.layout().addWidget(QLabel(attr_name))
-                    scroll_content.layout().addWidget(spinbox)
-
-                elif attr_type is float:
-                    # Création d'une QDoubleSpinBox pour les flottants
-                    spinbox = QDoubleSpinBox()
-                    spinbox.setMinimum(-sys.float_info.max)
-                    spinbox.setMaximum(sys.float_info.max)
-                    spinbox.setSingleStep(0.1)
-                    spinbox.setValue(attr_value)
-                    spinbox.valueChanged.connect(lambda value, attr_name=attr_name: setattr(self.config, attr_name, value))
-                    scroll_content.layout().addWidget(QLabel(attr_name))
-                    scroll_content.layout().addWidget(spinbox)
-
-                elif attr_type is str:
-                    # Création d'un QLineEdit pour les chaînes de caractères
-                    line_edit = QLineEdit(attr_value)
-                    line_edit.textChanged.connect(lambda value, attr_name=attr_name: setattr(self.config, attr_name, value))
-                    scroll_content.layout().addWidget(QLabel(attr_name))
-                    scroll_content.layout().addWidget(line_edit)
-
-                elif isinstance(attr_value, (list, tuple)):
-                    # Création d'un QComboBox pour les listes et tuples
-                    combo_box = QComboBox()
-                    combo_box.setEditable(True)
-                    combo_box.addItems([str(i) for i in attr_value])
-
-                    # Connexion du signal editingFinished() pour mettre à jour l'élément sélectionné
-                    combo_box.lineEdit().editingFinished.connect(lambda c=combo_box: update_current_item(c))
-
-                    # Mise à jour de la connexion du signal currentTextChanged
-                    combo_box.currentTextChanged.connect(
-                        lambda value, attr_name=attr_name, c=combo_box: setattr(self.config, attr_name, str_to_list(
-                            value)) if c.hasFocus() else None)
-
-                    # Création d'un QHBoxLayout pour les boutons Ajouter et Supprimer
-                    buttons_layout = QHBoxLayout()
-
-                    # Création du bouton Ajouter
-                    add_button = QPushButton("+")
-                    add_button.clicked.connect(lambda _,
-                                c=combo_box: (c.insertItem(c.currentIndex() + 1, ""),
-                                c.setCurrentIndex(c.currentIndex() + 1)) if c.currentIndex() + 1 < c.count() else c.addItem(""))
-                    buttons_layout.addWidget(add_button)
-
-                    # Création du bouton Supprimer
-                    remove_button = QPushButton("-")
-                    remove_button.clicked.connect(
-                        lambda _, c=combo_box: c.removeItem(c.currentIndex()) if c.currentIndex() >= 0 else None)
-                    buttons_layout.addWidget(remove_button)
-
-                    # Ajout des widgets au layout principal
-                    scroll_content.layout().addWidget(QLabel(attr_name))
-                    scroll_content.layout().addWidget(combo_box)
-                    scroll_content.layout().addLayout(buttons_layout)
-
-                elif attr_type is 'filepath' or attr_type is os.path:
-                    # Créez un QLabel pour l'attribut
-                    label = QLabel(attr_name)
-
-                    # Créez un QLineEdit pour l'attribut
-                    line_edit = QLineEdit(attr_value)
-
-                    # Créez un QPushButton pour ouvrir un QFileDialog
-                    file_dialog_button = QPushButton("Browse")
-                    file_dialog_button.clicked.connect(partial(self.open_file_dialog, line_edit))
-
-                    # Créez un QHBoxLayout pour le QLineEdit et le QPushButton
-                    hbox_layout = QHBoxLayout()
-                    hbox_layout.addWidget(line_edit)
-                    hbox_layout.addWidget(file_dialog_button)
-
-                    # Connexion du signal pour mettre à jour l'attribut
-                    line_edit.textChanged.connect(
-                        lambda value, attr_name=attr_name: setattr(self.config, attr_name, value))
-
-                    # Ajoutez le QLabel et le QHBoxLayout au layout
-                    scroll_content.layout().addWidget(label)
-                    scroll_content.layout().addLayout(hbox_layout)
-
-                elif issubclass(attr_type, object):  # Vérifiez si attr_type est une classe
-                    # Création d'un QLabel pour l'attribut
-                    label = QLabel(attr_name)
-
-                    # Création d'un QPushButton pour ouvrir une nouvelle instance de DynamicConfigWindow
-                    config_button = QPushButton("Configure")
-                    config_button.clicked.connect(
-                        lambda _, attr_name=attr_name, attr_type=attr_type: self.open_dynamic_config_window(attr_name,
-                                                                                                            attr_type))
-
-                    # Création d'un QHBoxLayout pour le QLabel et le QPushButton
-                    hbox_layout = QHBoxLayout()
-                    hbox_layout.addWidget(label)
-                    hbox_layout.addWidget(config_button)
-
-                    # Ajout du QHBoxLayout au layout principal
-                    scroll_content.layout().addLayout(hbox_layout)
+        # Schéma d'introspection compilé une seule fois par classe et partagé entre les fenêtres
+        self.schema = get_schema(self.config)
+
+        # Historique d'annulation, partagé avec les sous-fenêtres des attributs imbriqués
+        self.history = history if history is not None else History()
+        self.history_mark = self.history.mark()
+
+        # Les modifications sont regroupées puis écrites sur l'instance, on_change reçoit chaque écriture groupée
+        self.on_change = on_change
+        self.change_tracker = ChangeTracker(self.config, history=self.history, parent=self)
+        if on_change is not None:
+            self.change_tracker.subscribe(on_change)
+        # Un suivi par objet imbriqué affiché, créé à la première ouverture de sa section
+        self.nested_trackers = {}
+
+        # Les classes avec beaucoup d'attributs utilisent une vue virtualisée (éditeurs créés à la demande)
+        if virtualized is None:
+            virtualized = len(self.schema.attributes) > VIRTUALIZE_THRESHOLD
+        if virtualized:
+            self.attribute_view = AttributeTreeView(self)
+            main_layout.insertWidget(0, self.attribute_view)
+            main_layout.insertWidget(0, attributes_title)
+        else:
+            scroll_content.layout().addWidget(attributes_title)
+            self.build_attribute_widgets(scroll_content.layout())
 
         if execute_method:
             # Ajoutez un QLabel pour séparer les méthodes
@@ -184,28 +115,85 @@ class DynamicConfigWindow(QDialog):
             self.methods_combo_box = QComboBox()
             # Ajoutez la QComboBox pour les méthodes sous le QLabel "Methods"
             scroll_content.layout().addWidget(self.methods_combo_box)
-            method_names = [attr_name for attr_name in dir(self.config) if
-                            callable(getattr(self.config, attr_name)) and not attr_name.startswith("__")]
-
-            self.methods_combo_box.addItems(method_names)
+            self.methods_combo_box.addItems(self.schema.method_names)
             self.methods_combo_box.currentIndexChanged.connect(self.update_method_params)
 
             # Ajoutez un QLabel pour séparer les paramètres des méthodes
             params_title = QLabel("Parameters")
             params_title.setStyleSheet("font-weight: bold;")
             scroll_content.layout().addWidget(params_title)
-            # Créez un conteneur pour les widgets des paramètres d'entrée
-            self.param_widgets_container = QWidget()
-            self.param_widgets_container.setLayout(QVBoxLayout())
-            scroll_content.layout().addWidget(self.param_widgets_container)
+            # Un formulaire persistant par méthode, construit à sa première sélection avec des éditeurs recyclés
+            self.param_forms = ParameterForms(self.schema)
+            scroll_content.layout().addWidget(self.param_forms)
+
+            # Les méthodes sont exécutées hors du thread de l'interface, les résultats reviennent par signaux
+            self.method_runner = MethodRunner(parent=self)
+            self.method_runner.started.connect(self.on_run_started)
+            self.method_runner.progress.connect(self.on_run_progress)
+            self.method_runner.finished.connect(self.on_run_finished)
+            self.method_runner.failed.connect(self.on_run_failed)
+            self.method_runner.cancelled.connect(self.on_run_cancelled)
+            self.method_runner.profiled.connect(self.on_run_profiled)
 
             # Ajoutez un QPushButton pour exécuter la méthode sélectionnée
             self.run_button = QPushButton("Run method")
             self.run_button.clicked.connect(self.run_method)
 
-            main_layout.addWidget(self.run_button)
+            # Ajoutez un QPushButton pour annuler les exécutions en cours
+            self.cancel_runs_button = QPushButton("Cancel runs")
+            self.cancel_runs_button.setEnabled(False)
+            self.cancel_runs_button.clicked.connect(self.method_runner.cancel_all)
+
+            run_layout = QHBoxLayout()
+            run_layout.addWidget(self.run_button)
+            run_layout.addWidget(self.cancel_runs_button)
+            main_layout.addLayout(run_layout)
+
+            # Ajoutez un QLabel pour afficher l'état des exécutions
+            self.run_status_label = QLabel("")
+            main_layout.addWidget(self.run_status_label)
+
+            # Mesure optionnelle de chaque exécution (temps, mémoire, cProfile), affichée dans l'historique des appels
+            self.profile_check_box = QCheckBox("Profile runs")
+            self.cprofile_check_box = QCheckBox("cProfile")
+            self.cprofile_check_box.setEnabled(False)
+            self.profile_check_box.toggled.connect(self.cprofile_check_box.setEnabled)
+            profile_layout = QHBoxLayout()
+            profile_layout.addWidget(self.profile_check_box)
+            profile_layout.addWidget(self.cprofile_check_box)
+            profile_layout.addStretch()
+            main_layout.addLayout(profile_layout)
+
+            self.call_history_panel = CallHistoryPanel()
+            self.call_history_panel.setVisible(False)
+            self.profile_check_box.toggled.connect(self.show_call_history)
+            main_layout.addWidget(self.call_history_panel)
             self.update_method_params()
 
+        # Ajout des boutons Undo et Redo
+        history_layout = QHBoxLayout()
+        self.undo_button = QPushButton("Undo")
+        self.redo_button = QPushButton("Redo")
+        self.undo_button.clicked.connect(self.undo)
+        self.redo_button.clicked.connect(self.redo)
+        history_layout.addWidget(self.undo_button)
+        history_layout.addWidget(self.redo_button)
+        main_layout.addLayout(history_layout)
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.redo)
+        self.change_tracker.changed.connect(self.update_history_buttons)
+        self.update_history_buttons()
+
+        # Ajout des boutons de sauvegarde et de chargement des presets
+        preset_layout = QHBoxLayout()
+        save_preset_button = QPushButton("Save preset")
+        load_preset_button = QPushButton("Load preset")
+        save_preset_button.clicked.connect(self.save_preset)
+        load_preset_button.clicked.connect(self.load_preset)
+        preset_layout.addWidget(save_preset_button)
+        preset_layout.addWidget(load_preset_button)
+        main_layout.addLayout(preset_layout)
+
         # Ajout des boutons Ok et Cancel
         button_layout = QHBoxLayout()
         ok_button = QPushButton("Ok")
@@ -220,120 +208,170 @@ class DynamicConfigWindow(QDialog):
 
         scroll.setWidgetResizable(True)
 
-        # Afficher et exécuter le widget
+        # Afficher et exécuter le widget (exec_dialog=False : la fenêtre est seulement affichée)
         self.show()
-        if app is not None:
+        if app is not None and exec_dialog:
             self.exec()
-    def open_dynamic_config_window(self, attr_name, attr_type):
-        # Obtenir l'attribut actuel
-        current_attr = getattr(self.config, attr_name)
-
-        # Créer une nouvelle instance de DynamicConfigWindow avec le type de l'attribut
-        sub_config_window = DynamicConfigWindow(current_attr if current_attr else attr_type(), execute_method=False)
-        result = sub_config_window.exec()
-
-        if result == QDialog.DialogCode.Accepted:
-            # Mettre à jour l'attribut dans self.config_class
-            setattr(self.config, attr_name, sub_config_window.get_config())
-
-            # Mettre à jour l'attribut dans self.config_class
-            setattr(self.config_class, attr_name, sub_config_window.get_config())
-    def update_method_params(self):
-        # Effacez les anciens widgets de paramètres d'entrée
-        for i in range(self.param_widgets_container.layout().count()):
-            self.param_widgets_container.layout().takeAt(0).widget().deleteLater()
-
-        # Obtenez la méthode sélectionnée et sa signature
-        method_name = self.methods_combo_box.currentText()
-        method = getattr(self.config, method_name, None)
-        if not method:
+    def build_attribute_widgets(self, layout, obj=None, change_tracker=None, prefix="", ancestors=()):
+        # Les attributs des objets imbriqués sont construits dans une section repliable, à sa première ouverture
+        obj = self.config if obj is None else obj
+        change_tracker = change_tracker or self.change_tracker
+        ancestors = ancestors + (obj,)
+        for attr_spec in get_schema(obj).attributes:
+            attr_name, attr_type = attr_spec.name, attr_spec.type
+            attr_value = getattr(obj, attr_name)
+
+            # Un seul accès au registre pour choisir l'éditeur du type annoté
+            editor_class = editor_for(attr_type, attr_value)
+            if editor_class is None:
+                continue
+            path = prefix + attr_name
+            editor = editor_class(attr_name, attr_type, attr_value, label=attr_name)
+            if isinstance(editor, NestedEditor):
+                editor.on_expand = partial(self.build_nested_widgets, obj, attr_spec, change_tracker, path,
+                                           ancestors)
+            else:
+                editor.connect(partial(change_tracker.stage, attr_name))
+
+            if not editor.shows_label:
+                layout.addWidget(QLabel(attr_name))
+            layout.addWidget(editor.widget)
+            self.attribute_editors[path] = editor
+            self.editor_owners[path] = obj
+
+    def build_nested_widgets(self, owner, attr_spec, change_tracker, path, ancestors, layout):
+        nested = change_tracker.pending.get(attr_spec.name, getattr(owner, attr_spec.name))
+        if nested is None or is_mixed(nested):
+            # Attribut vide : l'objet est créé avec son constructeur par défaut (pour chaque instance d'un groupe
+            # qui n'en a pas), modification annulable
+            change_tracker.stage(attr_spec.name, fill_missing(nested, attr_spec.type))
+            change_tracker.commit()
+            nested = change_tracker.pending.get(attr_spec.name, getattr(owner, attr_spec.name))
+        if attr_spec.name not in change_tracker.pending:
+            # Un objet partagé par défaut au niveau de la classe (ProcessImage.config) est copié sur l'instance
+            # avant d'être modifié par les éditeurs de la section
+            nested = own_attribute(owner, attr_spec.name)
+        self.section_objects[path] = nested
+        if any(nested is ancestor for ancestor in ancestors):
+            layout.addWidget(QLabel(f"{type(nested).__name__} already shown above (cycle)"))
             return
-
-        method_signature = signature(method)
-        params = method_signature.parameters
-
-        for param_name, param in params.items():
-            # Créer et ajouter des widgets en fonction des types de paramètres d'entrée
-            param_type = param.annotation if param.annotation != Parameter.empty else type(param.default)
-
-            if param_type is str:
-
-                # Créez un QLabel pour le paramètre
-                label = QLabel(param_name)
-
-                # Créez un QLineEdit pour le paramètre
-                line_edit = QLineEdit(param.default if param.default != Parameter.empty else '')
-
-                # Ajoutez le QLabel et le QLineEdit au layout
-                self.param_widgets_container.layout().addWidget(label)
-                self.param_widgets_container.layout().addWidget(line_edit)
-            elif param_type is bool:
-                # Créez un QLabel pour le paramètre
-                label = QLabel(param_name)
-
-                # Créez un QCheckBox pour le paramètre
-                checkbox = QCheckBox()
-                checkbox.setChecked(param.default if param.default != Parameter.empty else False)
-
-                # Ajoutez le QLabel et le QCheckBox au layout
-                self.param_widgets_container.layout().addWidget(label)
-                self.param_widgets_container.layout().addWidget(checkbox)
-
-            elif param_type is int:
-                # Créez un QLabel pour le paramètre
-                label = QLabel(param_name)
-
-                # Créez un QSpinBox pour le paramètre
-                spinbox = QSpinBox()
-                spinbox.setMinimum(-2147483648)
-                spinbox.setMaximum(2147483647)
-                spinbox.setSingleStep(1)
-                spinbox.setValue(param.default if param.default != Parameter.empty else 0)
-
-                # Ajoutez le QLabel et le QSpinBox au layout
-                self.param_widgets_container.layout().addWidget(label)
-                self.param_widgets_container.layout().addWidget(spinbox)
-
-            elif param_type is float:
-                # Créez un QLabel pour le paramètre
-                label = QLabel(param_name)
-
-                # Créez un QDoubleSpinBox pour le paramètre
-                spinbox = QDoubleSpinBox()
-                spinbox.setMinimum(-sys.float_info.max)
-                spinbox.setMaximum(sys.float_info.max)
-                spinbox.setSingleStep(0.1)
-                spinbox.setValue(param.default if param.default != Parameter.empty else 0.0)
-
-                # Ajoutez le QLabel et le QDoubleSpinBox au layout
-                self.param_widgets_container.layout().addWidget(label)
-                self.param_widgets_container.layout().addWidget(spinbox)
-
-            elif param_type is 'filepath' or param_type is os.path:
-                # Créez un QLabel pour le paramètre
-                label = QLabel(param_name)
-
-                # Créez un QLineEdit pour le paramètre
-                line_edit = QLineEdit(param.default if param.default != Parameter.empty else "")
-
-                # Créez un QPushButton pour ouvrir un QFileDialog
-                file_dialog_button = QPushButton("Browse")
-                file_dialog_button.clicked.connect(partial(self.open_file_dialog, line_edit))
-
-                # Créez un QHBoxLayout pour le QLineEdit et le QPushButton
-                hbox_layout = QHBoxLayout()
-                hbox_layout.addWidget(line_edit)
-                hbox_layout.addWidget(file_dialog_button)
-
-                # Ajoutez le QLabel et le QHBoxLayout au layout
-                self.param_widgets_container.layout().addWidget(label)
-                self.param_widgets_container.layout().addLayout(hbox_layout)
-
-
-    def open_file_dialog(self, line_edit):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select File")
+        self.build_attribute_widgets(layout, nested, self.tracker_for(nested), path + ".", ancestors)
+
+    def tracker_for(self, obj):
+        # Les objets imbriqués ont leur propre suivi, qui enregistre dans l'historique de la fenêtre
+        tracker = self.nested_trackers.get(id(obj))
+        if tracker is None or tracker.target is not obj:
+            tracker = ChangeTracker(obj, history=self.history, parent=self)
+            if self.runs_in_flight():
+                tracker.hold()
+            tracker.changed.connect(self.update_history_buttons)
+            if self.on_change is not None:
+                tracker.subscribe(self.on_change)
+            self.nested_trackers[id(obj)] = tracker
+        return tracker
+
+    def trackers(self):
+        return [self.change_tracker, *self.nested_trackers.values()]
+
+    def commit_changes(self):
+        for tracker in self.trackers():
+            tracker.commit()
+
+    def refresh_attribute_widgets(self):
+        # Affiche les valeurs actuelles de l'instance (après une annulation par exemple) ; une section dont l'objet
+        # imbriqué a été remplacé est reconstruite pour le nouvel objet
+        for path, editor in list(self.attribute_editors.items()):
+            if path not in self.attribute_editors:
+                continue  # section reconstruite plus haut
+            owner = self.editor_owners[path]
+            tracker = self.change_tracker if owner is self.config else self.nested_trackers.get(id(owner))
+            if tracker is not None and editor.name in tracker.pending:
+                continue  # saisie pas encore écrite sur l'instance
+            value = getattr(owner, editor.name)
+            if isinstance(editor, NestedEditor):
+                if editor.built and self.section_objects.get(path) is not value:
+                    self.forget_editors(path)
+                    editor.reset()
+            elif value is not None:
+                editor.set(value)
+        if hasattr(self, "attribute_view"):
+            self.attribute_view.model().refresh()
+
+    def forget_editors(self, section_path):
+        # Oublie les éditeurs et les sections contenus dans la section section_path
+        prefix = section_path + "."
+        for path in [path for path in self.attribute_editors if path.startswith(prefix)]:
+            del self.attribute_editors[path]
+            del self.editor_owners[path]
+        self.section_objects.pop(section_path, None)
+        for path in [path for path in self.section_objects if path.startswith(prefix)]:
+            del self.section_objects[path]
+
+    def emit_changes(self, entry):
+        # Les abonnés de chaque objet reçoivent les valeurs réécrites par une annulation ou un preset
+        for tracker in self.trackers():
+            changes = {attr_name: getattr(target, attr_name) for target, attr_name, _, _ in entry
+                       if target is tracker.target}
+            if changes:
+                tracker.changed.emit(changes)
+
+    def undo(self):
+        self.apply_history(self.history.undo)
+
+    def redo(self):
+        self.apply_history(self.history.redo)
+
+    def apply_history(self, step):
+        if self.refuse_while_running("Undo/redo"):
+            return
+        self.commit_changes()
+        entry = step()
+        if entry:
+            self.refresh_attribute_widgets()
+            self.emit_changes(entry)
+        self.update_history_buttons()
+
+    def save_preset(self):
+        self.commit_changes()
+        # Un preset n'a qu'une valeur par attribut : refusé tant que des instances éditées diffèrent
+        mixed = mixed_attributes(self.config)
+        if mixed:
+            QMessageBox.warning(self, "Save preset", "The preset cannot be saved: these attributes differ between "
+                                                     "the edited instances:\n" + ", ".join(mixed))
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save preset", "", "Presets (*.json)")
         if file_name:
-            line_edit.setText(file_name)
+            # Une exception qui sort d'un slot PyQt6 termine l'application : l'erreur est affichée
+            try:
+                save_preset(self.config, file_name)
+            except Exception as error:
+                QMessageBox.warning(self, "Save preset", f"Cannot save the preset to {file_name}:\n{error}")
+
+    def load_preset(self):
+        if self.refuse_while_running("Loading a preset"):
+            return
+        file_name, _ = QFileDialog.getOpenFileName(self, "Load preset", "", "Presets (*.json)")
+        if file_name:
+            self.commit_changes()
+            # Le chargement est annulable comme une modification unique
+            try:
+                changes = load_preset(self.config, file_name)
+            except Exception as error:
+                QMessageBox.warning(self, "Load preset", f"Cannot load the preset {file_name}:\n{error}")
+                return
+            self.history.record_entry(changes)
+            self.refresh_attribute_widgets()
+            self.emit_changes(changes)
+            self.update_history_buttons()
+
+    def update_history_buttons(self):
+        self.undo_button.setEnabled(self.history.can_undo())
+        self.redo_button.setEnabled(self.history.can_redo())
+
+    def update_method_params(self):
+        # Affichez le formulaire de la méthode sélectionnée, avec les valeurs laissées à sa dernière sélection
+        form = self.param_forms.show_method(self.methods_combo_box.currentText())
+        self.param_editors = form.editors if form is not None else {}
 
     def run_method(self):
         # Obtenez la méthode sélectionnée
@@ -342,69 +380,137 @@ class DynamicConfigWindow(QDialog):
         if not method:
             return
 
-        # Obtenez les paramètres de la méthode et leurs widgets
-        method_signature = signature(method)
-        params = method_signature.parameters
+        # Récupérez les valeurs converties par les éditeurs des paramètres
+        method_spec = self.schema.method(method_name)
         param_widgets = self.get_param_widgets()
-
-        # Récupérez les valeurs des widgets de paramètres et convertissez-les en leurs types appropriés
         args = []
-        for param_name, param in params.items():
-            param_type = param.annotation if param.annotation != Parameter.empty else type(param.default)
-            widget = param_widgets[param_name]
-            widget_value = widget.text() if isinstance(widget, QLineEdit) else (
-                widget.isChecked() if isinstance(widget, QCheckBox) else widget.value())
-
-            # Convertir les valeurs en leur type approprié
-            if param_type is str:
-                converted_value = widget_value
-            elif param_type is bool:
-                converted_value = widget_value
-            elif param_type is int:
-                converted_value = int(widget_value)
-            elif param_type is float:
-                converted_value = float(widget_value)
-            elif param_type is 'filepath' or param_type is os.path:
-                converted_value = widget_value
+        for param in method_spec.params:
+            editor = param_widgets.get(param.name)
+            if editor is not None:
+                args.append(editor.get())
+            elif param.has_default:
+                args.append(param.default)
             else:
-                converted_value = None
-                print("Value conversion error")
-            args.append(converted_value)
-
-        # Exécutez la méthode avec les arguments récupérés et convertis
-        method(*args)
-
-    def get_param_widgets(self):
-        # Obtenez les widgets associés aux paramètres de la méthode
-        param_widgets = {}
-        for i in range(0, self.param_widgets_container.layout().count(), 2):
-            param_name = self.param_widgets_container.layout().itemAt(i).widget().text()
+                args.append(None)
+                print(f"Value conversion error: no editor for parameter {param.name!r}")
 
-            # Récupérer le widget d'entrée correct pour chaque type de widget
-            widget_item = self.param_widgets_container.layout().itemAt(i + 1)
-            if isinstance(widget_item, QWidgetItem):  # Vérifiez si l'objet est un widget
-                input_widget = widget_item.widget()
-            else:  # Sinon, il devrait être un layout
-                widget_layout = widget_item.layout()
-                input_widget = widget_layout.itemAt(0).widget()  # Utiliser le 1er élément du QHBoxLayout
+        # Une seule exécution à la fois par instance : deux méthodes ne modifient jamais le même objet ensemble
+        if is_running(self.config):
+            self.update_run_status(f"{method_name} not started: a method of this instance is still running")
+            return
 
-            param_widgets[param_name] = input_widget
+        # La méthode doit voir les dernières valeurs saisies
+        self.commit_changes()
+
+        profiler = None
+        if self.profile_check_box.isChecked():
+            profiler = RunProfiler(method_name, cprofile=self.cprofile_check_box.isChecked())
+
+        # Exécutez la méthode dans le pool de threads (ou dans le thread de l'interface si elle l'exige) avec les
+        # arguments récupérés et convertis ; les modifications saisies pendant l'exécution sont écrites à la fin
+        for tracker in self.trackers():
+            tracker.hold()
+        run_id = self.method_runner.submit(method, args, accepts_context=method_spec.accepts_context,
+                                           profiler=profiler, in_gui_thread=method_spec.gui_thread,
+                                           owner=self.config)
+        self.run_names[run_id] = method_name
+        self.update_run_status(f"{method_name} #{run_id} queued")
+
+    def update_run_status(self, message):
+        in_flight = self.method_runner.in_flight()
+        self.cancel_runs_button.setEnabled(in_flight > 0)
+        self.run_status_label.setText(f"{message} ({in_flight} in flight)" if in_flight else message)
+
+    def runs_in_flight(self):
+        return hasattr(self, "method_runner") and self.method_runner.in_flight() > 0
+
+    def refuse_while_running(self, action):
+        # Annulation et presets réécrivent l'instance : pas pendant qu'une méthode la modifie dans un autre thread
+        if not self.runs_in_flight():
+            return False
+        self.update_run_status(f"{action} is not available while a method is running")
+        return True
+
+    def release_trackers(self):
+        # Plus aucune exécution : les modifications saisies entre-temps sont écrites
+        if not self.runs_in_flight():
+            for tracker in self.trackers():
+                tracker.release()
+
+    def on_run_started(self, run_id):
+        self.update_run_status(f"{self.run_names.get(run_id)} #{run_id} running")
+
+    def on_run_progress(self, run_id, progress, message):
+        self.update_run_status(f"{self.run_names.get(run_id)} #{run_id} {progress:.0%} {message}".rstrip())
+
+    def on_run_finished(self, run_id, result):
+        method_name = self.run_names.pop(run_id, None)
+        self.release_trackers()
+        # La méthode a pu réaffecter des attributs (image par exemple) : les éditeurs affichent les nouvelles valeurs
+        self.refresh_attribute_widgets()
+        self.update_run_status(f"{method_name} #{run_id} done" + (f": {result!r}" if result is not None else ""))
+
+    def on_run_failed(self, run_id, error, formatted_traceback):
+        method_name = self.run_names.pop(run_id, None)
+        self.release_trackers()
+        print(formatted_traceback, file=sys.stderr)
+        self.refresh_attribute_widgets()
+        self.update_run_status(f"{method_name} #{run_id} failed: {error!r}")
+
+    def on_run_cancelled(self, run_id):
+        method_name = self.run_names.pop(run_id, None)
+        self.release_trackers()
+        self.update_run_status(f"{method_name} #{run_id} cancelled")
+
+    def on_run_profiled(self, run_id, profile):
+        self.call_history_panel.add_profile(run_id, profile)
+
+    def show_call_history(self, visible):
+        # Le panneau reste visible tant qu'il contient des exécutions
+        self.call_history_panel.setVisible(visible or bool(self.call_history_panel.profiles))
 
-        return param_widgets
+    def get_param_widgets(self):
+        # Éditeurs des paramètres de la méthode sélectionnée, indexés par nom
+        return self.param_editors
+
+    def stop_runs(self):
+        # Annulation coopérative des exécutions encore en file ou en cours, puis attente bornée de celles déjà
+        # commencées : aucun thread ne modifie plus l'instance rendue par get_config() ou restaurée par reject()
+        if not hasattr(self, "method_runner"):
+            return True
+        self.method_runner.cancel_all()
+        if self.method_runner.wait(STOP_RUNS_TIMEOUT_MS):
+            return True
+        QMessageBox.warning(self, "Runs still in progress",
+                            f"{self.method_runner.in_flight()} run(s) did not stop within "
+                            f"{STOP_RUNS_TIMEOUT_MS / 1000:g} s of being cancelled. The window stays open until "
+                            "they finish.")
+        return False
 
     def accept(self):
-        # récupération de l'instance de config_class avec les valeurs modifiées
-        modified_config = self.config_class
-        for attr_name in dir(modified_config):
-            if not attr_name.startswith("__") and not callable(getattr(modified_config, attr_name)):
-                setattr(modified_config, attr_name, getattr(self.config_class, attr_name))
-        self.modified_config = modified_config
+        if not self.stop_runs():
+            return
+
+        # Écriture groupée des seules modifications encore en attente
+        for tracker in self.trackers():
+            tracker.release()
+        self.modified_config = self.config_class
 
         # Appel de la méthode QDialog accept()
         super().accept()
 
     def reject(self):
-        self.modified_config = self.original_config if self.original_config is not None else None
+        if not self.stop_runs():
+            return
+        for tracker in self.trackers():
+            tracker.discard()
+        self.history.truncate(self.history_mark)
+        if self.snapshot is not None:
+            # Seuls les attributs modifiés sont réécrits sur l'instance (sur chaque instance d'une liste)
+            self.snapshot.restore()
+            self.modified_config = self.config_class
+        else:
+            self.modified_config = None
         # Appel de la méthode QDialog reject()
         super().reject()
 
@@ -412,18 +518,9 @@ class DynamicConfigWindow(QDialog):
         return self.modified_config
 
 
-def update_current_item(combo_box):
-    current_index = combo_box.currentIndex()
-    current_text = combo_box.lineEdit().text()
-
-    # Mise à jour de l'élément dans la liste
-    if current_index >= 0:
-        combo_box.setItemText(current_index, current_text)
-
-def str_to_list(value):
-    return [x.strip() for x in value.split(',')]
-
 if __name__ == "__main__":
+    from example_class import ProcessImage
+
     app = QApplication(sys.argv)
     config_class = ProcessImage()
 
@@ -0,0 +1,315 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QTreeView, QStyledItemDelegate, QAbstractItemView
+
+from class_schema import get_schema, own_attribute
+from field_editors import editor_for, NestedEditor
+from instance_group import MIXED_TEXT, is_mixed, fill_missing
+
+NAME_COLUMN = 0
+VALUE_COLUMN = 1
+
+
+class _Node:
+    """Row of the tree: attribute `attr_spec` of `owner`, edited through `tracker`.
+
+    `attributes` and `children` stay None until the row is expanded; `nested` is then the object whose attributes
+    are listed, so that a row whose object was replaced can be collapsed and fetched again.
+    """
+
+    __slots__ = ("parent", "row", "owner", "attr_spec", "tracker", "editor_class", "nested", "nested_tracker",
+                 "attributes", "children")
+
+    def __init__(self, parent, row, owner, attr_spec, tracker):
+        self.parent = parent
+        self.row = row
+        self.owner = owner
+        self.attr_spec = attr_spec
+        self.tracker = tracker
+        self.editor_class = False
+        self.nested = None
+        self.nested_tracker = None
+        self.attributes = None
+        self.children = None
+
+    def set_nested(self, obj, tracker):
+        self.nested = obj
+        self.nested_tracker = tracker
+        self.attributes = get_schema(obj).attributes
+        self.children = [None] * len(self.attributes)
+
+    def clear_nested(self):
+        self.nested = self.nested_tracker = self.attributes = self.children = None
+
+    def child(self, row):
+        # Les lignes enfants ne sont créées que lorsque la vue les demande
+        node = self.children[row]
+        if node is None:
+            node = self.children[row] = _Node(self, row, self.nested, self.attributes[row], self.nested_tracker)
+        return node
+
+
+class AttributeItemModel(QAbstractItemModel):
+    """Model exposing the annotated attributes of an instance as a tree, one row per attribute.
+
+    Values are read from the instance only when a row is painted, and the attributes of a nested object are
+    introspected only when its row is first expanded, so the cost of opening the view does not depend on the number
+    of attributes nor on the depth of the object graph. `tracker_factory(obj)` returns the ChangeTracker used for the
+    attributes of a nested object (they are written directly without it).
+    """
+
+    def __init__(self, config, schema, change_tracker=None, parent=None, tracker_factory=None):
+        super().__init__(parent)
+        self.config = config
+        self.tracker_factory = tracker_factory
+        self.root = _Node(None, 0, None, None, None)
+        self.root.set_nested(config, change_tracker)
+        self.root.attributes = schema.attributes
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def value(self, index):
+        # Une valeur modifiée mais pas encore écrite sur l'instance reste visible dans la vue
+        node = self.node(index)
+        if node is self.root:
+            return self.config
+        attr_name = node.attr_spec.name
+        if node.tracker is not None and attr_name in node.tracker.pending:
+            return node.tracker.pending[attr_name]
+        return getattr(node.owner, attr_name)
+
+    def editor_class(self, index):
+        # Même registre type -> éditeur que les formulaires de DynamicConfigWindow
+        node = self.node(index)
+        if node.editor_class is False:
+            node.editor_class = editor_for(node.attr_spec.type, self.value(index))
+        return node.editor_class
+
+    def attribute(self, index):
+        return self.node(index).attr_spec
+
+    def is_cycle(self, index):
+        # L'objet imbriqué est déjà affiché par une ligne parente : graphe auto-référencé
+        value = self.value(index)
+        node = self.node(index)
+        while node is not None:
+            if node.owner is value:
+                return True
+            node = node.parent
+        return value is self.config
+
+    def is_expandable(self, index):
+        if self.editor_class(index) is not NestedEditor:
+            return False
+        value = self.value(index)
+        return value is not None and not self.is_cycle(index) and bool(get_schema(value).attributes)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.node(parent).child(row))
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer().parent
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node(parent)
+        return 0 if node.attributes is None else len(node.attributes)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        node = self.node(parent)
+        if node.attributes is not None:
+            return bool(node.attributes)
+        return self.is_expandable(parent)
+
+    def canFetchMore(self, parent):
+        return parent.isValid() and parent.column() == 0 and self.node(parent).attributes is None \
+            and self.is_expandable(parent)
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if node is self.root or node.attributes is not None:
+            return  # racine et lignes déjà dépliées : rien à charger
+        value = self.value(parent)
+        if node.tracker is None or node.attr_spec.name not in node.tracker.pending:
+            # Un objet partagé par défaut au niveau de la classe est copié sur l'instance avant d'être modifié
+            value = own_attribute(node.owner, node.attr_spec.name)
+        tracker = self.tracker_factory(value) if self.tracker_factory is not None else None
+        count = len(get_schema(value).attributes)
+        self.beginInsertRows(parent, 0, count - 1)
+        node.set_nested(value, tracker)
+        self.endInsertRows()
+
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return ("Attribute", "Value")[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == VALUE_COLUMN:
+            editor_class = self.editor_class(index)
+            if editor_class is None:
+                pass
+            elif editor_class.checkable:
+                flags |= Qt.ItemFlag.ItemIsUserCheckable
+            elif editor_class.supports_params:
+                flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        attr_spec = self.attribute(index)
+        if index.column() == NAME_COLUMN:
+            return attr_spec.name if role == Qt.ItemDataRole.DisplayRole else None
+
+        editor_class = self.editor_class(index)
+        if editor_class is None:
+            return None
+        value = self.value(index)
+        if editor_class.checkable:
+            if role == Qt.ItemDataRole.CheckStateRole:
+                if is_mixed(value):
+                    return Qt.CheckState.PartiallyChecked
+                return Qt.CheckState.Checked if value else Qt.CheckState.Unchecked
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            if is_mixed(value):
+                return MIXED_TEXT
+            if editor_class is NestedEditor and value is not None and self.is_cycle(index):
+                return f"{editor_class.display(value)} (cycle)"
+            return editor_class.display(value)
+        if role == Qt.ItemDataRole.EditRole:
+            return value
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or index.column() != VALUE_COLUMN:
+            return False
+        editor_class = self.editor_class(index)
+        if editor_class is not None and editor_class.checkable:
+            if role != Qt.ItemDataRole.CheckStateRole:
+                return False
+            value = Qt.CheckState(value) == Qt.CheckState.Checked
+        elif role != Qt.ItemDataRole.EditRole:
+            return False
+
+        self.set_attribute(index, value)
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def refresh(self, parent=QModelIndex()):
+        # Les vues ne redessinent que les lignes visibles ; les lignes dont l'objet imbriqué a été remplacé sont
+        # repliées et seront relues à la prochaine ouverture
+        node = self.node(parent)
+        if not node.attributes:
+            return
+        last = len(node.attributes) - 1
+        for row, child in enumerate(node.children):
+            if child is None or child.attributes is None:
+                continue
+            child_index = self.createIndex(row, 0, child)
+            if self.value(child_index) is not child.nested:
+                self.beginRemoveRows(child_index, 0, len(child.attributes) - 1)
+                child.clear_nested()
+                self.endRemoveRows()
+            else:
+                self.refresh(child_index)
+        self.dataChanged.emit(self.index(0, VALUE_COLUMN, parent), self.index(last, VALUE_COLUMN, parent))
+
+    def set_attribute(self, index, value):
+        node = self.node(index)
+        if node.tracker is not None:
+            node.tracker.stage(node.attr_spec.name, value)
+        else:
+            setattr(node.owner, node.attr_spec.name, value)
+
+
+class AttributeDelegate(QStyledItemDelegate):
+    """Create an editor only for the cell being edited, using the same editors as the non-virtualized form."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._editors = {}
+
+    def createEditor(self, parent, option, index):
+        model = index.model()
+        editor_class = model.editor_class(index)
+        if editor_class is None or editor_class.checkable or not editor_class.supports_params:
+            return None
+        attr_spec = model.attribute(index)
+        editor = editor_class(attr_spec.name, attr_spec.type, None, parent)
+        editor.widget.setAutoFillBackground(True)
+        self._editors[editor.widget] = editor
+        return editor.widget
+
+    def updateEditorGeometry(self, widget, option, index):
+        # Les éditeurs plus hauts qu'une ligne (table des listes) recouvrent les lignes suivantes
+        rect = option.rect
+        rect.setHeight(max(rect.height(), widget.minimumSizeHint().height(), widget.minimumHeight()))
+        widget.setGeometry(rect)
+
+    def destroyEditor(self, widget, index):
+        self._editors.pop(widget, None)
+        super().destroyEditor(widget, index)
+
+    def setEditorData(self, widget, index):
+        self._editors[widget].set(index.model().data(index, Qt.ItemDataRole.EditRole))
+
+    def setModelData(self, widget, model, index):
+        if hasattr(widget, "interpretText"):
+            widget.interpretText()
+        model.setData(index, self._editors[widget].get())
+
+
+class AttributeTreeView(QTreeView):
+    """Virtualized attribute editor used by DynamicConfigWindow for classes with many attributes.
+
+    Nested objects are expanded inline; double-clicking an empty nested attribute creates it with its default
+    constructor.
+    """
+
+    def __init__(self, window):
+        super().__init__()
+        self.config_window = window
+        self.setModel(AttributeItemModel(window.config, window.schema, window.change_tracker, self,
+                                         tracker_factory=window.tracker_for))
+        self.setItemDelegateForColumn(VALUE_COLUMN, AttributeDelegate(self))
+        # Hauteur de ligne uniforme : la vue n'a pas à mesurer chaque ligne
+        self.setUniformRowHeights(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked
+                             | QAbstractItemView.EditTrigger.EditKeyPressed
+                             | QAbstractItemView.EditTrigger.SelectedClicked)
+        self.doubleClicked.connect(self.open_nested)
+
+    def open_nested(self, index):
+        model = self.model()
+        if index.column() != VALUE_COLUMN or model.editor_class(index) is not NestedEditor:
+            return
+        value = model.value(index)
+        if value is None or is_mixed(value):
+            # Objet créé pour l'instance (ou chaque instance d'un groupe) qui n'en a pas, écrit immédiatement
+            model.setData(index, fill_missing(value, model.attribute(index).type))
+            tracker = model.node(index).tracker
+            if tracker is not None:
+                tracker.commit()
+        self.expand(index.siblingAtColumn(NAME_COLUMN))
@@ -0,0 +1,321 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import argparse
+import collections
+import contextlib
+import csv
+import glob
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import lru_cache
+
+from class_schema import get_class_schema, import_class, attribute_spec, assign_path, coerce_value
+
+# Longueur maximale de la représentation d'un résultat dans le tableau
+RESULT_REPR_LENGTH = 200
+# Arguments du constructeur imposés dans les processus de travail, qui n'ont pas d'affichage
+HEADLESS_INIT = {"show": False}
+
+
+def parse_assignments(assignments):
+    # "config.angle=0,90,180" -> {"config.angle": ["0", "90", "180"]}
+    grid = {}
+    for assignment in assignments or []:
+        name, separator, values = assignment.partition("=")
+        if not separator:
+            raise ValueError(f"Expected name=value[,value...], got {assignment!r}")
+        grid[name.strip()] = [value.strip() for value in values.split(",")]
+    return grid
+
+
+def expand_grid(grid):
+    # Produit cartésien des valeurs : une combinaison par tâche
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def build_combinations(cls, method_name, attribute_grid=None, argument_grid=None, combinations=None):
+    """Validate a parameter sweep against the class schema and convert every value to its annotated type.
+
+    Returns a list of (attributes, arguments) dictionaries, from the cartesian product of both grids or from an
+    explicit list of {"set": {...}, "args": {...}} combinations.
+    """
+    method_spec = get_class_schema(cls).method(method_name)
+    if method_spec is None:
+        raise AttributeError(f"{cls.__name__} has no public method {method_name!r}")
+
+    if combinations is None:
+        combinations = [{"set": attributes, "args": arguments}
+                        for attributes in expand_grid(attribute_grid or {})
+                        for arguments in expand_grid(argument_grid or {})]
+
+    converted = []
+    for combination in combinations:
+        attributes = {path: coerce_value(value, attribute_spec(cls, path).type)
+                      for path, value in combination.get("set", {}).items()}
+        arguments = {}
+        for name, value in combination.get("args", {}).items():
+            param = method_spec.param(name)
+            if param is None:
+                raise TypeError(f"{method_name}() has no parameter {name!r}")
+            arguments[name] = coerce_value(value, param.type)
+        converted.append((attributes, arguments))
+    return converted
+
+
+def build_init_kwargs(cls, assignments):
+    """Convert constructor arguments and force the headless values of HEADLESS_INIT.
+
+    A constructor parameter named in HEADLESS_INIT (such as ProcessImage's `show`, which opens HighGUI windows and
+    waits for a key) gets its headless value when it is not given; asking for another value is an error, since the
+    workers have no display.
+    """
+    init_spec = get_class_schema(cls).init
+    init_kwargs = {}
+    for name, value in assignments.items():
+        param = init_spec.param(name)
+        if param is None:
+            raise TypeError(f"{cls.__name__}() has no parameter {name!r}")
+        init_kwargs[name] = coerce_value(value, param.type)
+    for name, value in HEADLESS_INIT.items():
+        if init_spec.param(name) is None:
+            continue
+        if init_kwargs.setdefault(name, value) != value:
+            raise ValueError(f"{cls.__name__}({name}={init_kwargs[name]!r}) needs a display; batch runs are headless")
+    return init_kwargs
+
+
+def build_tasks(class_path, method_name, combinations, input_files=(), input_param="file_path", init_kwargs=None,
+                output_dir=None):
+    """Build one task per input file and combination.
+
+    With an `output_dir`, the files a task writes with relative names (such as ProcessImage.save_image) are moved to
+    `output_dir` as `task_<n>_<name>`, so that no task overwrites the files of another; input files are then passed
+    as absolute paths.
+    """
+    inputs = list(input_files) or [None]
+    if output_dir is not None:
+        output_dir = os.path.abspath(output_dir)
+    tasks = []
+    for input_file in inputs:
+        for attributes, arguments in combinations:
+            kwargs = dict(init_kwargs or {})
+            if input_file is not None:
+                kwargs[input_param] = os.path.abspath(input_file) if output_dir is not None else input_file
+            tasks.append({"index": len(tasks), "class_path": class_path, "init": kwargs, "set": attributes,
+                          "method": method_name, "args": arguments, "input": input_file, "output_dir": output_dir})
+    return tasks
+
+
+@lru_cache(maxsize=None)
+def _worker_class(class_path):
+    # Importée une seule fois par processus de travail
+    return import_class(class_path)
+
+
+def _task_row(task):
+    return {"input": task["input"], "method": task["method"], **task["set"],
+            **{f"arg:{name}": value for name, value in task["args"].items()}}
+
+
+def _error_row(task, error):
+    row = _task_row(task)
+    row.update(status="error", seconds=0.0, result="", error=error)
+    return row
+
+
+def _collect_outputs(task_dir, output_dir, prefix):
+    # Fichiers écrits par la tâche, déplacés dans le répertoire de sortie commun sous un nom préfixé par la tâche
+    outputs = []
+    for directory, _, file_names in os.walk(task_dir):
+        for file_name in sorted(file_names):
+            relative = os.path.relpath(os.path.join(directory, file_name), task_dir)
+            output_name = prefix + relative.replace(os.sep, "_")
+            os.replace(os.path.join(directory, file_name), os.path.join(output_dir, output_name))
+            outputs.append(output_name)
+    return outputs
+
+
+def run_task(task):
+    """Run a single task in a worker process and return its row of the results table.
+
+    With an output directory, the task runs in a private temporary directory whose files are then moved to the output
+    directory (see build_tasks) and listed in the `outputs` column. Whatever the task prints goes to the standard
+    error, which keeps the standard output for the results table.
+    """
+    output_dir = task.get("output_dir")
+    row = _task_row(task)
+    start = time.perf_counter()
+    previous_dir = os.getcwd()
+    task_dir = None
+    try:
+        cls = _worker_class(task["class_path"])
+        with contextlib.redirect_stdout(sys.stderr):
+            if output_dir is not None:
+                os.makedirs(output_dir, exist_ok=True)
+                task_dir = tempfile.mkdtemp(prefix=f".task_{task['index']:05d}_", dir=output_dir)
+                os.chdir(task_dir)
+            instance = cls(**task["init"])
+            for path, value in task["set"].items():
+                assign_path(instance, path, value)
+            result = getattr(instance, task["method"])(**task["args"])
+    except Exception as error:
+        row.update(status="error", seconds=time.perf_counter() - start, result="", error=repr(error))
+    else:
+        row.update(status="ok", seconds=time.perf_counter() - start,
+                   result="" if result is None else repr(result)[:RESULT_REPR_LENGTH], error="")
+    finally:
+        os.chdir(previous_dir)
+        if task_dir is not None:
+            row["outputs"] = ";".join(_collect_outputs(task_dir, output_dir, f"task_{task['index']:05d}_"))
+            shutil.rmtree(task_dir, ignore_errors=True)
+    return row
+
+
+def run_batch(tasks, workers=None, max_in_flight=None, on_result=None):
+    """Fan tasks out over a process pool with at most `max_in_flight` tasks submitted at any time.
+
+    Rows are returned in the order of the tasks; `on_result(done, total, row)` is called as each task completes. When
+    a worker process dies (crash, out of memory), the pool is recreated and the tasks that were in flight are run
+    again one at a time: the one that kills its worker again gets an error row, the others complete normally.
+    """
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+    rows = [None] * len(tasks)
+    queue = collections.deque(range(len(tasks)))
+    # Tâches en cours lors d'un plantage, relancées seules pour trouver celle qui l'a provoqué
+    suspects = collections.deque()
+    done_count = 0
+
+    def record(index, row):
+        nonlocal done_count
+        rows[index] = row
+        done_count += 1
+        if on_result is not None:
+            on_result(done_count, len(tasks), row)
+
+    while queue or suspects:
+        pending = {}
+        isolated = None
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                # Remplir la file jusqu'à la limite avant d'attendre des résultats, une seule tâche suspecte à la fois
+                if suspects:
+                    if not pending:
+                        isolated = suspects.popleft()
+                        pending[executor.submit(run_task, tasks[isolated])] = isolated
+                else:
+                    while queue and len(pending) < max_in_flight:
+                        index = queue.popleft()
+                        pending[executor.submit(run_task, tasks[index])] = index
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        record(index, future.result())
+                    except BrokenProcessPool:
+                        if index == isolated:
+                            record(index, _error_row(tasks[index], "worker process died"))
+                        else:
+                            suspects.append(index)
+                        broken = True
+                    except Exception as error:
+                        record(index, _error_row(tasks[index], repr(error)))
+                if broken:
+                    suspects.extend(pending.values())
+                    break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return rows
+
+
+def write_results(rows, file):
+    fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+    writer = csv.DictWriter(file, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def print_summary(rows, elapsed, file=sys.stdout):
+    errors = sum(row["status"] != "ok" for row in rows)
+    task_seconds = sum(row["seconds"] for row in rows)
+    print(f"{len(rows)} tasks ({errors} errors) in {elapsed:.2f} s, {task_seconds:.2f} s of task time", file=file)
+    if rows:
+        slowest = max(rows, key=lambda row: row["seconds"])
+        params = {key: value for key, value in slowest.items()
+                  if key not in ("status", "seconds", "result", "error", "outputs")}
+        print(f"slowest: {slowest['seconds']:.3f} s {json.dumps(params)}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a method of an annotated class over a parameter sweep, "
+                                                 "without a display.")
+    parser.add_argument("class_path", help="class to instantiate, e.g. example_class:ProcessImage")
+    parser.add_argument("method", help="public method to call, e.g. process_with_config")
+    parser.add_argument("--inputs", nargs="*", default=[], help="input files or glob patterns")
+    parser.add_argument("--input-param", default="file_path", help="constructor parameter receiving each input")
+    parser.add_argument("--init", action="append", default=[], metavar="NAME=VALUE",
+                        help="constructor argument, e.g. show=false")
+    parser.add_argument("--set", action="append", default=[], metavar="PATH=V1,V2",
+                        help="attribute values to sweep, e.g. config.angle=0,90,180")
+    parser.add_argument("--arg", action="append", default=[], metavar="NAME=V1,V2",
+                        help="method argument values to sweep")
+    parser.add_argument("--combinations", help='JSON file with a list of {"set": {...}, "args": {...}} instead of '
+                                               'the --set/--arg grid')
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--output", help="CSV file for the results table (default: standard output)")
+    parser.add_argument("--output-dir", default=None,
+                        help="directory receiving the files written by the tasks, named task_<n>_<name> "
+                             "(default: batch_<date>)")
+    args = parser.parse_args(argv)
+
+    cls = import_class(args.class_path)
+    combinations = None
+    if args.combinations:
+        with open(args.combinations) as file:
+            combinations = json.load(file)
+    combinations = build_combinations(cls, args.method, parse_assignments(args.set), parse_assignments(args.arg),
+                                      combinations)
+    try:
+        init_kwargs = build_init_kwargs(cls, {name: values[0]
+                                              for name, values in parse_assignments(args.init).items()})
+    except (TypeError, ValueError) as error:
+        parser.error(str(error))
+    input_files = sorted(itertools.chain.from_iterable(glob.glob(pattern) for pattern in args.inputs))
+    if args.inputs and not input_files:
+        parser.error("no input file matches " + " ".join(args.inputs))
+
+    output_dir = args.output_dir or "batch_" + datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    tasks = build_tasks(args.class_path, args.method, combinations, input_files, args.input_param, init_kwargs,
+                        output_dir)
+    start = time.perf_counter()
+    rows = run_batch(tasks, args.workers, args.max_in_flight,
+                     on_result=lambda done, total, row: print(f"\r{done}/{total}", end="", file=sys.stderr))
+    print(file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            write_results(rows, file)
+    else:
+        write_results(rows, sys.stdout)
+    print_summary(rows, time.perf_counter() - start, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Pas d'affichage nécessaire : les fenêtres sont construites sur la plateforme Qt "offscreen"
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QT_VERSION_STR
+from PyQt6.QtWidgets import QApplication
+
+PARAM_TYPES = (int, float, str, bool)
+DEFAULT_VALUES = {int: 1, float: 0.5, str: "text", bool: True}
+
+
+def make_synthetic_class(n_attributes, n_methods, depth=0, n_params=3, name="Synthetic"):
+    """Build an annotated class with `n_attributes` fields, `n_methods` typed methods and `depth` nested levels."""
+    namespace = {"__annotations__": {}}
+    for i in range(n_attributes):
+        attr_type = PARAM_TYPES[i % len(PARAM_TYPES)]
+        namespace["__annotations__"][f"attr_{i}"] = attr_type
+        namespace[f"attr_{i}"] = DEFAULT_VALUES[attr_type]
+
+    for i in range(n_methods):
+        param_types = [PARAM_TYPES[j % len(PARAM_TYPES)] for j in range(n_params)]
+        params = ", ".join(f"p{j}: {param_type.__name__} = {DEFAULT_VALUES[param_type]!r}"
+                           for j, param_type in enumerate(param_types))
+        source = f"def method_{i}(self, {params}):\n    return None\n"
+        exec(source, namespace)
+
+    if depth > 0:
+        child_class = make_synthetic_class(n_attributes, 0, depth - 1, n_params, f"{name}Child")
+        namespace["__annotations__"]["child"] = child_class
+        namespace["child"] = child_class()
+
+    namespace.pop("__builtins__", None)
+    return type(f"{name}_{n_attributes}_{n_methods}_{depth}", (), namespace)
+
+
+def measure(function, repeat, warmup=1, setup=None):
+    # setup() est appelée avant chaque appel, hors de la mesure
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        function()
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(name, params, timings, **extra):
+    return {"name": name, "params": params, "repeat": len(timings), "min": min(timings),
+            "median": statistics.median(timings), "mean": statistics.fmean(timings), **extra}
+
+
+def close_window(app, window):
+    window.stop_runs()
+    if hasattr(window, "method_runner"):
+        window.method_runner.wait()
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+def bench_window(app, sizes, repeat):
+    from Class_GUI_maker import DynamicConfigWindow
+
+    results = []
+    for n_attributes, n_methods, depth in sizes:
+        params = {"attributes": n_attributes, "methods": n_methods, "depth": depth}
+        cls = make_synthetic_class(n_attributes, n_methods, depth)
+
+        def build():
+            close_window(app, DynamicConfigWindow(cls(), execute_method=True, exec_dialog=False))
+
+        results.append(result("window_build", params, measure(build, repeat)))
+
+        window = DynamicConfigWindow(cls(), execute_method=True, exec_dialog=False)
+        combo = window.methods_combo_box
+
+        def switch_method():
+            combo.setCurrentIndex((combo.currentIndex() + 1) % combo.count())
+
+        if combo.count() > 1:
+            results.append(result("method_switch", params, measure(switch_method, repeat * 10)))
+
+        # Coût de run_method jusqu'à la soumission, puis aller-retour jusqu'au signal finished traité
+        done = []
+        window.method_runner.finished.connect(lambda run_id, value: done.append(run_id))
+
+        def dispatch():
+            window.run_method()
+
+        def wait_previous_run():
+            # Une seule exécution à la fois par instance : la précédente doit être terminée et traitée
+            window.method_runner.wait()
+            app.processEvents()
+
+        def round_trip():
+            count = len(done)
+            window.run_method()
+            while len(done) == count:
+                app.processEvents()
+
+        results.append(result("run_dispatch", params, measure(dispatch, repeat * 10, setup=wait_previous_run)))
+        window.method_runner.wait()
+        app.processEvents()
+        results.append(result("run_round_trip", params, measure(round_trip, repeat * 10)))
+        close_window(app, window)
+    return results
+
+
+def bench_image_operations(image_sizes, repeat):
+    import numpy as np
+    import example_class
+    from example_class import Config, ProcessImage
+
+    config = Config()
+    config.angle, config.brightness, config.contrast = 15.0, 10.0, 1.2
+    operations = {
+        "rotate_image": lambda process_image: process_image.rotate_image(config.angle),
+        "adjust_contrast": lambda process_image: process_image.adjust_contrast(config.contrast),
+        "adjust_brightness": lambda process_image: process_image.adjust_brightness(config.brightness),
+        "apply_config": lambda process_image: example_class.apply_config(process_image.image, config),
+    }
+
+    results = []
+    rng = np.random.default_rng(0)
+    for height, width in image_sizes:
+        image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        process_image = ProcessImage(show=False)
+        for name, operation in operations.items():
+            def run():
+                process_image.image = image
+                operation(process_image)
+
+            # rotate_image affiche l'angle : la sortie standard reste réservée au rapport JSON
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings = measure(run, repeat)
+            megapixels = height * width / 1e6
+            results.append(result(f"image_{name}", {"height": height, "width": width}, timings,
+                                  megapixels_per_second=megapixels / statistics.median(timings)))
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    # Affiche le rapport médiane actuelle / médiane de référence pour chaque mesure commune
+    with open(baseline_path) as file:
+        baseline = {(entry["name"], json.dumps(entry["params"], sort_keys=True)): entry
+                    for entry in json.load(file)["results"]}
+    regressions = 0
+    for entry in results:
+        reference = baseline.get((entry["name"], json.dumps(entry["params"], sort_keys=True)))
+        if reference is None:
+            continue
+        ratio = entry["median"] / reference["median"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{entry['name']:24} {json.dumps(entry['params']):60} x{ratio:6.2f} {flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark window construction, method dispatch and image "
+                                                 "operations.")
+    parser.add_argument("--output", help="JSON file for the results (default: standard output)")
+    parser.add_argument("--compare", help="previous JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression by --compare")
+    parser.add_argument("--quick", action="store_true", help="small sizes and few repetitions")
+    parser.add_argument("--skip-images", action="store_true", help="do not benchmark ProcessImage operations")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        repeat, sizes, image_sizes = 3, [(10, 5, 0), (100, 20, 1)], [(256, 256), (1024, 1024)]
+    else:
+        repeat = 10
+        sizes = [(10, 5, 0), (100, 20, 1), (500, 50, 2), (2000, 100, 1)]
+        image_sizes = [(512, 512), (2048, 2048), (4096, 4096)]
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = bench_window(app, sizes, repeat)
+    if not args.skip_images:
+        results += bench_image_operations(image_sizes, repeat)
+
+    meta = {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "platform": platform.platform(), "qt": QT_VERSION_STR, "cpu_count": os.cpu_count()}
+    report = {"meta": meta, "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
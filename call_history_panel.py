@@ -0,0 +1,125 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import json
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPlainTextEdit, \
+    QPushButton, QFileDialog, QAbstractItemView, QHeaderView, QMessageBox
+
+# Nombre maximal d'exécutions conservées dans le panneau
+MAX_ROWS = 500
+
+COLUMNS = ("#", "Method", "Status", "Wall (ms)", "CPU (ms)", "Peak (KiB)")
+PEAK_COLUMN = COLUMNS.index("Peak (KiB)")
+OVERLAPPED_TOOLTIP = "Other profiled runs overlapped this one: the peak includes their allocations"
+
+
+class CallHistoryPanel(QWidget):
+    """Table of the profiled runs of a window, with the top cProfile functions of the selected run.
+
+    The runs can be exported as JSON, and the selected run as a pstats file when it was captured with cProfile.
+    """
+
+    def __init__(self, parent=None, max_rows=MAX_ROWS):
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self.profiles = []
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.itemSelectionChanged.connect(self.show_details)
+
+        # Fonctions les plus coûteuses de l'exécution sélectionnée
+        self.details = QPlainTextEdit()
+        self.details.setReadOnly(True)
+        self.details.setMaximumHeight(150)
+
+        export_json_button = QPushButton("Export JSON")
+        export_json_button.clicked.connect(self.export_json)
+        self.export_pstats_button = QPushButton("Export pstats")
+        self.export_pstats_button.setEnabled(False)
+        self.export_pstats_button.clicked.connect(self.export_pstats)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(export_json_button)
+        button_layout.addWidget(self.export_pstats_button)
+        button_layout.addWidget(clear_button)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.table)
+        layout.addWidget(self.details)
+        layout.addLayout(button_layout)
+
+    def add_profile(self, run_id, profile):
+        # Les plus anciennes exécutions sont retirées au-delà de max_rows
+        if len(self.profiles) >= self.max_rows:
+            self.profiles.pop(0)
+            self.table.removeRow(0)
+        self.profiles.append((run_id, profile))
+
+        peak = "" if profile.peak_memory is None else f"{profile.peak_memory / 1024:.1f}"
+        if peak and profile.peak_overlapped:
+            peak = "~" + peak
+        values = (str(run_id), profile.method, profile.status, f"{profile.wall_time * 1000:.2f}",
+                  f"{profile.cpu_time * 1000:.2f}", peak)
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        for column, value in enumerate(values):
+            self.table.setItem(row, column, QTableWidgetItem(value))
+        if profile.peak_overlapped:
+            self.table.item(row, PEAK_COLUMN).setToolTip(OVERLAPPED_TOOLTIP)
+        self.table.scrollToBottom()
+
+    def selected_profile(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.profiles[rows[0].row()][1] if rows else None
+
+    def show_details(self):
+        profile = self.selected_profile()
+        self.export_pstats_button.setEnabled(profile is not None and profile.profiler is not None)
+        if profile is None or not profile.top_functions:
+            self.details.setPlainText("" if profile is None else "No cProfile capture for this run")
+            return
+        lines = [f"{'cumulative (ms)':>16} {'total (ms)':>12} {'calls':>8}  function"]
+        for row in profile.top_functions:
+            lines.append(f"{row['cumulative_time'] * 1000:16.3f} {row['total_time'] * 1000:12.3f} {row['calls']:8}  "
+                         f"{row['function']} ({row['file']}:{row['line']})")
+        self.details.setPlainText("\n".join(lines))
+
+    def export_json(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export runs", "", "JSON (*.json)")
+        if file_name:
+            # Une exception qui sort d'un slot PyQt6 termine l'application : l'erreur est affichée
+            try:
+                with open(file_name, "w") as file:
+                    json.dump([{"run_id": run_id, **profile.to_dict()} for run_id, profile in self.profiles], file,
+                              indent=1)
+            except OSError as error:
+                QMessageBox.warning(self, "Export runs", f"Cannot export the runs to {file_name}:\n{error}")
+
+    def export_pstats(self):
+        profile = self.selected_profile()
+        if profile is None or profile.profiler is None:
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export pstats", f"{profile.method}.prof",
+                                                   "pstats (*.prof *.pstats)")
+        if file_name:
+            try:
+                profile.dump_stats(file_name)
+            except OSError as error:
+                QMessageBox.warning(self, "Export pstats", f"Cannot export the profile to {file_name}:\n{error}")
+
+    def clear(self):
+        self.profiles.clear()
+        self.table.setRowCount(0)
+        self.details.clear()
+        self.export_pstats_button.setEnabled(False)
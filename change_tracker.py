@@ -0,0 +1,90 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class ChangeTracker(QObject):
+    """Coalesce attribute edits before writing them to the edited instance.
+
+    Edits are staged and written together once no edit happened for `delay_ms`, or at the latest `max_delay_ms`
+    after the first staged edit, so property setters and subscribers run once per edit rather than once per
+    keystroke. `commit()` writes the pending edits immediately and `dirty` keeps the names written since creation.
+    When a History is given, every batched write is recorded in it as one undoable entry. Between `hold()` and
+    `release()` (while a method of the instance runs in another thread), edits stay pending and are written by
+    `release()`.
+    """
+
+    # Émis une fois par écriture groupée avec {nom de l'attribut: nouvelle valeur}
+    changed = pyqtSignal(dict)
+
+    def __init__(self, target, delay_ms=150, max_delay_ms=500, history=None, parent=None):
+        super().__init__(parent)
+        self.target = target
+        self.history = history
+        self.max_delay = max_delay_ms / 1000
+        self.pending = {}
+        self.dirty = set()
+        self.held = False
+        self._first_staged = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def stage(self, attr_name, value):
+        self.pending[attr_name] = value
+        now = time.monotonic()
+        if self._first_staged is None:
+            self._first_staged = now
+        if now - self._first_staged >= self.max_delay:
+            self.flush()
+        else:
+            self._timer.start()
+
+    def subscribe(self, callback):
+        self.changed.connect(callback)
+
+    def unsubscribe(self, callback):
+        self.changed.disconnect(callback)
+
+    def flush(self):
+        self._timer.stop()
+        self._first_staged = None
+        if not self.pending or self.held:
+            return {}
+
+        changes, self.pending = self.pending, {}
+        previous = {}
+        for attr_name, value in changes.items():
+            previous[attr_name] = (getattr(self.target, attr_name, None), value)
+            setattr(self.target, attr_name, value)
+        if self.history is not None:
+            self.history.record(self.target, previous)
+        self.dirty.update(changes)
+        self.changed.emit(changes)
+        return changes
+
+    def commit(self):
+        return self.flush()
+
+    def hold(self):
+        self.held = True
+
+    def release(self):
+        self.held = False
+        return self.flush()
+
+    def discard(self):
+        self._timer.stop()
+        self._first_staged = None
+        self.pending = {}
+
+    def is_dirty(self, attr_name=None):
+        if attr_name is None:
+            return bool(self.dirty or self.pending)
+        return attr_name in self.dirty or attr_name in self.pending
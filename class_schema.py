@@ -0,0 +1,274 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import copy
+import importlib
+import inspect
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from inspect import signature, Parameter
+
+# Maximum number of classes kept in the schema cache
+SCHEMA_CACHE_SIZE = 256
+
+# Parameter injected by the method runner (cancellation and progress), never shown as an input
+RUN_CONTEXT_PARAM = "run_context"
+
+# Attribute set by @gui_thread on the methods that must not leave the GUI thread
+GUI_THREAD_ATTR = "_run_in_gui_thread"
+
+
+def gui_thread(method):
+    """Mark a method that uses a GUI toolkit (cv2.imshow for instance): the window runs it on the GUI thread."""
+    setattr(method, GUI_THREAD_ATTR, True)
+    return method
+
+
+@dataclass(frozen=True)
+class ParamSpec:
+    name: str
+    type: object
+    default: object = Parameter.empty
+
+    @property
+    def has_default(self):
+        return self.default is not Parameter.empty
+
+
+@dataclass(frozen=True)
+class MethodSpec:
+    name: str
+    params: tuple = ()
+    accepts_context: bool = False
+    gui_thread: bool = False
+
+    def param(self, name):
+        for param in self.params:
+            if param.name == name:
+                return param
+        return None
+
+
+@dataclass(frozen=True)
+class AttributeSpec:
+    name: str
+    type: object
+
+
+@dataclass(frozen=True)
+class ClassSchema:
+    """Immutable description of the editable fields and public methods of a class."""
+    cls: type
+    attributes: tuple = ()
+    methods: tuple = ()
+    init: MethodSpec = MethodSpec("__init__")
+
+    @property
+    def method_names(self):
+        return [method.name for method in self.methods]
+
+    def method(self, name):
+        for method in self.methods:
+            if method.name == name:
+                return method
+        return None
+
+    def attribute(self, name):
+        for attribute in self.attributes:
+            if attribute.name == name:
+                return attribute
+        return None
+
+
+class SchemaProxy:
+    """Base of the objects standing for instances of `schema_class` (see instance_group.InstanceGroup)."""
+    schema_class = None
+
+
+def get_schema(obj):
+    """Return the cached schema of an instance (or of a class, or of the class a SchemaProxy stands for)."""
+    if isinstance(obj, SchemaProxy):
+        return get_class_schema(obj.schema_class)
+    return get_class_schema(obj if isinstance(obj, type) else type(obj))
+
+
+# Cache LRU borné : classe -> (version, valeurs des dictionnaires, schéma)
+_schemas = OrderedDict()
+_schemas_lock = threading.Lock()
+
+
+def get_class_schema(cls):
+    values, version = _class_version(cls)
+    with _schemas_lock:
+        entry = _schemas.get(cls)
+        if entry is not None and entry[0] == version:
+            _schemas.move_to_end(cls)
+            return entry[2]
+    schema = _build_class_schema(cls)
+    with _schemas_lock:
+        _schemas[cls] = (version, values, schema)
+        _schemas.move_to_end(cls)
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+    return schema
+
+
+def clear_schema_cache():
+    with _schemas_lock:
+        _schemas.clear()
+
+
+def _class_version(cls):
+    # Noms et id() des valeurs des dictionnaires de la MRO et de leurs annotations : un attribut ou une méthode
+    # ajouté, supprimé ou remplacé, ou une annotation modifiée, change la version. L'entrée du cache garde les
+    # valeurs elles-mêmes, aucun id ne peut donc être réutilisé par un objet nouveau tant qu'elle existe
+    values = []
+    version = []
+    for klass in cls.__mro__:
+        namespaces = [vars(klass)]
+        annotations = namespaces[0].get("__annotations__")
+        if isinstance(annotations, dict):
+            namespaces.append(annotations)
+        for namespace in namespaces:
+            items = tuple(namespace.values())
+            values.append(items)
+            version.append(tuple(namespace))
+            version.append(tuple(map(id, items)))
+    return values, tuple(version)
+
+
+def _build_class_schema(cls):
+    annotations = getattr(cls, "__annotations__", {})
+
+    attributes = []
+    for attr_name, attr_type in annotations.items():
+        # Exclure les attributs spéciaux et méthodes
+        if attr_name.startswith("__") or callable(getattr(cls, attr_name, None)):
+            continue
+        attributes.append(AttributeSpec(attr_name, attr_type))
+
+    methods = []
+    for attr_name in dir(cls):
+        if attr_name.startswith("__") or attr_name in annotations:
+            continue
+        if not callable(getattr(cls, attr_name)):
+            continue
+        params = _method_params(cls, attr_name)
+        accepts_context = any(param.name == RUN_CONTEXT_PARAM for param in params)
+        params = tuple(param for param in params if param.name != RUN_CONTEXT_PARAM)
+        in_gui_thread = getattr(getattr(cls, attr_name), GUI_THREAD_ATTR, False) is True
+        methods.append(MethodSpec(attr_name, params, accepts_context, in_gui_thread))
+
+    return ClassSchema(cls, tuple(attributes), tuple(methods), MethodSpec("__init__", _init_params(cls)))
+
+
+def _init_params(cls):
+    try:
+        return _param_specs(signature(cls).parameters.values())
+    except (TypeError, ValueError):
+        return ()
+
+
+def _method_params(cls, method_name):
+    method = getattr(cls, method_name)
+    try:
+        params = list(signature(method).parameters.values())
+    except (TypeError, ValueError):
+        return ()
+
+    # Les fonctions définies dans la classe reçoivent l'instance en premier argument
+    static_attr = inspect.getattr_static(cls, method_name)
+    if inspect.isfunction(static_attr) and params:
+        params = params[1:]
+    return _param_specs(params)
+
+
+def _param_specs(params):
+    specs = []
+    for param in params:
+        if param.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD):
+            continue
+        param_type = param.annotation if param.annotation != Parameter.empty else type(param.default)
+        specs.append(ParamSpec(param.name, param_type, param.default))
+    return tuple(specs)
+
+
+def import_class(path):
+    """Import a class from a "module:QualifiedName" path, e.g. "example_class:ProcessImage"."""
+    module_name, _, qualname = path.partition(":")
+    if not qualname:
+        raise ValueError(f"Expected 'module:ClassName', got {path!r}")
+    obj = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def attribute_spec(cls, path):
+    """Return the AttributeSpec of a dotted attribute path such as "config.angle", following annotated types."""
+    names = path.split(".")
+    for depth, name in enumerate(names):
+        attr_spec = get_class_schema(cls).attribute(name)
+        if attr_spec is None:
+            raise AttributeError(f"{cls.__name__} has no annotated attribute {name!r} (in {path!r})")
+        if depth < len(names) - 1:
+            if not isinstance(attr_spec.type, type):
+                raise AttributeError(f"{path!r}: {name!r} is not a nested class attribute")
+            cls = attr_spec.type
+    return attr_spec
+
+
+def assign_path(obj, path, value):
+    """Set a dotted attribute path on an instance.
+
+    The nested objects along the path are made the instance's own first (see own_attribute), so that the assignment
+    never leaks to the other instances of the class.
+    """
+    *parents, attr_name = path.split(".")
+    for name in parents:
+        obj = own_attribute(obj, name)
+    setattr(obj, attr_name, value)
+
+
+def own_attribute(obj, name):
+    """Return the nested object `obj.name`, first copying it onto `obj` if it is the class level default.
+
+    A default such as ProcessImage.config is shared by every instance that did not assign its own: it is copied
+    (with the configuration objects it holds) before being edited. On an InstanceGroup, each instance gets its own.
+    """
+    if isinstance(obj, SchemaProxy):
+        for instance in obj:
+            own_attribute(instance, name)
+        return getattr(obj, name)
+    child = getattr(obj, name)
+    if child is not None and child is getattr(type(obj), name, None):
+        child = _detached_copy(child, {})
+        setattr(obj, name, child)
+    return child
+
+
+def _detached_copy(obj, copies):
+    # Copie superficielle ; les objets de configuration imbriqués de l'original sont copiés aussi (une seule fois
+    # chacun, pour les graphes cycliques), les autres valeurs (tableaux...) restent partagées
+    if id(obj) in copies:
+        return copies[id(obj)]
+    duplicate = copies[id(obj)] = copy.copy(obj)
+    for attr_spec in get_class_schema(type(obj)).attributes:
+        value = getattr(obj, attr_spec.name, None)
+        if isinstance(attr_spec.type, type) and isinstance(value, attr_spec.type) \
+                and attr_spec.name in getattr(obj, "__dict__", {}) and get_class_schema(type(value)).attributes:
+            setattr(duplicate, attr_spec.name, _detached_copy(value, copies))
+    return duplicate
+
+
+def coerce_value(value, value_type):
+    """Convert a value (typically text from a command line or a JSON document) to an annotated type."""
+    if value_type is bool:
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    if value_type in (int, float, str):
+        return value_type(value)
+    return value
@@ -1,13 +1,65 @@
 import os
+import threading
 import cv2
+import numpy as np
 from datetime import datetime
 
+from image_pipeline import ImagePipeline, IntermediateCache
+
+# Intermediate results of process_with_config and of the live preview, shared by all instances
+intermediate_cache = IntermediateCache()
+
 class Config:
     angle: float = 0
     brightness: float = 0.0
     contrast: float = 1.0
 
 
+# Image operations without side effects, shared by ProcessImage and the live preview
+def rotate(image, angle):
+    (height, width) = image.shape[:2]
+    (center_x, center_y) = (width // 2, height // 2)
+    rotation_matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1.0)
+    return cv2.warpAffine(image, rotation_matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+
+def adjust_contrast(image, contrast):
+    return cv2.convertScaleAbs(image, alpha=contrast, beta=0)
+
+
+def adjust_brightness(image, brightness):
+    return cv2.convertScaleAbs(image, alpha=1, beta=brightness)
+
+
+def show_image(title, image):
+    # HighGUI only works on the main thread (it crashes on macOS otherwise). From a worker thread, the image is
+    # shown by the GUI thread of the window running the method, and not at all without one (RPC server)
+    if threading.current_thread() is threading.main_thread():
+        cv2.imshow(title, image)
+        cv2.waitKey(0)
+    else:
+        from method_runner import post_to_gui_thread
+        post_to_gui_thread(show_image, title, image.copy())
+
+
+def output_file_name(file_path, date=None):
+    # "<input name without extension>_<date>.png", the name used by ProcessImage.save_image
+    file_name = os.path.basename(file_path).split(".")[0]
+    date = date or datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    return f"{file_name}_{date}.png"
+
+
+def config_pipeline(config):
+    # Brightness and contrast are fused into one lookup table, the rotation is applied once at the end
+    return ImagePipeline().brightness(config.brightness).contrast(config.contrast).rotate(config.angle)
+
+
+def apply_config(image, config, is_stale=None, cache=None):
+    # Same chain as ProcessImage.process_with_config; returns None as soon as is_stale() says the result is not needed
+    return config_pipeline(config).run(image, is_stale, cache)
+
+
 # simple class example
 # all parameters from method must be typed
 class ProcessImage:
@@ -15,6 +67,9 @@ class ProcessImage:
     file_path: os.path = None
     config: Config = Config()  # Define attribute as a Config class
     show: bool = True
+    # Shown by the image viewer of the window, refreshed after each method run
+    image: np.ndarray = None
+    original_image: np.ndarray = None
 
     def __init__(self, file_path: os.path = "", show: bool = True):
         self.file_path = file_path
@@ -25,54 +80,55 @@ class ProcessImage:
 
     def load_image(self):
         if os.path.exists(self.file_path):
-            self.image = cv2.imread(self.file_path)
-            self.original_image = self.image.copy()
+            if self.file_path.endswith(".npy"):
+                # Images larger than memory: mapped read-only, never copied (see process_with_config_tiled)
+                self.image = np.load(self.file_path, mmap_mode="r")
+                self.original_image = self.image
+            else:
+                self.image = cv2.imread(self.file_path)
+                self.original_image = self.image.copy()
             if self.show:
-                cv2.imshow("Image Loaded", self.image)
-                cv2.waitKey(0)
+                show_image("Image Loaded", self.image)
 
     def rotate_image(self, angle: float):
         if self.image is not None:
             print(angle)
-            (height, width) = self.image.shape[:2]
-            (center_x, center_y) = (width // 2, height // 2)
-            rotation_matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1.0)
-            self.image = cv2.warpAffine(self.image, rotation_matrix, (width, height), flags=cv2.INTER_LINEAR,
-                                        borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+            self.image = rotate(self.image, angle)
             if self.show:
-                cv2.imshow(f"Image Rotated by {angle} degrees", self.image)
-                cv2.waitKey(0)
+                show_image(f"Image Rotated by {angle} degrees", self.image)
 
     def adjust_contrast(self, contrast: float):
         if self.image is not None:
-            self.image = cv2.convertScaleAbs(self.image, alpha=contrast, beta=0)
+            self.image = adjust_contrast(self.image, contrast)
             if self.show:
-                cv2.imshow(f"Image Contrast Adjusted with scale {contrast}", self.image)
-                cv2.waitKey(0)
+                show_image(f"Image Contrast Adjusted with scale {contrast}", self.image)
 
     def adjust_brightness(self, brightness: float):
         if self.image is not None:
-            self.image = cv2.convertScaleAbs(self.image, alpha=1, beta=brightness)
+            self.image = adjust_brightness(self.image, brightness)
             if self.show:
-                cv2.imshow(f"Image Brightness Adjusted with value {brightness}", self.image)
-                cv2.waitKey(0)
+                show_image(f"Image Brightness Adjusted with value {brightness}", self.image)
 
     def save_image(self):
         if self.image is not None:
-            file_name = self.file_path.split("/")[-1].split(".")[0]
-            current_date = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-            new_file_path = f"{file_name}_{current_date}.png"
+            new_file_path = output_file_name(self.file_path)
             cv2.imwrite(new_file_path, self.image)
             print("Writing on " + os.path.abspath(new_file_path))
 
-    def process_with_config(self):
-        show = self.show
-        self.show = False
-        self.adjust_brightness(self.config.brightness)
-        self.adjust_contrast(self.config.contrast)
-        self.rotate_image(self.config.angle)
+    def process_with_config_tiled(self, output_path: os.path):
+        # Out-of-core variant for .npy images larger than memory: file_path is processed tile by tile to output_path
+        from tiled_processing import process_file
+        process_file(self.file_path, output_path, config_pipeline(self.config))
+
+    def process_with_config(self, from_original: bool = True):
+        # from_original: start from the loaded image, so that re-running after a change of the last stage only (the
+        # angle) reuses the cached result of the previous stages; otherwise the config is applied on top of the
+        # current image, as successive calls of the individual methods would
+        source = self.original_image if from_original and self.original_image is not None else self.image
+        if source is not None:
+            print(self.config.angle)
+            self.image = config_pipeline(self.config).run(source, cache=intermediate_cache)
         self.save_image()
-        self.show = show
 
 
 
@@ -0,0 +1,362 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import importlib
+import os
+import sys
+import typing
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget, QCheckBox, QSpinBox, QDoubleSpinBox, QLineEdit, QHBoxLayout, \
+    QVBoxLayout, QPushButton, QFileDialog, QToolButton
+
+from class_schema import SchemaProxy
+from instance_group import MIXED_TEXT, is_mixed
+
+# Infobulle des champs dont la valeur diffère entre les instances éditées ensemble
+MIXED_TOOLTIP = "Values differ between the edited instances"
+
+
+class FieldEditor:
+    """Editor of one attribute or parameter value.
+
+    `widget` is added to the form, `get()` returns the value converted to the edited type, `set()` displays a value
+    without notifying the callbacks registered with `connect()`, which receive each value entered by the user.
+    A Mixed value (InstanceGroup) is shown by `show_mixed()` until the user enters a value.
+    """
+
+    # L'éditeur affiche lui-même le nom du champ (sinon la fenêtre ajoute un QLabel)
+    shows_label = False
+    # L'éditeur peut servir à saisir un paramètre de méthode
+    supports_params = True
+    # Affiché comme une case à cocher dans la vue virtualisée
+    checkable = False
+
+    def __init__(self, name, value_type, value, parent=None, label=None):
+        self.name = name
+        self.value_type = value_type
+        self._callbacks = []
+        self._updating = False
+        self.widget = self.create_widget(parent, label)
+        if value is not None:
+            self.set(value)
+
+    def create_widget(self, parent, label):
+        raise NotImplementedError
+
+    def get(self):
+        raise NotImplementedError
+
+    def set(self, value):
+        self._updating = True
+        try:
+            if is_mixed(value):
+                self.show_mixed()
+            else:
+                self.show_value(value)
+            self.widget.setToolTip(MIXED_TOOLTIP if is_mixed(value) else "")
+        finally:
+            self._updating = False
+
+    def show_value(self, value):
+        raise NotImplementedError
+
+    def show_mixed(self):
+        pass
+
+    def connect(self, callback):
+        self._callbacks.append(callback)
+
+    def notify(self, *_):
+        if not self._updating:
+            value = self.get()
+            for callback in self._callbacks:
+                callback(value)
+
+    @classmethod
+    def display(cls, value):
+        # Texte affiché dans la vue virtualisée
+        return "" if value is None else str(value)
+
+
+class BoolEditor(FieldEditor):
+    checkable = True
+
+    def create_widget(self, parent, label):
+        self.shows_label = label is not None
+        checkbox = QCheckBox(label or "", parent)
+        checkbox.stateChanged.connect(self.notify)
+        return checkbox
+
+    def get(self):
+        return self.widget.isChecked()
+
+    def show_value(self, value):
+        self.widget.setTristate(False)
+        self.widget.setChecked(bool(value))
+
+    def show_mixed(self):
+        self.widget.setTristate(True)
+        self.widget.setCheckState(Qt.CheckState.PartiallyChecked)
+
+    def notify(self, *_):
+        # Un clic sur une case mixte choisit une valeur pour toutes les instances
+        if not self._updating:
+            self.widget.setTristate(False)
+        super().notify()
+
+
+class IntEditor(FieldEditor):
+    def create_widget(self, parent, label):
+        spinbox = QSpinBox(parent)
+        spinbox.setMinimum(-2147483648)
+        spinbox.setMaximum(2147483647)
+        spinbox.setSingleStep(1)
+        spinbox.valueChanged.connect(self.notify)
+        return spinbox
+
+    def get(self):
+        return int(self.widget.value())
+
+    def show_value(self, value):
+        self.widget.setSpecialValueText("")
+        self.widget.setValue(int(value))
+
+    def show_mixed(self):
+        # Le texte spécial remplace la valeur minimale jusqu'à la première saisie
+        self.widget.setSpecialValueText(MIXED_TEXT)
+        self.widget.setValue(self.widget.minimum())
+
+
+class FloatEditor(FieldEditor):
+    def create_widget(self, parent, label):
+        spinbox = QDoubleSpinBox(parent)
+        spinbox.setMinimum(-sys.float_info.max)
+        spinbox.setMaximum(sys.float_info.max)
+        spinbox.setSingleStep(0.1)
+        spinbox.valueChanged.connect(self.notify)
+        return spinbox
+
+    def get(self):
+        return float(self.widget.value())
+
+    def show_value(self, value):
+        self.widget.setSpecialValueText("")
+        self.widget.setValue(float(value))
+
+    def show_mixed(self):
+        self.widget.setSpecialValueText(MIXED_TEXT)
+        self.widget.setValue(self.widget.minimum())
+
+
+class StrEditor(FieldEditor):
+    def create_widget(self, parent, label):
+        line_edit = QLineEdit(parent)
+        line_edit.textChanged.connect(self.notify)
+        return line_edit
+
+    def get(self):
+        return self.widget.text()
+
+    def show_value(self, value):
+        self.widget.setPlaceholderText("")
+        self.widget.setText(str(value))
+
+    def show_mixed(self):
+        self.widget.setPlaceholderText(MIXED_TEXT)
+        self.widget.clear()
+
+
+class FilePathEditor(FieldEditor):
+    def create_widget(self, parent, label):
+        # QLineEdit et bouton Browse dans un même conteneur
+        widget = QWidget(parent)
+        self.line_edit = QLineEdit()
+        self.line_edit.textChanged.connect(self.notify)
+        file_dialog_button = QPushButton("Browse")
+        file_dialog_button.clicked.connect(self.open_file_dialog)
+        layout = QHBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.line_edit)
+        layout.addWidget(file_dialog_button)
+        widget.setFocusProxy(self.line_edit)
+        return widget
+
+    def open_file_dialog(self):
+        file_name, _ = QFileDialog.getOpenFileName(self.widget, "Select File")
+        if file_name:
+            self.line_edit.setText(file_name)
+
+    def get(self):
+        return self.line_edit.text()
+
+    def show_value(self, value):
+        self.line_edit.setPlaceholderText("")
+        self.line_edit.setText(os.fspath(value))
+
+    def show_mixed(self):
+        self.line_edit.setPlaceholderText(MIXED_TEXT)
+        self.line_edit.clear()
+
+
+class PathEditor(FilePathEditor):
+    # pathlib n'est importé que par les classes qui l'utilisent : la valeur est reconstruite avec le type annoté
+    def get(self):
+        return self.value_type(self.line_edit.text())
+
+
+class NestedEditor(FieldEditor):
+    """Collapsible section showing the attributes of a nested object inline.
+
+    The section content is built by `on_expand(layout)`, set by the window, the first time the section is expanded
+    and kept afterwards; `reset()` drops it so that it is rebuilt for a new object.
+    """
+
+    shows_label = True
+    supports_params = False
+
+    def create_widget(self, parent, label):
+        self.on_expand = None
+        self.built = False
+        widget = QWidget(parent)
+        self.toggle_button = QToolButton()
+        self.toggle_button.setText(self.name)
+        self.toggle_button.setCheckable(True)
+        self.toggle_button.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.toggle_button.setArrowType(Qt.ArrowType.RightArrow)
+        self.toggle_button.setStyleSheet("QToolButton { border: none; }")
+        self.toggle_button.toggled.connect(self.set_expanded)
+
+        # Contenu indenté, construit seulement à la première ouverture
+        self.body = QWidget()
+        self.body_layout = QVBoxLayout(self.body)
+        self.body_layout.setContentsMargins(16, 0, 0, 0)
+        self.body.setVisible(False)
+
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.toggle_button)
+        layout.addWidget(self.body)
+        return widget
+
+    def set_expanded(self, expanded):
+        if expanded and not self.built and self.on_expand is not None:
+            self.built = True
+            self.on_expand(self.body_layout)
+        self.toggle_button.setArrowType(Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow)
+        self.body.setVisible(expanded)
+
+    def expand(self):
+        self.toggle_button.setChecked(True)
+
+    def is_expanded(self):
+        return self.toggle_button.isChecked()
+
+    def reset(self):
+        while self.body_layout.count():
+            item = self.body_layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+        self.built = False
+        if self.is_expanded():
+            self.set_expanded(True)
+
+    def get(self):
+        return None
+
+    def show_value(self, value):
+        pass
+
+    @classmethod
+    def display(cls, value):
+        if is_mixed(value):
+            return MIXED_TEXT
+        if isinstance(value, SchemaProxy):
+            return f"{value.schema_class.__name__} x {len(value)}"  # objets imbriqués d'un InstanceGroup
+        return "None" if value is None else type(value).__name__
+
+
+def str_to_list(value):
+    return [x.strip() for x in value.split(',')]
+
+
+# Éditeurs indexés par type (ou par clé comme 'filepath'), éditeurs chargés au premier usage indexés par
+# "module.NomQualifié" du type, et cache de la résolution : un seul accès dictionnaire par champ
+_editors = {}
+_lazy_editors = {}
+_resolved = {}
+
+
+def register_editor(type_key, editor_class):
+    """Use `editor_class` for attributes and parameters annotated with `type_key` (or with a subclass of it)."""
+    _editors[type_key] = editor_class
+    _resolved.clear()
+
+
+def register_lazy_editor(type_name, editor_path):
+    """Register an editor by names only, e.g. ("numpy.ndarray", "ndarray_editor:NDArrayEditor").
+
+    Neither the edited type nor the editor module is imported until a field of that type is displayed.
+    """
+    _lazy_editors[type_name] = editor_path
+    _resolved.clear()
+
+
+def editor_for(value_type, value=None):
+    """Return the FieldEditor subclass for an annotated type, or None if the type cannot be edited.
+
+    Generic aliases such as list[int] are edited by the editor of their origin (list).
+    """
+    try:
+        return _resolved[value_type]
+    except KeyError:
+        pass
+    except TypeError:
+        # Annotation non hachable : absente du registre, le type de la valeur décide
+        return _resolve(type(value)) if value is not None else None
+
+    editor_class = _resolve(value_type)
+    if editor_class is None:
+        # Annotation inconnue : le type de la valeur décide ; un échec n'est jamais mis en cache, un appel suivant
+        # avec une valeur doit pouvoir trouver un éditeur
+        return _resolve(type(value)) if value is not None else None
+    _resolved[value_type] = editor_class
+    return editor_class
+
+
+def _resolve(value_type):
+    if not isinstance(value_type, type):
+        editor_class = _editors.get(value_type)
+        origin = typing.get_origin(value_type)
+        if editor_class is None and isinstance(origin, type):
+            # Alias générique (list[int], typing.List[int]...) : éditeur du type d'origine
+            return _resolve(origin)
+        return editor_class
+    for klass in value_type.__mro__:
+        editor_class = _editors.get(klass)
+        if editor_class is not None:
+            return editor_class
+        editor_path = _lazy_editors.get(f"{klass.__module__}.{klass.__qualname__}")
+        if editor_path is not None:
+            module_name, _, editor_name = editor_path.partition(":")
+            editor_class = getattr(importlib.import_module(module_name), editor_name)
+            _editors[klass] = editor_class
+            return editor_class
+    return None
+
+
+register_editor(bool, BoolEditor)
+register_editor(int, IntEditor)
+register_editor(float, FloatEditor)
+register_editor(str, StrEditor)
+register_editor('filepath', FilePathEditor)
+register_editor(os.path, FilePathEditor)
+# Toute autre classe est un objet imbriqué configurable
+register_editor(object, NestedEditor)
+register_lazy_editor("pathlib.PurePath", "field_editors:PathEditor")
+register_lazy_editor("pathlib._local.PurePath", "field_editors:PathEditor")  # Python 3.13+
+register_lazy_editor("numpy.ndarray", "ndarray_editor:NDArrayEditor")
+# Listes et tuples : table typée, NumPy n'est importé qu'au premier champ de ce type
+register_lazy_editor("builtins.list", "sequence_editor:SequenceEditor")
+register_lazy_editor("builtins.tuple", "sequence_editor:SequenceEditor")
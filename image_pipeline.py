@@ -0,0 +1,260 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import itertools
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+_IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+_IDENTITY_MATRIX = np.eye(3)
+
+# Taille maximale par défaut des images intermédiaires gardées par un IntermediateCache
+INTERMEDIATE_CACHE_BYTES = 512 * 1024 ** 2
+
+# Numéros des tableaux en mémoire identifiés par un IntermediateCache, jamais réutilisés
+_array_numbers = itertools.count()
+
+
+@dataclass(frozen=True)
+class PointOperation:
+    """Per-pixel operation saturate(|alpha * x + beta|), as computed by cv2.convertScaleAbs."""
+    name: str
+    alpha: float = 1.0
+    beta: float = 0.0
+
+    def apply(self, image, dst=None):
+        return cv2.convertScaleAbs(image, dst, self.alpha, self.beta)
+
+
+@dataclass(frozen=True)
+class RotateOperation:
+    """Rotation by `angle` degrees around the image center, keeping the image size."""
+    name: str
+    angle: float = 0.0
+    scale: float = 1.0
+
+    def matrix(self, shape):
+        height, width = shape[:2]
+        return cv2.getRotationMatrix2D((width // 2, height // 2), self.angle, self.scale)
+
+
+class ImagePipeline:
+    """Declarative chain of image operations, e.g. ImagePipeline().brightness(10).contrast(1.2).rotate(30).
+
+    `run()` fuses consecutive point operations into one lookup table applied in a single pass, composes consecutive
+    rotations into one warp and skips the operations that leave the image unchanged. Intermediate results are
+    written alternately to two buffers allocated by the call, one of which becomes the output, so a chain holds at
+    most two image buffers besides its input, however many operations it contains, and none once it returns. The
+    output is always a new array (or the input itself when every operation is an identity). Point operations give
+    exactly the same result as the sequential cv2.convertScaleAbs calls.
+    """
+
+    def __init__(self, operations=()):
+        self.operations = tuple(operations)
+
+    def then(self, operation):
+        return ImagePipeline(self.operations + (operation,))
+
+    def brightness(self, brightness):
+        return self.then(PointOperation("brightness", 1.0, float(brightness)))
+
+    def contrast(self, contrast):
+        return self.then(PointOperation("contrast", float(contrast), 0.0))
+
+    def rotate(self, angle):
+        return self.then(RotateOperation("rotate", float(angle)))
+
+    def stages(self, image):
+        # Étapes fusionnées pour cette image : (type, valeur, nombre d'opérations couvertes depuis le début)
+        # avec ("lut", table) / ("scale", opération) / ("warp", matrice 2x3)
+        stages = []
+        uint8 = image.dtype == np.uint8
+        for end, operation in enumerate(self.operations, 1):
+            previous = stages[-1] if stages else None
+            if isinstance(operation, PointOperation):
+                if not uint8:
+                    # convertScaleAbs produit de l'uint8 : les opérations suivantes passent par une table
+                    stages.append(["scale", operation, end])
+                    uint8 = True
+                elif previous is not None and previous[0] == "lut":
+                    previous[1:] = [previous[1] + (operation,), end]
+                else:
+                    stages.append(["lut", (operation,), end])
+            else:
+                matrix = np.vstack([operation.matrix(image.shape), [0, 0, 1]])
+                if previous is not None and previous[0] == "warp":
+                    previous[1:] = [matrix @ previous[1], end]
+                else:
+                    stages.append(["warp", matrix, end])
+
+        compiled = []
+        for kind, value, end in stages:
+            if kind == "lut":
+                value = fused_lut(value)
+                if not np.array_equal(value, _IDENTITY_LUT):
+                    compiled.append((kind, value, end))
+            elif kind == "warp":
+                if not np.allclose(value, _IDENTITY_MATRIX):
+                    compiled.append((kind, value[:2], end))
+            else:
+                compiled.append((kind, value, end))
+        return compiled
+
+    def run(self, image, is_stale=None, cache=None):
+        """Apply the chain to `image`; returns None as soon as is_stale() says the result is not needed.
+
+        With an IntermediateCache, the chain resumes from the result of its longest prefix already computed for the
+        same source image, and the results of its stages are added to the cache (except the last one, which is
+        returned). Each stage then writes to a new array instead of the alternated buffers.
+        """
+        stages = self.stages(image)
+        first = 0
+        if cache is not None:
+            fingerprint = cache.fingerprint(image)
+            for index in range(len(stages) - 1, -1, -1):
+                cached = cache.get((fingerprint, self.operations[:stages[index][2]]))
+                if cached is not None:
+                    image, first = cached, index + 1
+                    break
+            if first == len(stages) and first:
+                return image.copy()  # les tableaux du cache sont en lecture seule
+        if not stages:
+            return image
+
+        # Tampons alternés de cet appel : celui de la dernière étape est rendu, l'autre est libéré au retour
+        buffers = [None, None]
+        for index in range(first, len(stages)):
+            kind, value, end = stages[index]
+            if is_stale is not None and is_stale():
+                return None
+            # La dernière étape écrit dans le tampon 0, qui est rendu ; les précédentes alternent entre les deux
+            dtype = image.dtype if kind == "warp" else np.uint8
+            last = index == len(stages) - 1
+            if cache is not None and not last:
+                dst = np.empty(image.shape, dtype)
+            else:
+                slot = (len(stages) - 1 - index) % 2
+                if buffers[slot] is None or buffers[slot].dtype != dtype:
+                    # Changement de type (image non uint8) : l'ancien tampon est libéré avant d'allouer le nouveau
+                    dst = buffers[slot] = None
+                    buffers[slot] = np.empty(image.shape, dtype)
+                dst = buffers[slot]
+
+            if kind == "lut":
+                cv2.LUT(image, value, dst=dst)
+            elif kind == "scale":
+                value.apply(image, dst)
+            else:
+                height, width = image.shape[:2]
+                cv2.warpAffine(image, value, (width, height), dst=dst, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+            image = dst
+            if cache is not None and not last:
+                cache.put((fingerprint, self.operations[:end]), image)
+        return image
+
+    def __repr__(self):
+        return f"ImagePipeline({list(self.operations)!r})"
+
+
+def _mapped_file_fingerprint(image):
+    # Tableau projeté depuis un fichier, ou vue d'un tel tableau : (fichier, date, taille, position dans le fichier,
+    # forme, pas, type) ; None pour un tableau en mémoire
+    base = image
+    while isinstance(base, np.ndarray) and not isinstance(base, np.memmap):
+        base = base.base
+    if not isinstance(base, np.memmap):
+        return None
+    while isinstance(base.base, np.memmap):
+        base = base.base
+    if base.filename is None:
+        return None
+    try:
+        stat = os.stat(base.filename)
+    except OSError:
+        return None
+    position = base.offset + image.__array_interface__["data"][0] - base.__array_interface__["data"][0]
+    return ("file", base.filename, stat.st_mtime_ns, stat.st_size, position, image.shape, image.strides,
+            image.dtype.str)
+
+
+@lru_cache(maxsize=256)
+def fused_lut(operations):
+    # Table 8 bits obtenue en appliquant les opérations à ses 256 entrées : même arrondi que l'image entière
+    lut = _IDENTITY_LUT
+    for operation in operations:
+        lut = operation.apply(lut).reshape(256)
+    return lut
+
+
+class IntermediateCache:
+    """LRU cache of intermediate images, bounded by the total size of the cached arrays in bytes.
+
+    Keys are (source fingerprint, operations applied so far). Cached arrays are made read-only. Computing a
+    fingerprint never reads the pixels: an array memory-mapped from a file (np.load with mmap_mode) is identified by
+    the file path, modification time and size and by its position in the file, so that reloading the same .npy
+    hits the cache; any other array is identified as an object, with a number given on first use and remembered
+    while it is alive. Sources must therefore not be modified in place, which the methods of ProcessImage never do.
+    """
+
+    def __init__(self, max_bytes=INTERMEDIATE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, image):
+        mapped = _mapped_file_fingerprint(image)
+        if mapped is not None:
+            return mapped  # recalculé à chaque appel : le fichier peut changer pendant que le tableau existe
+        with self._lock:
+            key = id(image)
+            known = self._fingerprints.get(key)
+            if known is not None and known[0]() is image:
+                return known[1]
+            fingerprint = ("array", next(_array_numbers))
+            self._fingerprints[key] = (weakref.ref(image, lambda _: self._fingerprints.pop(key, None)), fingerprint)
+        return fingerprint
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        if image.nbytes > self.max_bytes:
+            return
+        image.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[key] = image
+            self.nbytes += image.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,176 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import sys
+import threading
+
+import cv2
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+from Class_GUI_maker import DynamicConfigWindow
+from example_class import Config, ProcessImage, apply_config, intermediate_cache
+from ndarray_viewer import NDArrayViewer
+
+# Plus grand côté de l'image réduite utilisée pendant l'édition
+PROXY_SIZE = 1024
+# Délai sans modification avant de lancer le rendu en pleine résolution
+FULL_RESOLUTION_DELAY_MS = 400
+
+
+def make_proxy(image, max_size=PROXY_SIZE):
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def config_values(config):
+    # Copie figée des paramètres : le rendu ne lit jamais la configuration en cours d'édition
+    values = Config()
+    values.angle, values.brightness, values.contrast = config.angle, config.brightness, config.contrast
+    return values
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, preview, generation, image, values, full_resolution):
+        super().__init__()
+        self.preview = preview
+        self.generation = generation
+        self.image = image
+        self.values = values
+        self.full_resolution = full_resolution
+
+    def run(self):
+        result = None
+        try:
+            result = apply_config(self.image, self.values, is_stale=lambda: self.preview.is_stale(self.generation),
+                                  cache=intermediate_cache)
+        except Exception as error:
+            self.preview.failed.emit(f"{type(error).__name__}: {error}")
+        finally:
+            # Toujours appelé : sinon l'aperçu resterait occupé et ne serait plus jamais rendu
+            self.preview._render_done(self.generation, result, self.full_resolution)
+
+
+class LivePreview(QObject):
+    """Render the Config of a ProcessImage on a downsampled proxy each time it changes.
+
+    Only the latest parameters are rendered: a request made while a render is running replaces any request still
+    waiting, and results older than the latest request are dropped. Once no request came for
+    FULL_RESOLUTION_DELAY_MS, the full resolution image is rendered in the background.
+    """
+
+    # Émis avec l'image rendue et True si elle est en pleine résolution
+    rendered = pyqtSignal(object, bool)
+    # Émis avec le message de l'erreur d'un rendu
+    failed = pyqtSignal(str)
+
+    def __init__(self, process_image, proxy_size=PROXY_SIZE, full_resolution_delay_ms=FULL_RESOLUTION_DELAY_MS,
+                 parent=None):
+        super().__init__(parent)
+        self.process_image = process_image
+        self.source = process_image.original_image
+        if self.source is None:
+            raise ValueError(f"No image loaded from {process_image.file_path!r}")
+        self.proxy = make_proxy(self.source, proxy_size)
+
+        # Un seul rendu réduit et un seul rendu pleine résolution à la fois
+        self.proxy_pool = QThreadPool(self)
+        self.proxy_pool.setMaxThreadCount(1)
+        self.full_pool = QThreadPool(self)
+        self.full_pool.setMaxThreadCount(1)
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._proxy_busy = False
+        self._waiting = None
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(full_resolution_delay_ms)
+        self._idle_timer.timeout.connect(self.render_full_resolution)
+
+    def is_stale(self, generation):
+        return generation != self._generation
+
+    def request(self, *_):
+        values = config_values(self.process_image.config)
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._proxy_busy:
+                self._waiting = (generation, values)
+                generation = None
+            else:
+                self._proxy_busy = True
+        if generation is not None:
+            self.proxy_pool.start(_RenderTask(self, generation, self.proxy, values, False))
+        self._idle_timer.start()
+
+    def render_full_resolution(self):
+        if self.proxy is self.source:
+            return  # l'aperçu est déjà en pleine résolution
+        values = config_values(self.process_image.config)
+        self.full_pool.start(_RenderTask(self, self._generation, self.source, values, True))
+
+    def _render_done(self, generation, result, full_resolution):
+        next_task = None
+        if not full_resolution:
+            with self._lock:
+                if self._waiting is not None:
+                    next_generation, values = self._waiting
+                    self._waiting = None
+                    next_task = _RenderTask(self, next_generation, self.proxy, values, False)
+                else:
+                    self._proxy_busy = False
+        if next_task is not None:
+            self.proxy_pool.start(next_task)
+
+        # Un rendu dépassé par une demande plus récente n'est jamais affiché
+        if result is not None and not self.is_stale(generation):
+            self.rendered.emit(result, full_resolution)
+
+
+class LivePreviewWidget(NDArrayViewer):
+    def __init__(self, preview):
+        super().__init__()
+        self.setWindowTitle("Live preview")
+        self.resize(640, 480)
+        preview.rendered.connect(self.show_image)
+        preview.failed.connect(self.show_error)
+
+    def show_image(self, image, full_resolution):
+        # Affichage sans copie : le viewer garde une référence au tableau rendu
+        self.set_array(image)
+        self.setWindowTitle("Live preview")
+        self.setToolTip("Full resolution" if full_resolution else "Preview")
+
+    def show_error(self, message):
+        # La dernière image rendue reste affichée, l'erreur est indiquée dans la barre de titre
+        self.setWindowTitle(f"Live preview - render failed: {message}")
+        self.setToolTip(message)
+
+
+def open_live_preview(process_image):
+    if QApplication.instance() is None:
+        QApplication(sys.argv)
+    preview = LivePreview(process_image)
+    widget = LivePreviewWidget(preview)
+    widget.show()
+    preview.request()
+
+    # La fenêtre de configuration est modale : elle rend la main une fois fermée
+    window = DynamicConfigWindow(process_image.config, execute_method=False, on_change=preview.request)
+    preview.proxy_pool.waitForDone()
+    preview.full_pool.waitForDone()
+    return window.get_config()
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    process_image = ProcessImage(sys.argv[1], show=False)
+    config = open_live_preview(process_image)
@@ -0,0 +1,286 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from class_schema import SchemaProxy, get_class_schema, RUN_CONTEXT_PARAM
+
+# Texte affiché par les éditeurs à la place d'une valeur qui diffère entre les instances
+MIXED_TEXT = "<mixed>"
+
+# Valeurs comparées par égalité pour décider si un attribut est commun à toutes les instances ; les autres (tableaux
+# NumPy, objets) sont comparées par identité
+_COMPARED_BY_VALUE = (bool, int, float, complex, str, bytes, list, tuple, dict)
+# Conteneurs mutables copiés pour chaque instance quand une même valeur est affectée à tout le groupe
+_COPIED_PER_INSTANCE = (list, dict, set, bytearray)
+
+
+class Mixed:
+    """Value of an attribute that differs between the instances of an InstanceGroup.
+
+    `values` holds the value of each instance, in order. Assigning a Mixed to the group gives each instance its own
+    value back, which is how undo and snapshots restore a batch edit.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = tuple(values)
+
+    def __repr__(self):
+        return MIXED_TEXT
+
+
+def is_mixed(value):
+    return isinstance(value, Mixed)
+
+
+def fill_missing(value, factory):
+    # Objet imbriqué vide : créé avec factory(), pour chaque instance d'un groupe qui n'en a pas
+    if value is None:
+        return factory()
+    if is_mixed(value):
+        return Mixed(factory() if item is None else item for item in value.values)
+    return value
+
+
+def _same(first, other):
+    if first is other:
+        return True
+    if type(first) is not type(other) or not isinstance(first, _COMPARED_BY_VALUE):
+        return False
+    try:
+        return bool(first == other)
+    except (TypeError, ValueError):
+        return False  # conteneurs de tableaux NumPy
+
+
+class GroupResult:
+    """Results of a method run on every instance of a group, in the order of the instances.
+
+    `errors` maps the index of each instance whose call raised to the exception; its result is None.
+    """
+
+    def __init__(self, results, errors):
+        self.results = results
+        self.errors = errors
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def __repr__(self):
+        text = f"{len(self.results) - len(self.errors)}/{len(self.results)} ok"
+        if self.errors:
+            index, error = next(iter(self.errors.items()))
+            text += f", {len(self.errors)} failed (#{index}: {error!r})"
+        values = [result for index, result in enumerate(self.results) if index not in self.errors]
+        if values and any(value is not None for value in values):
+            text += f", results {values[:3]!r}" + ("..." if len(values) > 3 else "")
+        return text
+
+
+class _MemberContext:
+    # run_context d'une instance : annulation commune, progression moyenne de toutes les instances
+    def __init__(self, context, index, progress, lock):
+        self._context = context
+        self._index = index
+        self._progress = progress
+        self._lock = lock
+
+    @property
+    def run_id(self):
+        return self._context.run_id
+
+    @property
+    def cancelled(self):
+        return self._context.cancelled
+
+    def check(self):
+        self._context.check()
+
+    def report(self, progress, message=""):
+        with self._lock:
+            self._progress[self._index] = float(progress)
+            total = sum(self._progress) / len(self._progress)
+        self._context.report(total, message)
+
+
+class GroupMethod:
+    """Method of the instances of a group; calling it runs it on every instance (see InstanceGroup.apply)."""
+
+    def __init__(self, group, name):
+        self.group = group
+        self.name = name
+        self.__name__ = name
+
+    def __call__(self, *args, **kwargs):
+        run_context = kwargs.pop(RUN_CONTEXT_PARAM, None)
+        return self.group.apply(self.name, args, kwargs, run_context)
+
+
+class InstanceGroup(SchemaProxy):
+    """Several instances of one class edited as a single object.
+
+    Reading an attribute returns its value when it is the same on every instance, a Mixed otherwise; the nested
+    objects of an annotated attribute are returned as a nested InstanceGroup. Assigning a value writes it to every
+    instance (small mutable containers are copied for each one, as is a single nested configuration object), while
+    a Mixed or an InstanceGroup of the same length gives each instance its own value. Calling a method runs it on
+    every instance on a thread pool of `workers` threads and returns a GroupResult.
+    """
+
+    def __init__(self, instances, workers=None):
+        instances = list(instances)
+        if not instances:
+            raise ValueError("an InstanceGroup needs at least one instance")
+        classes = {type(instance) for instance in instances}
+        if len(classes) > 1:
+            raise TypeError("instances of different classes: " + ", ".join(sorted(cls.__name__ for cls in classes)))
+        schema_class = classes.pop()
+        schema = get_class_schema(schema_class)
+        object.__setattr__(self, "instances", instances)
+        object.__setattr__(self, "schema_class", schema_class)
+        object.__setattr__(self, "_schema", schema)
+        # Par défaut comme ThreadPoolExecutor : les méthodes attendent souvent des fichiers ou libèrent le GIL
+        # (OpenCV, NumPy), un thread par cœur ne suffit pas à exécuter les instances en parallèle
+        object.__setattr__(self, "workers", workers or min(len(instances), 32, (os.cpu_count() or 1) + 4))
+        # Schéma résolu une fois pour toutes les lectures : attributs indexés par nom, et pour chacun le type des
+        # objets imbriqués rendus comme groupe (None sinon), déterminé à la première lecture
+        object.__setattr__(self, "_attributes", {attr_spec.name: attr_spec for attr_spec in schema.attributes})
+        object.__setattr__(self, "_nested_types", {})
+        # Groupes imbriqués déjà rendus, réutilisés tant que les objets des instances ne changent pas
+        object.__setattr__(self, "_nested", {})
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __iter__(self):
+        return iter(self.instances)
+
+    def __getitem__(self, index):
+        return self.instances[index]
+
+    def __repr__(self):
+        return f"InstanceGroup({len(self.instances)} x {self.schema_class.__qualname__})"
+
+    def __getattr__(self, name):
+        # Appelé seulement pour les noms qui ne sont pas des attributs du groupe lui-même
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attr_spec = self._attributes.get(name)
+        if attr_spec is None and (self._schema.method(name) is not None
+                                  or callable(getattr(self.schema_class, name, None))):
+            return GroupMethod(self, name)
+
+        values = [getattr(instance, name) for instance in self.instances]
+        first = values[0]
+        nested_type = self._nested_type(attr_spec)
+        if nested_type is not None and all(isinstance(value, nested_type) for value in values):
+            nested = self._nested.get(name)
+            if nested is None or any(member is not value for member, value in zip(nested.instances, values)):
+                nested = self._nested[name] = InstanceGroup(values, self.workers)
+            return nested
+        if all(_same(first, value) for value in values[1:]):
+            return first
+        return Mixed(values)
+
+    def _nested_type(self, attr_spec):
+        # Classe annotée dont les objets ont eux-mêmes des attributs éditables
+        if attr_spec is None:
+            return None
+        try:
+            return self._nested_types[attr_spec.name]
+        except KeyError:
+            pass
+        nested_type = attr_spec.type if isinstance(attr_spec.type, type) \
+            and get_class_schema(attr_spec.type).attributes else None
+        self._nested_types[attr_spec.name] = nested_type
+        return nested_type
+
+    def __setattr__(self, name, value):
+        if isinstance(value, (Mixed, InstanceGroup)):
+            values = value.values if isinstance(value, Mixed) else value.instances
+            if len(values) != len(self.instances):
+                raise ValueError(f"{len(values)} values for a group of {len(self.instances)} instances")
+            for instance, item in zip(self.instances, values):
+                setattr(instance, name, item)
+            return
+
+        # Un seul objet de configuration imbriqué : chaque instance reçoit le sien
+        nested = get_class_schema(type(value)).attributes if value is not None \
+            and not isinstance(value, _COMPARED_BY_VALUE) and hasattr(value, "__dict__") else ()
+        for index, instance in enumerate(self.instances):
+            if index and (isinstance(value, _COPIED_PER_INSTANCE) or nested):
+                setattr(instance, name, copy.copy(value))
+            else:
+                setattr(instance, name, value)
+
+    def apply(self, method_name, args=(), kwargs=None, run_context=None):
+        """Call `method_name(*args, **kwargs)` on every instance in parallel and return a GroupResult.
+
+        With a run_context (the method declares one), each instance gets a context sharing its cancellation and
+        reporting the mean progress of all instances; otherwise progress is reported as instances complete.
+        Exceptions raised by an instance are collected in the result, cancellation stops the whole run. Methods
+        marked with class_schema.gui_thread run one instance after the other in the calling thread.
+        """
+        kwargs = dict(kwargs or {})
+        method_spec = self._schema.method(method_name)
+        accepts_context = run_context is not None and method_spec is not None and method_spec.accepts_context
+        progress = [0.0] * len(self.instances)
+        lock = threading.Lock()
+
+        def call(index, instance):
+            if run_context is not None:
+                run_context.check()
+            call_kwargs = kwargs
+            if accepts_context:
+                call_kwargs = {**kwargs, RUN_CONTEXT_PARAM: _MemberContext(run_context, index, progress, lock)}
+            return getattr(instance, method_name)(*args, **call_kwargs)
+
+        results = [None] * len(self.instances)
+        errors = {}
+        if method_spec is not None and method_spec.gui_thread:
+            for index, instance in enumerate(self.instances):
+                try:
+                    results[index] = call(index, instance)
+                except Exception as error:
+                    errors[index] = error
+                if run_context is not None:
+                    run_context.check()
+                    if not accepts_context:
+                        run_context.report((index + 1) / len(results), f"{index + 1}/{len(results)} instances")
+            return GroupResult(results, errors)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="group") as executor:
+            futures = {executor.submit(call, index, instance): index for index, instance in enumerate(self.instances)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1)
+                if run_context is not None and run_context.cancelled:
+                    for future in pending:
+                        future.cancel()
+                    run_context.check()
+                for future in done:
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                    except Exception as error:
+                        errors[index] = error
+                if done and run_context is not None and not accepts_context:
+                    finished = len(futures) - len(pending)
+                    run_context.report(finished / len(futures), f"{finished}/{len(futures)} instances")
+        errors = dict(sorted(errors.items()))
+        return GroupResult(results, errors)
@@ -0,0 +1,205 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import contextlib
+import itertools
+import threading
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from class_schema import RUN_CONTEXT_PARAM
+
+
+# Instances ayant une exécution en cours (id -> nombre d'exécutions), toutes fenêtres confondues
+_running = {}
+_running_lock = threading.Lock()
+
+
+def is_running(owner):
+    """Return True while a MethodRunner runs a method of `owner`."""
+    with _running_lock:
+        return id(owner) in _running
+
+
+class _GuiPoster(QObject):
+    # Vit dans le thread de l'interface : les appels émis depuis un autre thread y sont mis en file
+    posted = pyqtSignal(object, tuple)
+
+    def __init__(self):
+        super().__init__()
+        self.posted.connect(self.call)
+
+    def call(self, function, args):
+        function(*args)
+
+
+_gui_poster = None
+
+
+def post_to_gui_thread(function, *args):
+    """Call `function(*args)` later on the GUI thread, without waiting for it.
+
+    Returns False, without calling it, when no MethodRunner has been created (no GUI thread to post to).
+    """
+    if _gui_poster is None:
+        return False
+    _gui_poster.posted.emit(function, args)
+    return True
+
+
+class RunCancelled(Exception):
+    """Raised by RunContext.check() when the run has been cancelled."""
+
+
+class RunContext:
+    """Handle passed to methods declaring a `run_context` parameter.
+
+    The method polls `cancelled` (or calls `check()`) to stop early and calls `report()` to publish its progress.
+    """
+
+    def __init__(self, run_id, runner):
+        self.run_id = run_id
+        self._runner = runner
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check(self):
+        if self._cancel_event.is_set():
+            raise RunCancelled()
+
+    def report(self, progress, message=""):
+        # Les signaux Qt sont thread-safe : la connexion est mise en file vers le thread de l'interface
+        self._runner.progress.emit(self.run_id, float(progress), message)
+
+
+class _MethodTask(QRunnable):
+    def __init__(self, runner, context, method, args, kwargs, profiler=None):
+        super().__init__()
+        self.runner = runner
+        self.context = context
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.profiler = profiler
+
+    def run(self):
+        runner, run_id = self.runner, self.context.run_id
+        if self.context.cancelled:
+            runner._task_done(run_id)
+            runner.cancelled.emit(run_id)
+            return
+
+        runner.started.emit(run_id)
+        try:
+            try:
+                with self.profiler or contextlib.nullcontext():
+                    result = self.method(*self.args, **self.kwargs)
+            finally:
+                if self.profiler is not None:
+                    runner.profiled.emit(run_id, self.profiler.profile)
+        except RunCancelled:
+            runner._task_done(run_id)
+            runner.cancelled.emit(run_id)
+        except Exception as error:
+            runner._task_done(run_id)
+            runner.failed.emit(run_id, error, traceback.format_exc())
+        else:
+            runner._task_done(run_id)
+            runner.finished.emit(run_id, result)
+
+
+class MethodRunner(QObject):
+    """Execute methods on a private QThreadPool and report back to the GUI thread through signals.
+
+    Runs beyond `max_concurrent` are queued by the pool. Each run is identified by the id returned by `submit()`.
+    A run submitted with a RunProfiler emits `profiled` with its RunProfile just before `finished` or `failed`.
+    A run submitted with `in_gui_thread=True` (methods marked with class_schema.gui_thread) is queued on the event
+    loop of the thread calling `submit()` instead, with the same signals. A run submitted with an `owner` (the
+    instance whose method runs) marks it as running until it ends, see is_running().
+    """
+
+    started = pyqtSignal(int)
+    progress = pyqtSignal(int, float, str)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object, str)
+    cancelled = pyqtSignal(int)
+    profiled = pyqtSignal(int, object)
+
+    def __init__(self, max_concurrent=None, parent=None):
+        super().__init__(parent)
+        global _gui_poster
+        if _gui_poster is None:
+            _gui_poster = _GuiPoster()
+        self.pool = QThreadPool(self)
+        if max_concurrent:
+            self.pool.setMaxThreadCount(max_concurrent)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._contexts = {}
+        self._owners = {}
+
+    def submit(self, method, args=(), kwargs=None, accepts_context=False, profiler=None, in_gui_thread=False,
+               owner=None):
+        run_id = next(self._ids)
+        context = RunContext(run_id, self)
+        kwargs = dict(kwargs or {})
+        if accepts_context:
+            kwargs[RUN_CONTEXT_PARAM] = context
+
+        with self._lock:
+            self._contexts[run_id] = context
+            if owner is not None:
+                self._owners[run_id] = id(owner)
+        if owner is not None:
+            with _running_lock:
+                _running[id(owner)] = _running.get(id(owner), 0) + 1
+        task = _MethodTask(self, context, method, tuple(args), kwargs, profiler)
+        if in_gui_thread:
+            # Exécutée au prochain tour de la boucle d'événements, une fois l'identifiant rendu à l'appelant (la
+            # lambda garde la tâche en vie, une méthode liée ne serait référencée que faiblement)
+            QTimer.singleShot(0, lambda: task.run())
+        else:
+            self.pool.start(task)
+        return run_id
+
+    def cancel(self, run_id):
+        with self._lock:
+            context = self._contexts.get(run_id)
+        if context is not None:
+            context.cancel()
+
+    def cancel_all(self):
+        with self._lock:
+            contexts = list(self._contexts.values())
+        for context in contexts:
+            context.cancel()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._contexts)
+
+    def wait(self, msecs=-1):
+        """Wait at most `msecs` ms (forever if negative) for the pool runs; return False if some are still running.
+
+        The runs of the GUI thread are never in progress during this call.
+        """
+        return self.pool.waitForDone(msecs)
+
+    def _task_done(self, run_id):
+        with self._lock:
+            self._contexts.pop(run_id, None)
+            owner_id = self._owners.pop(run_id, None)
+        if owner_id is not None:
+            with _running_lock:
+                if _running[owner_id] > 1:
+                    _running[owner_id] -= 1
+                else:
+                    del _running[owner_id]
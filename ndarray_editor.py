@@ -0,0 +1,73 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from PyQt6.QtWidgets import QLabel, QWidget, QVBoxLayout, QTabWidget
+
+from field_editors import FieldEditor
+from instance_group import MIXED_TEXT, is_mixed
+from ndarray_viewer import NDArrayViewer, is_viewable
+from sequence_editor import SequenceTable
+
+# Colonnes de la table des valeurs au-delà desquelles un tableau 2D (une image) n'est montré que par la vue d'image :
+# les lignes sont chargées par blocs, mais le modèle a une colonne par colonne du tableau
+MAX_TABLE_COLUMNS = 256
+
+
+class NDArrayEditor(FieldEditor):
+    """View of a NumPy array attribute: shape and dtype, the image itself for 2D arrays and images, and an editable
+    table of the values of 1D arrays and of 2D arrays of at most MAX_TABLE_COLUMNS columns."""
+
+    supports_params = False
+
+    def create_widget(self, parent, label):
+        self.value = None
+        widget = QWidget(parent)
+        self.summary = QLabel(self.display(None))
+        self.viewer = NDArrayViewer()
+        self.viewer.setMinimumHeight(240)
+        # Les valeurs sont écrites dans une copie du tableau, faite à la première modification
+        self.table = SequenceTable(self.notify)
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.viewer, "Image")
+        self.tabs.addTab(self.table, "Values")
+        self.tabs.setVisible(False)
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.summary)
+        layout.addWidget(self.tabs)
+        return widget
+
+    def get(self):
+        return self.table.model.take() if self.table.model.modified else self.value
+
+    def show_value(self, value):
+        # Le tableau peut avoir été modifié en place : la vue est toujours redessinée
+        self.value = value
+        self.summary.setText(self.display(value))
+        self.viewer.set_array(value if is_viewable(value) else None)
+        tabular = value is not None and (value.ndim == 1 or value.ndim == 2 and value.shape[1] <= MAX_TABLE_COLUMNS)
+        self.table.set_values(value if tabular else [])
+        self.tabs.setTabVisible(0, self.viewer.array is not None)
+        self.tabs.setTabVisible(1, tabular)
+        self.tabs.setVisible(self.viewer.array is not None or tabular)
+
+    def show_mixed(self):
+        # Tableaux propres à chaque instance : ni image ni valeurs
+        self.value = None
+        self.summary.setText(MIXED_TEXT)
+        self.viewer.set_array(None)
+        self.table.set_values([])
+        self.tabs.setVisible(False)
+
+    def notify(self, *_):
+        # La vue d'image suit les valeurs saisies dans la table
+        if self.table.model.modified and self.viewer.array is not None:
+            self.viewer.set_array(self.table.model.values)
+        super().notify()
+
+    @classmethod
+    def display(cls, value):
+        if is_mixed(value):
+            return MIXED_TEXT
+        return f"ndarray {value.shape} {value.dtype}" if value is not None else "None"
@@ -0,0 +1,274 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import math
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from PyQt6 import sip
+from PyQt6.QtCore import Qt, QCoreApplication, QObject, QPointF, QRectF, QSize, pyqtSignal
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtWidgets import QWidget
+
+# Côté des tuiles dessinées, en pixels du niveau de la pyramide
+TILE_SIZE = 512
+# La pyramide s'arrête au premier niveau dont le petit côté est inférieur à cette taille
+MIN_LEVEL_SIZE = 256
+# Nombre de tuiles converties (tableaux non uint8) gardées en cache
+TILE_CACHE_SIZE = 64
+MIN_ZOOM = 1 / 256
+MAX_ZOOM = 64.0
+
+# Pyramides calculées une à la fois, hors du thread de l'interface. Un thread Python plutôt qu'un QThreadPool
+# possédé par le viewer : détruire ce dernier pendant un calcul attendrait le thread en gardant le GIL
+_pyramid_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyramid")
+
+# Format QImage des tableaux uint8 selon le nombre de canaux (ordre OpenCV BGR / BGRA)
+_FORMATS = {1: QImage.Format.Format_Grayscale8, 3: QImage.Format.Format_BGR888, 4: QImage.Format.Format_ARGB32}
+
+
+def is_viewable(array):
+    """True for 2D arrays and H x W x 1, 3 or 4 images of a numeric or boolean dtype."""
+    if not isinstance(array, np.ndarray) or array.size == 0 or array.dtype.kind not in "biuf":
+        return False
+    return array.ndim == 2 or (array.ndim == 3 and array.shape[2] in _FORMATS)
+
+
+def wrap_qimage(image):
+    """QImage sharing the buffer of a uint8 image, or None when its memory layout cannot be wrapped.
+
+    Rows may be strided (a crop of a larger array) but pixels must be packed. The array must outlive the QImage.
+    """
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    if image.dtype != np.uint8 or image.strides[1] != channels or (channels > 1 and image.strides[2] != 1):
+        return None
+    height, width = image.shape[:2]
+    return QImage(sip.voidptr(image.ctypes.data), width, height, image.strides[0], _FORMATS[channels])
+
+
+def downsample(image):
+    # Moyenne de blocs 2x2 : un niveau de la pyramide à partir du précédent
+    height, width = image.shape[0] // 2, image.shape[1] // 2
+    quads = [image[dy:2 * height:2, dx:2 * width:2] for dy in (0, 1) for dx in (0, 1)]
+    if image.dtype == np.uint8:
+        total = quads[0].astype(np.uint16)
+        for quad in quads[1:]:
+            total += quad
+        return ((total + 2) >> 2).astype(np.uint8)
+    total = quads[0].astype(np.float32)
+    for quad in quads[1:]:
+        total += quad
+    return total / 4
+
+
+def level_count(array):
+    # Nombre de niveaux de la pyramide, le tableau lui-même compris
+    height, width = array.shape[:2]
+    return 1 + max(0, int(math.log2(max(1, min(height, width) / MIN_LEVEL_SIZE))))
+
+
+def value_range(array):
+    """Range mapped to 0-255 for the tiles of an array that is not uint8: (0, 1) for booleans, else nanmin-nanmax."""
+    if array.dtype == np.bool_:
+        return 0.0, 1.0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # tableau entièrement NaN
+        low, high = float(np.nanmin(array)), float(np.nanmax(array))
+    if not (math.isfinite(low) and math.isfinite(high)):
+        low, high = 0.0, 1.0
+    return low, (high if high > low else low + 1)
+
+
+class _Pyramid(QObject):
+    # Émis avec (génération, niveaux, plage de valeurs) une fois la pyramide d'un tableau calculée
+    built = pyqtSignal(int, object, object)
+
+
+def _build_pyramid(pyramid, generation, array):
+    levels, low_high = [array], None
+    try:
+        if array.dtype != np.uint8:
+            low_high = value_range(array)
+        for _ in range(1, level_count(array)):
+            levels.append(downsample(levels[-1]))
+    except Exception:
+        # Tableau illisible (fichier projeté supprimé...) : les niveaux calculés restent utilisables
+        if low_high is None and array.dtype != np.uint8:
+            low_high = (0.0, 1.0)
+    finally:
+        # Toujours émis : sinon le viewer attendrait indéfiniment la pyramide
+        pyramid.built.emit(generation, levels, low_high)
+
+
+class NDArrayViewer(QWidget):
+    """Pan and zoom view of an image held in a NumPy array.
+
+    uint8 images are drawn from QImages wrapping the array buffer, without copy. The visible part is drawn tile by
+    tile from a level-of-detail pyramid, so the cost of a repaint depends on the widget size rather than on the image
+    size. Other dtypes are scaled to 0-255 tile by tile, with a small cache of converted tiles. The pyramid and the
+    value range of each array are computed once, in a background thread; until they are ready, uint8 images are
+    drawn from the finest level available and other dtypes are not drawn.
+    Drag to pan, use the wheel to zoom and double-click to fit the image to the widget.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.array = None
+        self.levels = []
+        self.zoom = 1.0
+        self.offset = QPointF(0, 0)
+        self.fitted = True
+        self._value_range = None
+        self._tiles = OrderedDict()
+        self._drag_start = None
+        self.setMinimumSize(160, 120)
+
+        # Le calcul de la pyramide d'un tableau remplacé entre-temps est annulé s'il n'a pas commencé, ignoré sinon
+        self._generation = 0
+        self._pyramid = _Pyramid()
+        self._pyramid.built.connect(self._pyramid_built)
+        self._pyramid_future = None
+
+    def sizeHint(self):
+        return QSize(320, 240)
+
+    def set_array(self, array):
+        # La zone affichée est conservée : une image de taille différente (version réduite de la même image par
+        # exemple) occupe la même place à l'écran
+        previous_width = None if self.array is None else self.array.shape[1]
+        self.array = array if array is not None and is_viewable(array) else None
+        self.levels = [] if self.array is None else [self.array]
+        self._value_range = None
+        self._tiles.clear()
+        self._generation += 1
+        if self._pyramid_future is not None:
+            self._pyramid_future.cancel()
+            self._pyramid_future = None
+        if self.array is not None:
+            if self.array.dtype != np.uint8 or level_count(self.array) > 1:
+                self._pyramid_future = _pyramid_executor.submit(_build_pyramid, self._pyramid, self._generation,
+                                                                self.array)
+            if self.fitted or previous_width is None:
+                self.fit()
+            else:
+                self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * previous_width / self.array.shape[1]))
+        self.update()
+
+    def _pyramid_built(self, generation, levels, low_high):
+        if generation != self._generation:
+            return  # tableau remplacé pendant le calcul
+        self.levels = levels
+        self._value_range = low_high
+        self.update()
+
+    def is_ready(self):
+        # Pyramide et plage de valeurs du tableau affiché calculées
+        return self.array is None or (len(self.levels) == level_count(self.array)
+                                      and (self.array.dtype == np.uint8 or self._value_range is not None))
+
+    def wait_ready(self, timeout=None):
+        # Attend la fin du calcul en arrière-plan puis traite son signal (tests, captures d'écran)
+        if self._pyramid_future is not None:
+            wait([self._pyramid_future], timeout)
+            QCoreApplication.sendPostedEvents()
+        return self.is_ready()
+
+    def level_for(self, zoom):
+        if zoom >= 1:
+            return 0
+        return min(int(math.log2(1 / zoom)), level_count(self.array) - 1)
+
+    def fit(self):
+        if self.array is None:
+            return
+        height, width = self.array.shape[:2]
+        self.zoom = min(self.width() / width, self.height() / height) or 1.0
+        self.offset = QPointF((self.width() - width * self.zoom) / 2, (self.height() - height * self.zoom) / 2)
+        self.fitted = True
+        self.update()
+
+    def tile(self, level_index, tile_y, tile_x):
+        image = self.levels[level_index]
+        crop = image[tile_y * TILE_SIZE:(tile_y + 1) * TILE_SIZE, tile_x * TILE_SIZE:(tile_x + 1) * TILE_SIZE]
+        qimage = wrap_qimage(crop)
+        if qimage is not None:
+            return crop, qimage
+
+        key = (level_index, tile_y, tile_x)
+        cached = self._tiles.get(key)
+        if cached is None:
+            low, high = self._value_range  # échelle commune à toutes les tuiles
+            converted = np.clip(np.nan_to_num((crop.astype(np.float32) - low) * (255 / (high - low))), 0, 255)
+            converted = np.ascontiguousarray(converted.astype(np.uint8))
+            cached = self._tiles[key] = (converted, wrap_qimage(converted))
+            if len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return cached
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().dark())
+        if self.array is None:
+            return
+
+        if self.array.dtype != np.uint8 and self._value_range is None:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Preparing image...")
+            return
+        # Niveau le plus fin disponible tant que la pyramide est en calcul
+        level_index = min(self.level_for(self.zoom), len(self.levels) - 1)
+        image = self.levels[level_index]
+        scale = self.zoom * 2 ** level_index
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, scale < 1)
+
+        # Tuiles du niveau recouvrant la zone visible
+        height, width = image.shape[:2]
+        left = max(0, int(-self.offset.x() / scale) // TILE_SIZE)
+        top = max(0, int(-self.offset.y() / scale) // TILE_SIZE)
+        right = min(math.ceil(width / TILE_SIZE), math.ceil((self.width() - self.offset.x()) / scale / TILE_SIZE))
+        bottom = min(math.ceil(height / TILE_SIZE), math.ceil((self.height() - self.offset.y()) / scale / TILE_SIZE))
+        for tile_y in range(top, bottom):
+            for tile_x in range(left, right):
+                # buffer garde le tableau de la tuile en vie pendant son dessin, même s'il sort du cache
+                buffer, qimage = self.tile(level_index, tile_y, tile_x)
+                target = QRectF(self.offset.x() + tile_x * TILE_SIZE * scale,
+                                self.offset.y() + tile_y * TILE_SIZE * scale,
+                                qimage.width() * scale, qimage.height() * scale)
+                painter.drawImage(target, qimage)
+
+    def resizeEvent(self, event):
+        if self.fitted:
+            self.fit()
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        if self.array is None:
+            return
+        # Zoom centré sur le curseur
+        position = event.position()
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * 1.25 ** (event.angleDelta().y() / 120)))
+        self.offset = position - (position - self.offset) * (zoom / self.zoom)
+        self.zoom = zoom
+        self.fitted = False
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_start = event.position()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_start is not None:
+            self.offset += event.position() - self._drag_start
+            self._drag_start = event.position()
+            self.fitted = False
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_start = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit()
@@ -0,0 +1,147 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QStackedWidget, QSizePolicy
+
+from field_editors import editor_for
+
+# Formulaires de méthodes gardés construits ; au-delà, le moins récemment affiché rend ses éditeurs au pool
+MAX_FORMS = 32
+# Éditeurs libres gardés par type d'éditeur
+MAX_POOLED_EDITORS = 16
+
+
+class EditorPool:
+    """Free parameter editors and their labels, reused by the forms of other methods.
+
+    Editors are keyed by (editor class, edited type). Each editor remembers the value it showed when it was created
+    without value, which is shown again when it is reused for a parameter without default.
+    """
+
+    def __init__(self, max_per_key=MAX_POOLED_EDITORS):
+        self.max_per_key = max_per_key
+        self._free = {}
+        self._blank = {}
+
+    def acquire(self, editor_class, name, value_type, value):
+        free = self._free.get((editor_class, value_type))
+        if free:
+            label, editor = free.pop()
+            editor.name = name
+            label.setText(name)
+            editor.set(value if value is not None else self._blank[editor])
+            return label, editor
+        editor = editor_class(name, value_type, None)
+        self._blank[editor] = editor.get()
+        if value is not None:
+            editor.set(value)
+        return QLabel(name), editor
+
+    def release(self, label, editor):
+        free = self._free.setdefault((type(editor), editor.value_type), [])
+        label.setParent(None)
+        editor.widget.setParent(None)
+        if len(free) < self.max_per_key:
+            free.append((label, editor))
+        else:
+            self._blank.pop(editor, None)
+            label.deleteLater()
+            editor.widget.deleteLater()
+
+    def __len__(self):
+        return sum(len(free) for free in self._free.values())
+
+
+class ParameterForm(QWidget):
+    """Labels and editors of the parameters of one method, with direct references to the editors."""
+
+    def __init__(self, method_spec, pool, values=None, parent=None):
+        super().__init__(parent)
+        self.method_name = method_spec.name
+        self.rows = []
+        # Éditeurs indexés par nom de paramètre
+        self.editors = {}
+        values = values or {}
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        for param in method_spec.params:
+            default = param.default if param.has_default else None
+            editor_class = editor_for(param.type, default)
+            if editor_class is None or not editor_class.supports_params:
+                continue
+            label, editor = pool.acquire(editor_class, param.name, param.type, values.get(param.name, default))
+            layout.addWidget(label)
+            layout.addWidget(editor.widget)
+            self.rows.append((label, editor))
+            self.editors[param.name] = editor
+        layout.addStretch()
+
+    def values(self):
+        return {name: editor.get() for name, editor in self.editors.items()}
+
+    def release(self, pool):
+        # Les éditeurs retournent au pool, le formulaire vide peut être détruit
+        for label, editor in self.rows:
+            self.layout().removeWidget(label)
+            self.layout().removeWidget(editor.widget)
+            pool.release(label, editor)
+        self.rows = []
+        self.editors = {}
+
+
+class ParameterForms(QStackedWidget):
+    """One persistent ParameterForm per method, built the first time the method is shown.
+
+    Switching back to a method shows its form as it was left, with the values entered by the user. At most
+    `max_forms` forms are kept; the least recently shown one gives its editors back to the pool and only its values
+    are kept, to fill the form when it is built again.
+    """
+
+    def __init__(self, schema, max_forms=MAX_FORMS, pool=None, parent=None):
+        super().__init__(parent)
+        self.schema = schema
+        self.max_forms = max_forms
+        self.pool = pool if pool is not None else EditorPool()
+        self.forms = OrderedDict()
+        self.saved_values = {}
+        self.current = None
+
+    def show_method(self, method_name):
+        """Show the form of `method_name` and return it, or None for an unknown method."""
+        method_spec = self.schema.method(method_name)
+        if method_spec is None:
+            return None
+        form = self.forms.get(method_name)
+        if form is None:
+            # Libération avant construction : le nouveau formulaire reprend les éditeurs du plus ancien
+            while self.forms and len(self.forms) >= self.max_forms:
+                self.evict(next(iter(self.forms)))
+            form = ParameterForm(method_spec, self.pool, self.saved_values.pop(method_name, None))
+            self.forms[method_name] = form
+            self.addWidget(form)
+        self.forms.move_to_end(method_name)
+
+        # Seule la page affichée compte pour la taille de la pile
+        if self.current is not None and self.current is not form:
+            self.current.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        form.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Preferred)
+        self.setCurrentWidget(form)
+        self.current = form
+        self.updateGeometry()
+        return form
+
+    def evict(self, method_name):
+        form = self.forms.pop(method_name)
+        self.saved_values[method_name] = form.values()
+        form.release(self.pool)
+        if form is self.current:
+            self.current = None
+        self.removeWidget(form)
+        form.deleteLater()
+
+    def editors(self):
+        # Éditeurs des paramètres de la méthode affichée, indexés par nom
+        return self.current.editors if self.current is not None else {}
@@ -0,0 +1,201 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import copy
+import json
+import os
+import pathlib
+
+from class_schema import get_schema, import_class
+from instance_group import InstanceGroup, is_mixed
+
+PRESET_SUFFIX = ".json"
+ARRAY_SUFFIX = ".npy"
+
+# Clés réservées des valeurs qui ne sont pas des scalaires JSON
+ARRAY_KEY = "__ndarray__"
+OBJECT_KEY = "__object__"
+CLASS_KEY = "__class__"
+TUPLE_KEY = "__tuple__"
+PATH_KEY = "__path__"
+
+
+def _is_ndarray(value):
+    # Sans importer numpy : une configuration sans tableau ne le charge jamais
+    return any(klass.__module__ == "numpy" and klass.__name__ == "ndarray" for klass in type(value).__mro__)
+
+
+def _encode(value, path, sidecar_base, seen):
+    if is_mixed(value):
+        raise ValueError(f"Cannot save {path!r}: its value differs between the edited instances")
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if _is_ndarray(value):
+        return {ARRAY_KEY: _save_array(value, f"{sidecar_base}.{path}{ARRAY_SUFFIX}")}
+    if type(value).__module__ == "numpy":
+        return value.item()  # scalaire numpy
+    if isinstance(value, list):
+        return [_encode(item, f"{path}.{i}", sidecar_base, seen) for i, item in enumerate(value)]
+    if isinstance(value, pathlib.PurePath):
+        return {PATH_KEY: str(value)}
+    if isinstance(value, tuple):
+        return {TUPLE_KEY: [_encode(item, f"{path}.{i}", sidecar_base, seen) for i, item in enumerate(value)]}
+    if get_schema(value).attributes:
+        if id(value) in seen:
+            raise ValueError(f"Cannot save {path!r}: the configuration refers to itself")
+        # La classe permet de recréer les objets rangés dans une liste ou un tuple
+        cls = type(value)
+        return {OBJECT_KEY: _encode_object(value, f"{path}.", sidecar_base, seen | {id(value)}),
+                CLASS_KEY: f"{cls.__module__}:{cls.__qualname__}"}
+    raise TypeError(f"Cannot save {path!r} of type {type(value).__name__}")
+
+
+def _encode_object(obj, prefix, sidecar_base, seen):
+    data = {}
+    for attr_spec in get_schema(obj).attributes:
+        value = getattr(obj, attr_spec.name, None)
+        data[attr_spec.name] = _encode(value, prefix + attr_spec.name, sidecar_base, seen)
+    return data
+
+
+def _save_array(array, sidecar_path):
+    import numpy as np
+
+    # Écriture dans un fichier temporaire puis remplacement : un tableau encore projeté depuis l'ancien fichier
+    # (preset rechargé puis sauvegardé au même endroit) reste valide
+    temporary_path = sidecar_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        np.save(file, array, allow_pickle=False)
+    os.replace(temporary_path, sidecar_path)
+    return os.path.basename(sidecar_path)
+
+
+def mixed_attributes(obj, prefix="", seen=frozenset()):
+    """Return the dotted paths of the attributes of an InstanceGroup whose value differs between its instances."""
+    if not isinstance(obj, InstanceGroup):
+        return []
+    key = tuple(map(id, obj.instances))
+    if key in seen:
+        return []
+    paths = []
+    for attr_spec in get_schema(obj).attributes:
+        value = getattr(obj, attr_spec.name, None)
+        if is_mixed(value):
+            paths.append(prefix + attr_spec.name)
+        elif isinstance(value, InstanceGroup):
+            paths.extend(mixed_attributes(value, f"{prefix}{attr_spec.name}.", seen | {key}))
+    return paths
+
+
+def save_preset(obj, path):
+    """Save the annotated attributes of an instance, nested configurations included, as a preset.
+
+    Scalars are written to a compact JSON file; NumPy arrays are written next to it as .npy sidecar files.
+    """
+    sidecar_base = os.path.splitext(path)[0]
+    cls = get_schema(obj).cls
+    data = {"class": f"{cls.__module__}:{cls.__qualname__}",
+            "attributes": _encode_object(obj, "", sidecar_base, {id(obj)})}
+    with open(path, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+
+
+def read_preset(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def _decode(value, base_dir, mmap_mode):
+    if isinstance(value, list):
+        return [_decode(item, base_dir, mmap_mode) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if ARRAY_KEY in value:
+        import numpy as np
+
+        # Projection en mémoire : seules les pages lues sont chargées, les écritures restent en mémoire
+        return np.load(os.path.join(base_dir, value[ARRAY_KEY]), mmap_mode=mmap_mode, allow_pickle=False)
+    if TUPLE_KEY in value:
+        return tuple(_decode(item, base_dir, mmap_mode) for item in value[TUPLE_KEY])
+    if PATH_KEY in value:
+        return pathlib.Path(value[PATH_KEY])
+    if OBJECT_KEY in value and CLASS_KEY in value:
+        obj = import_class(value[CLASS_KEY])()
+        apply_preset_data(obj, value[OBJECT_KEY], base_dir, mmap_mode)
+        return obj
+    raise ValueError(f"Unexpected preset value {value!r}")
+
+
+def apply_preset_data(obj, attributes, base_dir=".", mmap_mode="c"):
+    """Write preset values onto an instance and return the (target, name, old, new) changes.
+
+    Nested configurations are updated in place; one still shared through a class level default is copied onto the
+    instance first. Unknown attributes are ignored so that presets survive the removal of an attribute.
+    """
+    changes = []
+    schema = get_schema(obj)
+    for attr_name, value in attributes.items():
+        attr_spec = schema.attribute(attr_name)
+        if attr_spec is None:
+            continue
+        current = getattr(obj, attr_name, None)
+        if isinstance(value, dict) and OBJECT_KEY in value:
+            if current is None:
+                current = import_class(value[CLASS_KEY])() if CLASS_KEY in value else attr_spec.type()
+                changes.append((obj, attr_name, None, current))
+                setattr(obj, attr_name, current)
+            elif attr_name not in getattr(obj, "__dict__", {}):
+                shared, current = current, copy.copy(current)
+                changes.append((obj, attr_name, shared, current))
+                setattr(obj, attr_name, current)
+            changes.extend(apply_preset_data(current, value[OBJECT_KEY], base_dir, mmap_mode))
+            continue
+
+        value = _decode(value, base_dir, mmap_mode)
+        changes.append((obj, attr_name, current, value))
+        setattr(obj, attr_name, value)
+    return changes
+
+
+def load_preset(obj, path, mmap_mode="c"):
+    data = read_preset(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if isinstance(obj, InstanceGroup):
+        # Chaque instance reçoit le preset : les changements gardent l'ancienne valeur de chacune
+        return [change for instance in obj for change in apply_preset_data(instance, data["attributes"], base_dir,
+                                                                           mmap_mode)]
+    return apply_preset_data(obj, data["attributes"], base_dir, mmap_mode)
+
+
+class PresetLibrary:
+    """Presets of a directory, parsed on first use and kept until their file changes.
+
+    Arrays are only memory-mapped when a preset is applied, so listing or reading a large library stays cheap.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._cache = {}
+
+    def names(self):
+        return sorted(os.path.splitext(entry.name)[0] for entry in os.scandir(self.directory)
+                      if entry.is_file() and entry.name.endswith(PRESET_SUFFIX))
+
+    def path(self, name):
+        return os.path.join(self.directory, name + PRESET_SUFFIX)
+
+    def get(self, name):
+        path = self.path(name)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != mtime:
+            cached = self._cache[name] = (mtime, read_preset(path))
+        return cached[1]
+
+    def apply(self, name, obj, mmap_mode="c"):
+        return apply_preset_data(obj, self.get(name)["attributes"], self.directory, mmap_mode)
+
+    def save(self, name, obj):
+        save_preset(obj, self.path(name))
+        self._cache.pop(name, None)
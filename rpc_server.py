@@ -0,0 +1,305 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_runner import parse_assignments, build_init_kwargs
+from class_schema import get_class_schema, import_class, attribute_spec, assign_path, coerce_value, \
+    RUN_CONTEXT_PARAM
+from snapshot import take_snapshot
+
+# Codes d'erreur JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+# Taille maximale d'une ligne (une requête ou un lot)
+MAX_LINE_BYTES = 16 * 1024 ** 2
+# Requêtes d'une même connexion traitées en parallèle avant de suspendre sa lecture
+MAX_IN_FLIGHT_PER_CONNECTION = 64
+
+
+class RPCError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class _NullRunContext:
+    # Passé aux méthodes qui déclarent run_context : pas d'annulation ni de progression à distance
+    run_id = 0
+    cancelled = False
+
+    def check(self):
+        pass
+
+    def report(self, progress, message=""):
+        pass
+
+
+def to_jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if hasattr(value, "shape") and hasattr(value, "dtype"):
+        if not value.shape:
+            return value.item()  # scalaire NumPy
+        return {"__ndarray__": {"shape": list(value.shape), "dtype": str(value.dtype)}}
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    return repr(value)
+
+
+def type_name(value_type):
+    if value_type is os.path:
+        return "filepath"  # annotation des chemins de fichier, comme dans field_editors
+    return getattr(value_type, "__qualname__", None) or repr(value_type)
+
+
+class SchemaRPCServer:
+    """JSON-RPC 2.0 server exposing the annotated attributes and public methods of a class.
+
+    Each line received is a request or a batch (a JSON array of requests), answered by one line. A batch runs in
+    order on one instance taken from a pool of `pool_size` instances created at startup, in a thread of the
+    executor; the annotated attributes of the instance are then restored to their initial values before it goes
+    back to the pool, so batches never see each other's changes. Besides the methods of the class, "rpc.schema"
+    describes the class, "rpc.get" reads and "rpc.set" writes an attribute path such as "config.angle".
+    """
+
+    def __init__(self, cls, init_kwargs=None, pool_size=4):
+        self.cls = cls
+        self.schema = get_class_schema(cls)
+        self.init_kwargs = dict(init_kwargs or {})
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="rpc")
+        self.instances = None
+        self.handlers = {"rpc.schema": self.rpc_schema, "rpc.get": self.rpc_get, "rpc.set": self.rpc_set}
+
+    async def start_pool(self):
+        # Instances construites une seule fois (chargement d'image compris), avec leur instantané de référence
+        loop = asyncio.get_running_loop()
+        self.instances = asyncio.Queue()
+        for _ in range(self.pool_size):
+            instance = await loop.run_in_executor(self.executor, lambda: self.cls(**self.init_kwargs))
+            await self.instances.put((instance, take_snapshot(instance)))
+
+    def describe(self):
+        return {"class": f"{self.cls.__module__}:{self.cls.__qualname__}",
+                "attributes": [{"name": attr.name, "type": type_name(attr.type)} for attr in self.schema.attributes],
+                "methods": [{"name": method.name,
+                             "params": [{"name": param.name, "type": type_name(param.type),
+                                         **({"default": to_jsonable(param.default)} if param.has_default else {})}
+                                        for param in method.params]}
+                            for method in self.schema.methods]}
+
+    def rpc_schema(self, instance, params):
+        return self.describe()
+
+    def rpc_get(self, instance, params):
+        path = self.param(params, "path", 0)
+        value = instance
+        try:
+            attribute_spec(self.cls, path)
+            for name in path.split("."):
+                value = getattr(value, name)
+        except AttributeError as error:
+            raise RPCError(INVALID_PARAMS, str(error))
+        return to_jsonable(value)
+
+    def rpc_set(self, instance, params):
+        path = self.param(params, "path", 0)
+        try:
+            value = coerce_value(self.param(params, "value", 1), attribute_spec(self.cls, path).type)
+        except (AttributeError, TypeError, ValueError) as error:
+            raise RPCError(INVALID_PARAMS, str(error))
+        assign_path(instance, path, value)
+        return None
+
+    @staticmethod
+    def param(params, name, position):
+        try:
+            return params[name] if isinstance(params, dict) else params[position]
+        except (KeyError, IndexError, TypeError):
+            raise RPCError(INVALID_PARAMS, f"missing parameter {name!r}")
+
+    def call_method(self, instance, name, params):
+        method_spec = self.schema.method(name)
+        if method_spec is None:
+            raise RPCError(METHOD_NOT_FOUND, f"method not found: {name}")
+
+        # Paramètres nommés ou positionnels, convertis vers les types annotés
+        if isinstance(params, list):
+            if len(params) > len(method_spec.params):
+                raise RPCError(INVALID_PARAMS, f"{name}() takes {len(method_spec.params)} parameters")
+            params = {param.name: value for param, value in zip(method_spec.params, params)}
+        kwargs = {}
+        for param_name, value in params.items():
+            param = method_spec.param(param_name)
+            if param is None:
+                raise RPCError(INVALID_PARAMS, f"{name}() has no parameter {param_name!r}")
+            try:
+                kwargs[param_name] = coerce_value(value, param.type)
+            except (TypeError, ValueError) as error:
+                raise RPCError(INVALID_PARAMS, f"{param_name}: {error}")
+        missing = [param.name for param in method_spec.params if not param.has_default and param.name not in kwargs]
+        if missing:
+            raise RPCError(INVALID_PARAMS, f"{name}() missing parameters {missing}")
+        if method_spec.accepts_context:
+            kwargs[RUN_CONTEXT_PARAM] = _NullRunContext()
+        return to_jsonable(getattr(instance, name)(**kwargs))
+
+    def execute(self, instance, request):
+        # Une requête JSON-RPC ; None pour une notification (sans id)
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" \
+                or not isinstance(request.get("method"), str):
+            return error_response(None, RPCError(INVALID_REQUEST, "invalid request"))
+        request_id = request.get("id")
+        params = request.get("params", {})
+        try:
+            if not isinstance(params, (dict, list)):
+                raise RPCError(INVALID_PARAMS, "params must be an object or an array")
+            handler = self.handlers.get(request["method"])
+            if handler is not None:
+                result = handler(instance, params)
+            else:
+                result = self.call_method(instance, request["method"], params)
+        except RPCError as error:
+            response = error_response(request_id, error)
+        except Exception as error:
+            response = error_response(request_id, RPCError(SERVER_ERROR, str(error), repr(error)))
+        else:
+            response = {"jsonrpc": "2.0", "result": result, "id": request_id}
+        return response if "id" in request else None
+
+    def execute_batch(self, instance, snapshot, requests):
+        # Exécuté dans un thread de l'exécuteur : tout le lot sur la même instance, puis remise à l'état initial
+        try:
+            return [response for response in (self.execute(instance, request) for request in requests)
+                    if response is not None]
+        finally:
+            snapshot.restore()
+
+    async def handle_payload(self, payload):
+        """Answer one line; returns the encoded response line, or None when nothing has to be sent back."""
+        try:
+            message = json.loads(payload)
+        except ValueError as error:
+            return encode(error_response(None, RPCError(PARSE_ERROR, f"parse error: {error}")))
+        batch = isinstance(message, list)
+        if batch and not message:
+            return encode(error_response(None, RPCError(INVALID_REQUEST, "empty batch")))
+
+        instance, snapshot = await self.instances.get()
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.execute_batch, instance, snapshot, message if batch else [message])
+        finally:
+            self.instances.put_nowait((instance, snapshot))
+        if not responses:
+            return None
+        return encode(responses if batch else responses[0])
+
+    async def handle_connection(self, reader, writer):
+        # Les lignes d'une connexion sont traitées en parallèle, les réponses partent dans l'ordre de fin
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_PER_CONNECTION)
+        tasks = set()
+
+        async def answer(line):
+            try:
+                response = await self.handle_payload(line)
+                if response is not None and not writer.is_closing():
+                    writer.write(response)
+                    await writer.drain()
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Ligne plus longue que MAX_LINE_BYTES : la connexion ne peut pas être resynchronisée
+                    writer.write(encode(error_response(None, RPCError(INVALID_REQUEST, "request too large"))))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await in_flight.acquire()
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, unix_path=None, host="127.0.0.1", port=0, on_ready=None):
+        await self.start_pool()
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path, limit=MAX_LINE_BYTES)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_BYTES)
+        if on_ready is not None:
+            on_ready(server)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def error_response(request_id, error):
+    body = {"code": error.code, "message": error.message}
+    if error.data is not None:
+        body["data"] = error.data
+    return {"jsonrpc": "2.0", "error": body, "id": request_id}
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the annotated attributes and public methods of a class "
+                                                 "over JSON-RPC 2.0 (one JSON request or batch per line).")
+    parser.add_argument("class_path", help="class to instantiate, e.g. example_class:ProcessImage")
+    parser.add_argument("--init", action="append", default=[], metavar="NAME=VALUE",
+                        help="constructor argument, e.g. show=false")
+    parser.add_argument("--unix", help="Unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pool", type=int, default=os.cpu_count(), help="number of warm instances")
+    args = parser.parse_args(argv)
+
+    cls = import_class(args.class_path)
+    init_kwargs = build_init_kwargs(cls, {name: values[0] for name, values in parse_assignments(args.init).items()})
+    server = SchemaRPCServer(cls, init_kwargs, args.pool)
+
+    def ready(listener):
+        address = args.unix or "{}:{}".format(*listener.sockets[0].getsockname()[:2])
+        print(f"Serving {args.class_path} on {address} with {args.pool} instances", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.unix, args.host, args.port, on_ready=ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Nombre de fonctions conservées dans le résumé cProfile
+TOP_FUNCTIONS = 15
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_started = False
+# Profils des exécutions en cours qui mesurent la mémoire, indexés par id()
+_tracemalloc_profiles = {}
+
+
+@dataclass
+class RunProfile:
+    """Measurements of one method invocation."""
+    method: str
+    started: str = ""
+    status: str = "running"
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_memory: int = None
+    # Une autre exécution mesurée a chevauché celle-ci : son pic inclut les allocations de l'autre
+    peak_overlapped: bool = False
+    top_functions: list = field(default_factory=list)
+    profiler: cProfile.Profile = field(default=None, repr=False)
+
+    def to_dict(self):
+        return {"method": self.method, "started": self.started, "status": self.status, "wall_time": self.wall_time,
+                "cpu_time": self.cpu_time, "peak_memory": self.peak_memory, "peak_overlapped": self.peak_overlapped,
+                "top_functions": self.top_functions}
+
+    def dump_stats(self, path):
+        if self.profiler is None:
+            raise ValueError(f"No cProfile capture for {self.method}")
+        self.profiler.dump_stats(path)
+
+
+class RunProfiler:
+    """Context manager measuring wall time, CPU time of the calling thread and, optionally, peak memory and cProfile.
+
+    tracemalloc is process wide: when runs overlap, the peak of each run includes the allocations of the others, so
+    their profiles are marked with `peak_overlapped`.
+    """
+
+    def __init__(self, method_name, memory=True, cprofile=False, top=TOP_FUNCTIONS):
+        self.profile = RunProfile(method_name)
+        self.memory = memory
+        self.cprofile = cprofile
+        self.top = top
+        self._profiler = None
+
+    def __enter__(self):
+        if self.memory:
+            _start_tracemalloc(self.profile)
+        if self.cprofile:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                self._profiler = None  # un autre profileur est déjà actif (Python 3.12+)
+        self.profile.started = datetime.now().isoformat(timespec="milliseconds")
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self.profile
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profile.wall_time = time.perf_counter() - self._wall
+        self.profile.cpu_time = time.thread_time() - self._cpu
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile.profiler = self._profiler
+            self.profile.top_functions = top_functions(self._profiler, self.top)
+        if self.memory:
+            self.profile.peak_memory = _stop_tracemalloc(self.profile)
+        self.profile.status = "ok" if exc_type is None else exc_type.__name__
+        return False
+
+
+def top_functions(profiler, count=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+        rows.append({"function": function, "file": filename, "line": line, "calls": calls,
+                     "total_time": total_time, "cumulative_time": cumulative_time})
+    rows.sort(key=lambda row: row["cumulative_time"], reverse=True)
+    return rows[:count]
+
+
+def _start_tracemalloc(profile):
+    # tracemalloc n'est arrêté qu'à la fin de la dernière exécution mesurée, et seulement s'il a été démarré ici
+    global _tracemalloc_started
+    with _tracemalloc_lock:
+        if not _tracemalloc_profiles:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_started = True
+            tracemalloc.reset_peak()
+        else:
+            # Pic commun à toutes les exécutions en cours : il n'est pas remis à zéro, et aucune n'a un pic à elle
+            profile.peak_overlapped = True
+            for other in _tracemalloc_profiles.values():
+                other.peak_overlapped = True
+        _tracemalloc_profiles[id(profile)] = profile
+
+
+def _stop_tracemalloc(profile):
+    global _tracemalloc_started
+    with _tracemalloc_lock:
+        _, peak = tracemalloc.get_traced_memory()
+        del _tracemalloc_profiles[id(profile)]
+        if not _tracemalloc_profiles and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+        return peak
@@ -0,0 +1,385 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import typing
+
+import numpy as np
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QTableView, QApplication, \
+    QAbstractItemView
+
+from field_editors import FieldEditor
+from instance_group import MIXED_TEXT, is_mixed
+
+# Lignes ajoutées au modèle à chaque défilement vers le bas de la table
+CHUNK_ROWS = 500
+# Au-delà de ce nombre d'éléments, la vue virtualisée n'affiche que la taille de la séquence
+DISPLAY_ITEMS = 8
+
+# Type NumPy utilisé pour lire les éléments collés dans une liste, selon le type Python des éléments
+_ELEMENT_DTYPES = {bool: np.dtype(np.bool_), int: np.dtype(np.int64), float: np.dtype(np.float64),
+                   complex: np.dtype(np.complex128)}
+# Conversion des valeurs collées selon la catégorie du dtype
+_KIND_TYPES = {"i": int, "u": int, "f": float, "c": complex}
+_TRUE = ("true", "1", "yes")
+_FALSE = ("false", "0", "no")
+# Séparateurs des nombres collés, en plus des tabulations et des fins de ligne
+_NUMBER_SEPARATORS = str.maketrans(",;", "  ")
+
+
+def element_type(value_type, value):
+    """Python type of the elements of a list or tuple: from the annotation (list[int]), else from the first element.
+
+    Only bool, int, float, complex and str elements can be edited; the others are shown read-only as text.
+    """
+    args = typing.get_args(value_type)
+    if args and isinstance(args[0], type):
+        return args[0]
+    if value is not None and len(value):
+        return type(value[0])
+    return str
+
+
+def parse_block(text, dtype):
+    """Parse pasted text into a 2D array of `dtype`: one row per line, values separated by tabs.
+
+    Numbers and booleans may also be separated by spaces, commas or semicolons. The text is split once and the
+    values converted straight into the result array; ValueError names the first invalid value or the first row
+    whose length differs from the first one.
+    """
+    dtype = np.dtype(dtype)
+    numeric = dtype.kind in "biufc"
+    if numeric:
+        text = text.translate(_NUMBER_SEPARATORS)
+    lines = list(filter(str.strip, text.splitlines()))
+    if not lines:
+        raise ValueError("no value to paste")
+    if numeric:
+        tokens = text.split()
+        # Autant de valeurs que de lignes non vides : une colonne, sans découper chaque ligne
+        if len(tokens) == len(lines):
+            widths = np.ones(1, np.intp)
+        else:
+            widths = np.fromiter(map(len, map(str.split, lines)), np.intp, len(lines))
+    else:
+        rows = [line.split("\t") for line in lines]
+        widths = np.fromiter(map(len, rows), np.intp, len(rows))
+        tokens = [token.strip() for row in rows for token in row]
+    ragged = np.flatnonzero(widths != widths[0])
+    if ragged.size:
+        raise ValueError(f"line {ragged[0] + 1} has {widths[ragged[0]]} values instead of {widths[0]}")
+
+    if dtype.kind == "b":
+        lowered = np.char.lower(np.array(tokens, dtype=str))
+        values = np.isin(lowered, _TRUE)
+        invalid = ~(values | np.isin(lowered, _FALSE))
+        if invalid.any():
+            raise ValueError(f"invalid boolean {tokens[np.flatnonzero(invalid)[0]]!r}")
+    elif numeric:
+        # Conversion en une passe C (map) vers le tableau final, sans liste intermédiaire de nombres
+        convert = _KIND_TYPES[dtype.kind]
+        try:
+            values = np.fromiter(map(convert, tokens), dtype, len(tokens))
+        except (ValueError, OverflowError):
+            # Chemin d'erreur seulement : recherche de la première valeur invalide pour le message
+            for token in tokens:
+                try:
+                    np.array(convert(token), dtype)
+                except (ValueError, OverflowError):
+                    raise ValueError(f"invalid {dtype} value {token!r}") from None
+            raise
+    elif dtype == object:
+        values = np.array(tokens, dtype=object)
+    else:
+        values = np.array(tokens, dtype=dtype)
+    return values.reshape(len(lines), int(widths[0]))
+
+
+class SequenceTableModel(QAbstractTableModel):
+    """Table model of a list, a tuple or a 1D/2D NumPy array, read and written in place.
+
+    Rows are added to the model by chunks of `CHUNK_ROWS` as the view scrolls, and cells are converted to text only
+    when they are drawn. The shown sequence belongs to the edited attribute: the first write copies it once (a list
+    for tuples), then every write goes into that copy until `take()` hands it out. Sequences of other elements than
+    numbers, booleans and strings, and object arrays, are read-only.
+    """
+
+    # Émis après chaque écriture, insertion ou suppression
+    written = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.grid = None
+        self.dtype = np.dtype(str)
+        self.python_type = str
+        self.owned = False
+        self.modified = False
+        self.loaded = 0
+
+    def set_values(self, values, value_type=None):
+        self.beginResetModel()
+        if isinstance(values, np.ndarray):
+            self.dtype = values.dtype
+            self.python_type = None
+        else:
+            self.python_type = element_type(value_type, values)
+            self.dtype = _ELEMENT_DTYPES.get(self.python_type, np.dtype(str if self.python_type is str else object))
+        self.values = values
+        self.grid = self.as_grid(values)
+        self.owned = False
+        self.modified = False
+        self.loaded = min(self.total_rows(), CHUNK_ROWS)
+        self.endResetModel()
+
+    @staticmethod
+    def as_grid(values):
+        # Vue 2D des tableaux (un tableau 1D devient une colonne, sans copie) ; None pour les listes
+        if isinstance(values, np.ndarray):
+            return values.reshape(len(values), 1) if values.ndim == 1 else values
+        return None
+
+    def is_array(self):
+        return self.grid is not None
+
+    def is_editable(self):
+        return self.dtype.kind != "O"
+
+    def total_rows(self):
+        return len(self.values)
+
+    def own(self):
+        # Copie de la séquence avant d'y écrire, si elle appartient à l'attribut ou a déjà été remise par take()
+        if not self.is_editable():
+            raise ValueError("read-only elements")
+        if not self.owned:
+            self.values = self.values.copy() if self.is_array() else list(self.values)
+            self.grid = self.as_grid(self.values)
+            self.owned = True
+            self.modified = True
+
+    def take(self):
+        """Return the edited sequence, which is never written again: the next write works on a new copy."""
+        self.owned = False
+        return self.values
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.grid.shape[1] if self.is_array() else 1
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < self.total_rows()
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(CHUNK_ROWS, self.total_rows() - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def cell(self, row, column):
+        return self.grid[row, column] if self.is_array() else self.values[row]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        return str(self.cell(index.row(), index.column()))
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return str(section)  # indices Python, à partir de 0
+
+    def flags(self, index):
+        flags = super().flags(index)
+        return flags | Qt.ItemFlag.ItemIsEditable if self.is_editable() else flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        try:
+            if self.dtype.kind in "US":
+                # Une cellule de texte reçoit la saisie telle quelle, séparateurs et chaîne vide compris
+                block = np.array([[str(value)]], dtype=self.dtype)
+            else:
+                block = parse_block(str(value), self.dtype)
+            self.write_block(index.row(), index.column(), block)
+        except ValueError:
+            return False
+        return True
+
+    def write_block(self, row, column, block):
+        """Write a 2D block of values with its top-left corner at (row, column); lists grow to fit it."""
+        height, width = block.shape
+        if column + width > self.columnCount():
+            raise ValueError(f"{width} columns do not fit from column {column}")
+        if self.is_array() and row + height > self.total_rows():
+            raise ValueError(f"{height} rows do not fit from row {row} in an array of {self.total_rows()} rows")
+
+        self.own()
+        if self.is_array():
+            self.grid[row:row + height, column:column + width] = block
+        else:
+            # Conversion en objets Python en une passe C (tolist), écrite directement dans la liste
+            self.values[row:row + height] = block[:, 0].tolist()
+        last_row = min(row + height, self.loaded) - 1
+        if last_row >= row:
+            self.dataChanged.emit(self.index(row, column), self.index(last_row, column + width - 1))
+        if self.loaded < min(self.total_rows(), CHUNK_ROWS):
+            self.fetchMore()  # liste qui était plus courte qu'un bloc
+        self.written.emit()
+
+    def insert_rows(self, row, count=1):
+        # Listes seulement : éléments ajoutés avec la valeur par défaut de leur type
+        self.own()
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+        self.values[row:row] = [self.python_type()] * count
+        self.loaded += count
+        self.endInsertRows()
+        self.written.emit()
+
+    def remove_rows(self, rows):
+        # Suppression par plages de lignes consécutives, en partant de la fin
+        rows = sorted(row for row in set(rows) if row < self.loaded)
+        if not rows:
+            return
+        self.own()
+        starts = [index for index in range(len(rows)) if index == 0 or rows[index] != rows[index - 1] + 1]
+        for start_index, stop_index in reversed(list(zip(starts, starts[1:] + [len(rows)]))):
+            first, last = rows[start_index], rows[stop_index - 1]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.values[first:last + 1]
+            self.loaded -= last - first + 1
+            self.endRemoveRows()
+        self.written.emit()
+
+
+class SequenceTable(QWidget):
+    """Table view of a SequenceTableModel with paste (Ctrl+V), and add/remove buttons for lists.
+
+    `on_edit()` is called after each write.
+    """
+
+    def __init__(self, on_edit=None, parent=None):
+        super().__init__(parent)
+        self.on_edit = on_edit
+        self.model = SequenceTableModel(self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked
+                                  | QAbstractItemView.EditTrigger.EditKeyPressed
+                                  | QAbstractItemView.EditTrigger.AnyKeyPressed)
+        self.model.written.connect(self.edited)
+        QShortcut(QKeySequence.StandardKey.Paste, self.view, self.paste, context=Qt.ShortcutContext.WidgetShortcut)
+
+        self.paste_button = QPushButton("Paste")
+        self.paste_button.clicked.connect(self.paste)
+        self.add_button = QPushButton("+")
+        self.add_button.clicked.connect(self.add_row)
+        self.remove_button = QPushButton("-")
+        self.remove_button.clicked.connect(self.remove_rows)
+        self.status_label = QLabel("")
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.status_label, 1)
+        buttons.addWidget(self.paste_button)
+        buttons.addWidget(self.add_button)
+        buttons.addWidget(self.remove_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view)
+        layout.addLayout(buttons)
+        self.setMinimumHeight(160)
+
+    def set_values(self, values, value_type=None):
+        self.model.set_values(values, value_type)
+        editable = self.model.is_editable()
+        self.paste_button.setVisible(editable)
+        self.add_button.setVisible(editable and not self.model.is_array())
+        self.remove_button.setVisible(editable and not self.model.is_array())
+        self.update_status("" if editable else "read-only")
+
+    def update_status(self, message=""):
+        if self.model.is_array():
+            summary = f"{' x '.join(map(str, self.model.values.shape))} {self.model.dtype}"
+        else:
+            summary = f"{self.model.total_rows()} {self.model.python_type.__name__}"
+        self.status_label.setText(f"{summary} - {message}" if message else summary)
+
+    def edited(self, *_):
+        if self.on_edit is not None:
+            self.on_edit()
+
+    def current_cell(self):
+        index = self.view.currentIndex()
+        return (index.row(), index.column()) if index.isValid() else (0, 0)
+
+    def paste(self):
+        # Bloc collé depuis un tableur ou un fichier texte, à partir de la cellule courante
+        text = QApplication.clipboard().text()
+        row, column = self.current_cell()
+        try:
+            block = parse_block(text, self.model.dtype)
+            self.model.write_block(row, column, block)
+        except ValueError as error:
+            self.update_status(f"paste failed: {error}")
+            return
+        self.update_status(f"{block.size} values pasted")
+
+    def add_row(self):
+        row = self.view.currentIndex().row() + 1 if self.view.currentIndex().isValid() else self.model.loaded
+        self.model.insert_rows(row)
+        self.view.setCurrentIndex(self.model.index(row, 0))
+        self.update_status()
+
+    def remove_rows(self):
+        rows = {index.row() for index in self.view.selectionModel().selectedIndexes()}
+        if not rows and self.view.currentIndex().isValid():
+            rows = {self.view.currentIndex().row()}
+        if rows:
+            self.model.remove_rows(rows)
+            self.update_status()
+
+
+class SequenceEditor(FieldEditor):
+    """Table editor of list and tuple attributes, with typed elements (see element_type)."""
+
+    def create_widget(self, parent, label):
+        # list ou tuple, d'après l'annotation (tuple[int] par exemple) puis d'après chaque valeur affichée
+        self.sequence_type = typing.get_origin(self.value_type) or self.value_type
+        table = SequenceTable(self.notify, parent)
+        table.set_values([], self.value_type)
+        return table
+
+    def get(self):
+        # Un tuple est reconstruit ; une liste est remise telle quelle, les écritures suivantes se font dans une copie
+        if self.sequence_type is tuple:
+            return tuple(self.widget.model.values)
+        return self.widget.model.take()
+
+    def show_value(self, value):
+        self.sequence_type = type(value) if isinstance(value, (list, tuple)) else self.sequence_type
+        self.widget.set_values(value, self.value_type)
+
+    def show_mixed(self):
+        # Table vide : une saisie ou un collage définit la séquence de toutes les instances
+        self.widget.set_values([], self.value_type)
+        self.widget.update_status(MIXED_TEXT)
+
+    @classmethod
+    def display(cls, value):
+        if value is None:
+            return ""
+        if is_mixed(value):
+            return MIXED_TEXT
+        if len(value) > DISPLAY_ITEMS:
+            return f"{type(value).__name__} of {len(value)} items"
+        return ", ".join(str(i) for i in value)
@@ -0,0 +1,156 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from class_schema import get_schema
+from instance_group import InstanceGroup
+
+# Nombre maximal de modifications conservées par l'historique d'annulation
+HISTORY_DEPTH = 100
+
+# Conteneurs mutables copiés superficiellement dans un instantané
+_SHALLOW_COPIED = (list, dict, set, bytearray)
+
+
+class Snapshot:
+    """Values of the annotated attributes of an instance at a given time.
+
+    Only the annotated attributes are recorded. Nested annotated objects get their own snapshot, small mutable
+    containers are copied shallowly and everything else, large buffers such as NumPy arrays included, is shared by
+    reference: the methods of the edited classes rebind their attributes to new arrays rather than writing into
+    them, so a snapshot costs a few references instead of a copy of every buffer.
+    """
+
+    def __init__(self, obj, values):
+        self.obj = obj
+        self.values = values
+
+    def restore(self, _seen=None):
+        # _seen : instantanés déjà restaurés, pour les graphes auto-référencés
+        seen = set() if _seen is None else _seen
+        if id(self) in seen:
+            return self.obj
+        seen.add(id(self))
+        for attr_name, value in self.values.items():
+            if isinstance(value, Snapshot):
+                value.restore(seen)
+                value = value.obj
+            elif isinstance(value, _SHALLOW_COPIED):
+                value = type(value)(value)  # l'instantané reste réutilisable
+            if getattr(self.obj, attr_name, None) is not value:
+                setattr(self.obj, attr_name, value)
+        return self.obj
+
+    def changed_attributes(self, _seen=None):
+        # Noms des attributs (chemins pointés pour les objets imbriqués) modifiés depuis l'instantané
+        seen = set() if _seen is None else _seen
+        seen.add(id(self))
+        changed = []
+        for attr_name, value in self.values.items():
+            current = getattr(self.obj, attr_name, None)
+            if isinstance(value, Snapshot):
+                if current is not value.obj:
+                    changed.append(attr_name)
+                elif id(value) not in seen:
+                    changed.extend(f"{attr_name}.{name}" for name in value.changed_attributes(seen))
+            elif current is not value and (not isinstance(value, _SHALLOW_COPIED) or current != value):
+                changed.append(attr_name)
+        return changed
+
+
+class GroupSnapshot:
+    """Snapshots of the instances of an InstanceGroup, restored instance by instance."""
+
+    def __init__(self, obj, snapshots):
+        self.obj = obj
+        self.snapshots = snapshots
+
+    def restore(self, _seen=None):
+        seen = set() if _seen is None else _seen
+        for snapshot in self.snapshots:
+            snapshot.restore(seen)
+        return self.obj
+
+    def changed_attributes(self, _seen=None):
+        seen = set() if _seen is None else _seen
+        changed = {}
+        for snapshot in self.snapshots:
+            if id(snapshot) not in seen:
+                changed.update(dict.fromkeys(snapshot.changed_attributes(seen)))
+        return list(changed)
+
+
+def take_snapshot(obj, _seen=None):
+    seen = {} if _seen is None else _seen
+    if isinstance(obj, InstanceGroup):
+        return GroupSnapshot(obj, [take_snapshot(instance, seen) for instance in obj])
+    if id(obj) in seen:
+        return seen[id(obj)]  # graphe cyclique : l'instantané est déjà en cours de construction
+
+    values = {}
+    snapshot = seen[id(obj)] = Snapshot(obj, values)
+    for attr_spec in get_schema(obj).attributes:
+        value = getattr(obj, attr_spec.name, None)
+        if isinstance(value, _SHALLOW_COPIED):
+            value = type(value)(value)
+        elif isinstance(attr_spec.type, type) and isinstance(value, attr_spec.type) \
+                and get_schema(value).attributes:
+            value = take_snapshot(value, seen)
+        values[attr_spec.name] = value
+    return snapshot
+
+
+class History:
+    """Undo/redo stack of attribute changes.
+
+    Each entry is the list of (target, attribute name, old value, new value) written together, so the memory used
+    is proportional to what actually changed.
+    """
+
+    def __init__(self, max_depth=HISTORY_DEPTH):
+        self.max_depth = max_depth
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def record(self, target, changes):
+        self.record_entry([(target, attr_name, old, new) for attr_name, (old, new) in changes.items()])
+
+    def record_entry(self, entry):
+        entry = [change for change in entry if change[2] is not change[3]]
+        if not entry:
+            return
+        self.undo_stack.append(entry)
+        del self.undo_stack[:-self.max_depth]
+        self.redo_stack.clear()
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        for target, attr_name, old, _ in reversed(entry):
+            setattr(target, attr_name, old)
+        self.redo_stack.append(entry)
+        return entry
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        for target, attr_name, _, new in entry:
+            setattr(target, attr_name, new)
+        self.undo_stack.append(entry)
+        return entry
+
+    def mark(self):
+        return len(self.undo_stack)
+
+    def truncate(self, mark):
+        # Oublie les modifications enregistrées après mark (par exemple par une sous-fenêtre annulée)
+        del self.undo_stack[mark:]
+        self.redo_stack.clear()
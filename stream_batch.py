@@ -0,0 +1,178 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import argparse
+import glob
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+from batch_runner import parse_assignments, write_results, print_summary
+from class_schema import attribute_spec, assign_path, coerce_value
+from example_class import Config, config_pipeline, output_file_name
+from presets import load_preset
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def list_inputs(sources):
+    """Image files of directories and glob patterns, sorted and without duplicates."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(os.path.join(source, name) for name in os.listdir(source)
+                         if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.extend(glob.glob(source))
+    return sorted(set(paths))
+
+
+def read_image(path):
+    start = time.perf_counter()
+    image = cv2.imread(path)
+    if image is None:
+        raise OSError(f"cannot read {path}")
+    return image, time.perf_counter() - start
+
+
+def stream_images(paths, process, output_dir, readers=4, writers=2, read_ahead=16, write_queue=16, on_result=None):
+    """Decode, process and encode images with I/O overlapped with processing.
+
+    `readers` threads decode at most `read_ahead` images ahead of the calling thread, which applies `process` to each
+    image in order; results go through a queue of at most `write_queue` images to `writers` encoding threads, so a
+    slow disk blocks processing instead of accumulating images in memory. OpenCV releases the GIL while decoding
+    and encoding. Rows are returned in the order of `paths`; `on_result(done, total, row)` is called from the
+    thread that completes each image.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    date = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    rows = [None] * len(paths)
+    lock = threading.Lock()
+    done_count = 0
+    to_write = queue.Queue(maxsize=write_queue)
+
+    def finish(index, row):
+        nonlocal done_count
+        row["seconds"] = row["read_seconds"] + row["process_seconds"] + row["write_seconds"]
+        with lock:
+            rows[index] = row
+            done_count += 1
+            count = done_count
+        if on_result is not None:
+            on_result(count, len(paths), row)
+
+    def write_loop():
+        while True:
+            item = to_write.get()
+            if item is None:
+                return
+            index, row, image = item
+            start = time.perf_counter()
+            try:
+                if not cv2.imwrite(row["output"], image):
+                    raise OSError(f"cannot write {row['output']}")
+            except Exception as error:
+                row.update(status="error", error=repr(error))
+            row["write_seconds"] = time.perf_counter() - start
+            finish(index, row)
+
+    # Les sorties de même nom (a.png et a.jpg) sont numérotées
+    used_names = set()
+
+    def output_path(index, path):
+        name = output_file_name(path, date)
+        if name in used_names:
+            root, extension = os.path.splitext(name)
+            name = f"{root}_{index}{extension}"
+        used_names.add(name)
+        return os.path.join(output_dir, name)
+
+    writer_threads = [threading.Thread(target=write_loop, daemon=True) for _ in range(writers)]
+    for thread in writer_threads:
+        thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=readers) as read_pool:
+            path_iter = iter(enumerate(paths))
+            pending = deque()
+            while True:
+                # Lecture anticipée bornée à read_ahead images décodées ou en cours de décodage
+                for index, path in itertools.islice(path_iter, read_ahead - len(pending)):
+                    pending.append((index, path, read_pool.submit(read_image, path)))
+                if not pending:
+                    break
+
+                index, path, future = pending.popleft()
+                row = {"input": path, "output": "", "status": "ok", "read_seconds": 0.0, "process_seconds": 0.0,
+                       "write_seconds": 0.0, "error": ""}
+                try:
+                    image, row["read_seconds"] = future.result()
+                    start = time.perf_counter()
+                    result = process(image)
+                    row["process_seconds"] = time.perf_counter() - start
+                except Exception as error:
+                    row.update(status="error", error=repr(error))
+                    finish(index, row)
+                    continue
+                del image
+                row["output"] = output_path(index, path)
+                to_write.put((index, row, result))  # bloque quand les écritures sont en retard
+    finally:
+        for _ in writer_threads:
+            to_write.put(None)
+        for thread in writer_threads:
+            thread.join()
+    return rows
+
+
+def build_config(preset=None, assignments=None):
+    config = Config()
+    if preset:
+        load_preset(config, preset)
+    for path, value in (assignments or {}).items():
+        assign_path(config, path, coerce_value(value, attribute_spec(Config, path).type))
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a Config to every image of directories or glob patterns, "
+                                                 "with threaded decoding and encoding.")
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns")
+    parser.add_argument("--output-dir", required=True, help="directory for the processed images")
+    parser.add_argument("--preset", help="Config preset saved from the window")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Config attribute, e.g. angle=90 (applied after --preset)")
+    parser.add_argument("--readers", type=int, default=4, help="decoding threads")
+    parser.add_argument("--writers", type=int, default=2, help="encoding threads")
+    parser.add_argument("--read-ahead", type=int, default=16, help="images decoded ahead of processing")
+    parser.add_argument("--write-queue", type=int, default=16, help="processed images waiting to be encoded")
+    parser.add_argument("--report", help="CSV file for the per-image report")
+    args = parser.parse_args(argv)
+
+    paths = list_inputs(args.inputs)
+    if not paths:
+        parser.error("no image matches " + " ".join(args.inputs))
+    config = build_config(args.preset, {name: values[0] for name, values in parse_assignments(args.set).items()})
+
+    start = time.perf_counter()
+    rows = stream_images(paths, config_pipeline(config).run, args.output_dir, args.readers, args.writers,
+                         args.read_ahead, args.write_queue,
+                         on_result=lambda done, total, row: print(f"\r{done}/{total}", end="", file=sys.stderr))
+    print(file=sys.stderr)
+
+    if args.report:
+        with open(args.report, "w", newline="") as file:
+            write_results(rows, file)
+    print_summary(rows, time.perf_counter() - start, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
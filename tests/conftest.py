@@ -0,0 +1,35 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import os
+import sys
+
+import pytest
+
+# Les modules du projet sont à la racine du dépôt ; Qt s'exécute sans affichage
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def wait_until(qapp):
+    # Traite les événements Qt jusqu'à ce que la condition soit vraie
+    import time
+
+    def wait(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise AssertionError("condition not met within the timeout")
+            qapp.processEvents()
+            time.sleep(0.005)
+
+    return wait
@@ -0,0 +1,58 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import pytest
+from PyQt6.QtCore import QModelIndex, Qt, qInstallMessageHandler
+from PyQt6.QtTest import QAbstractItemModelTester
+
+from attribute_model import AttributeItemModel, VALUE_COLUMN
+from class_schema import get_schema
+
+
+class Inner:
+    gain: float = 1.0
+    label: str = "x"
+
+
+class Outer:
+    angle: float = 0.0
+    enabled: bool = True
+    inner: Inner = None
+
+    def __init__(self):
+        self.inner = Inner()
+        self.inner.gain = 2.0
+
+
+@pytest.fixture
+def model_warnings(qapp):
+    warnings = []
+    previous = qInstallMessageHandler(lambda mode, context, message: warnings.append(message))
+    yield warnings
+    qInstallMessageHandler(previous)
+
+
+def test_model_passes_the_model_tester(model_warnings):
+    outer = Outer()
+    model = AttributeItemModel(outer, get_schema(outer))
+    tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning)
+
+    # La racine n'a pas d'attribut : rien à charger, sa valeur est l'instance elle-même
+    model.fetchMore(QModelIndex())
+    assert model.value(QModelIndex()) is outer
+
+    inner_index = model.index(2, 0)
+    assert model.hasChildren(inner_index)
+    if model.canFetchMore(inner_index):
+        model.fetchMore(inner_index)
+    assert model.rowCount(inner_index) == 2
+    assert model.data(model.index(0, VALUE_COLUMN, inner_index), Qt.ItemDataRole.EditRole) == 2.0
+
+    assert model.setData(model.index(0, VALUE_COLUMN), 45.0)
+    assert outer.angle == 45.0
+    assert model.setData(model.index(1, VALUE_COLUMN), Qt.CheckState.Unchecked.value, Qt.ItemDataRole.CheckStateRole)
+    assert outer.enabled is False
+    model.refresh()
+    del tester
+    assert not [message for message in model_warnings if "FAIL" in message], model_warnings
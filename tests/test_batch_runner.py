@@ -0,0 +1,53 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from batch_runner import build_combinations, build_init_kwargs, build_tasks, run_batch
+from example_class import ProcessImage
+
+
+class Crasher:
+    value: int = 0
+
+    def run(self):
+        if self.value == 2:
+            os._exit(1)  # le processus de travail meurt
+        return self.value * 10
+
+
+def test_show_is_forced_off_in_workers():
+    assert build_init_kwargs(ProcessImage, {})["show"] is False
+    assert build_init_kwargs(ProcessImage, {"show": "false"})["show"] is False
+    with pytest.raises(ValueError, match="display"):
+        build_init_kwargs(ProcessImage, {"show": "true"})
+
+
+def test_tasks_of_a_sweep_never_overwrite_each_other(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cv2.imwrite("input.png", np.full((16, 16, 3), 128, np.uint8))
+    combinations = build_combinations(ProcessImage, "process_with_config", {"config.angle": ["0", "90", "180"]})
+    tasks = build_tasks("example_class:ProcessImage", "process_with_config", combinations, ["input.png"],
+                        init_kwargs=build_init_kwargs(ProcessImage, {}), output_dir="out")
+    rows = run_batch(tasks, workers=2)
+
+    assert [row["status"] for row in rows] == ["ok"] * 3
+    outputs = [row["outputs"] for row in rows]
+    assert len(set(outputs)) == 3 and all(name.startswith(f"task_{i:05d}_") for i, name in enumerate(outputs))
+    assert sorted(os.listdir("out")) == sorted(outputs)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".png") and name != "input.png"]
+
+
+def test_a_dying_worker_only_fails_its_own_task():
+    combinations = build_combinations(Crasher, "run", {"value": ["0", "1", "2", "3", "4"]})
+    tasks = build_tasks(f"{__name__}:Crasher", "run", combinations)
+    rows = run_batch(tasks, workers=2)
+
+    assert [row["status"] for row in rows] == ["ok", "ok", "error", "ok", "ok"]
+    assert [row["result"] for row in rows if row["status"] == "ok"] == ["0", "10", "30", "40"]
+    assert rows[2]["error"] == "worker process died"
@@ -0,0 +1,47 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import json
+
+import benchmark
+from class_schema import get_class_schema
+
+
+def test_synthetic_class_shape():
+    cls = benchmark.make_synthetic_class(8, 3, depth=1)
+    schema = get_class_schema(cls)
+    assert len(schema.attributes) == 9  # 8 champs et l'objet imbriqué
+    assert len(schema.methods) == 3
+    assert [param.name for param in schema.method("method_0").params] == ["p0", "p1", "p2"]
+    assert len(get_class_schema(type(cls.child)).attributes) == 8
+
+
+def test_compare_counts_regressions_above_the_threshold(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": [
+        {"name": "window_build", "params": {"attributes": 10}, "median": 1.0},
+        {"name": "window_build", "params": {"attributes": 100}, "median": 1.0},
+    ]}))
+    results = [
+        benchmark.result("window_build", {"attributes": 10}, [1.15]),  # dans la tolérance
+        benchmark.result("window_build", {"attributes": 100}, [1.5]),
+        benchmark.result("run_dispatch", {"attributes": 10}, [9.0]),  # absente de la référence
+    ]
+    assert benchmark.compare(results, str(baseline), 0.2) == 1
+    assert benchmark.compare(results, str(baseline), 0.1) == 2
+
+
+def test_window_benchmark_dispatches_every_run(qapp, monkeypatch):
+    from Class_GUI_maker import DynamicConfigWindow
+
+    statuses = []
+    update_run_status = DynamicConfigWindow.update_run_status
+    monkeypatch.setattr(DynamicConfigWindow, "update_run_status",
+                        lambda window, text: (statuses.append(text), update_run_status(window, text)))
+
+    results = benchmark.bench_window(qapp, [(4, 2, 0)], repeat=1)
+    assert [entry["name"] for entry in results] == ["window_build", "method_switch", "run_dispatch",
+                                                    "run_round_trip"]
+    # Chaque mesure de soumission démarre vraiment une exécution
+    assert not [text for text in statuses if "not started" in text]
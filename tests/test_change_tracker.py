@@ -0,0 +1,73 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import time
+
+from change_tracker import ChangeTracker
+from snapshot import History
+
+
+class Target:
+    def __init__(self):
+        self.writes = []
+        self._angle = 0.0
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        self.writes.append(value)
+        self._angle = value
+
+
+def test_edits_are_coalesced_into_one_write(qapp, wait_until):
+    target = Target()
+    tracker = ChangeTracker(target, delay_ms=20, max_delay_ms=10_000)
+    emitted = []
+    tracker.subscribe(emitted.append)
+    for value in (1.0, 2.0, 3.0):
+        tracker.stage("angle", value)
+    assert target.writes == [] and tracker.is_dirty("angle")
+
+    wait_until(lambda: target.writes)
+    assert target.writes == [3.0] and emitted == [{"angle": 3.0}]
+
+
+def test_max_delay_bounds_the_wait(qapp):
+    target = Target()
+    tracker = ChangeTracker(target, delay_ms=10_000, max_delay_ms=20)
+    tracker.stage("angle", 1.0)
+    time.sleep(0.03)
+    tracker.stage("angle", 2.0)
+    assert target.writes == [2.0]
+
+
+def test_commit_records_one_history_entry(qapp):
+    target = Target()
+    history = History()
+    tracker = ChangeTracker(target, history=history)
+    tracker.stage("angle", 5.0)
+    tracker.stage("angle", 6.0)
+    tracker.commit()
+    history.undo()
+    assert target.angle == 0.0 and not history.can_undo()
+
+
+def test_held_edits_are_written_on_release(qapp):
+    target = Target()
+    tracker = ChangeTracker(target)
+    tracker.hold()
+    tracker.stage("angle", 4.0)
+    assert tracker.commit() == {} and target.writes == []
+    assert tracker.release() == {"angle": 4.0} and target.angle == 4.0
+
+
+def test_discard_drops_pending_edits(qapp):
+    target = Target()
+    tracker = ChangeTracker(target)
+    tracker.stage("angle", 9.0)
+    tracker.discard()
+    assert tracker.commit() == {} and target.writes == []
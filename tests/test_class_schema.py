@@ -0,0 +1,49 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import class_schema
+from class_schema import get_class_schema
+
+
+def make_class():
+    class Settings:
+        gain: float = 1.0
+
+        def run(self, factor: float):
+            pass
+
+    return Settings
+
+
+def test_schema_is_cached():
+    cls = make_class()
+    assert get_class_schema(cls) is get_class_schema(cls)
+
+
+def test_replacing_a_method_in_place_rebuilds_the_schema():
+    cls = make_class()
+    assert [param.name for param in get_class_schema(cls).method("run").params] == ["factor"]
+
+    # Deux remplacements de suite : l'ancienne fonction libérée ne doit pas rendre une version déjà vue
+    for names in (("factor", "offset"), ("scale",)):
+        namespace = {}
+        exec(f"def run(self, {', '.join(name + ': float' for name in names)}): pass", namespace)
+        cls.run = namespace["run"]
+        assert [param.name for param in get_class_schema(cls).method("run").params] == list(names)
+
+
+def test_changing_an_annotation_in_place_rebuilds_the_schema():
+    cls = make_class()
+    assert get_class_schema(cls).attribute("gain").type is float
+    cls.__annotations__["gain"] = int
+    assert get_class_schema(cls).attribute("gain").type is int
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(class_schema, "SCHEMA_CACHE_SIZE", 3)
+    classes = [make_class() for _ in range(5)]
+    for cls in classes:
+        get_class_schema(cls)
+    assert len(class_schema._schemas) == 3
+    assert classes[0] not in class_schema._schemas and classes[-1] in class_schema._schemas
@@ -0,0 +1,63 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import sys
+
+import pytest
+
+import field_editors
+from field_editors import BoolEditor, IntEditor, NestedEditor, StrEditor, editor_for, register_editor, \
+    register_lazy_editor
+
+
+class Unit:
+    pass
+
+
+class Meter(Unit):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    # Chaque test retrouve les éditeurs enregistrés par défaut
+    saved = [dict(registry) for registry in (field_editors._editors, field_editors._lazy_editors)]
+    yield
+    for registry, content in zip((field_editors._editors, field_editors._lazy_editors), saved):
+        registry.clear()
+        registry.update(content)
+    field_editors._resolved.clear()
+
+
+def test_builtin_types_and_subclasses_follow_the_mro():
+    assert editor_for(bool) is BoolEditor  # bool avant int
+    assert editor_for(int) is IntEditor
+    assert editor_for(Meter) is NestedEditor
+
+    register_editor(Unit, StrEditor)
+    # L'enregistrement invalide les résolutions déjà faites
+    assert editor_for(Meter) is StrEditor
+
+
+def test_lazy_editor_imports_its_module_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / "unit_editors.py").write_text("from field_editors import StrEditor\n\n\n"
+                                              "class UnitEditor(StrEditor):\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "unit_editors", raising=False)
+
+    register_lazy_editor(f"{Unit.__module__}.{Unit.__qualname__}", "unit_editors:UnitEditor")
+    assert "unit_editors" not in sys.modules
+    assert editor_for(Meter).__name__ == "UnitEditor"
+    assert "unit_editors" in sys.modules
+
+
+def test_unknown_annotation_is_never_cached():
+    annotation = "not a type"
+    assert editor_for(annotation) is None
+    assert editor_for(annotation, 3) is IntEditor
+    assert editor_for(annotation, "text") is StrEditor
+    assert annotation not in field_editors._resolved
+
+    # Annotation non hachable : la valeur décide aussi
+    assert editor_for([int], True) is BoolEditor
@@ -0,0 +1,127 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import gc
+import os
+import weakref
+
+import cv2
+import numpy as np
+import pytest
+
+import image_pipeline
+from example_class import Config, ProcessImage
+from image_pipeline import ImagePipeline, IntermediateCache
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (300, 200, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("operations", [
+    [("brightness", 10), ("contrast", 1.2)],
+    [("contrast", 0.7), ("brightness", -35.5), ("contrast", 2.5)],
+    [("brightness", 300), ("contrast", -1.5)],
+    [("contrast", 1.0), ("brightness", 0.0)],
+])
+def test_fused_lut_matches_sequential_convert_scale_abs(image, operations):
+    pipeline = ImagePipeline()
+    expected = image
+    for name, value in operations:
+        pipeline = getattr(pipeline, name)(value)
+        alpha, beta = (value, 0) if name == "contrast" else (1, value)
+        expected = cv2.convertScaleAbs(expected, alpha=alpha, beta=beta)
+    assert np.array_equal(pipeline.run(image), expected)
+
+
+@pytest.fixture
+def allocations(monkeypatch):
+    # Tampons alloués par run() ; chaque allocation relève combien des précédents sont encore en vie
+    buffers, alive_at_allocation = [], []
+    empty = np.empty
+
+    def tracked_empty(shape, dtype=float):
+        alive_at_allocation.append(sum(buffer() is not None for buffer in buffers))
+        array = empty(shape, dtype)
+        buffers.append(weakref.ref(array))
+        return array
+
+    monkeypatch.setattr(image_pipeline.np, "empty", tracked_empty)
+    return buffers, alive_at_allocation
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.float32])
+def test_run_uses_two_buffers_and_keeps_none(image, allocations, dtype):
+    buffers, alive_at_allocation = allocations
+    source = image.astype(dtype)
+    # Étapes non fusionnables ; une image float32 passe en uint8 à la première opération ponctuelle
+    pipeline = ImagePipeline().rotate(10).brightness(5).rotate(-20).contrast(1.1).rotate(30).brightness(-3)
+
+    result = pipeline.run(source)
+    gc.collect()
+    assert max(alive_at_allocation) <= 1  # jamais plus de deux tampons à la fois
+    assert [buffer() for buffer in buffers if buffer() is not None] == [result]
+
+    expected = source
+    for operation in pipeline.operations:
+        if operation.name == "rotate":
+            expected = cv2.warpAffine(expected, operation.matrix(expected.shape), expected.shape[1::-1],
+                                      flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+        else:
+            expected = operation.apply(expected)
+    assert result.dtype == np.uint8
+    assert np.abs(result.astype(np.int16) - expected).max() <= 1  # rotations composées en une seule
+
+
+def test_results_of_successive_runs_do_not_share_memory(image):
+    pipeline = ImagePipeline().brightness(5).rotate(10).contrast(1.5)
+    first, second = pipeline.run(image), pipeline.run(image)
+    assert not np.shares_memory(first, second)
+
+
+def test_cached_prefix_resume_matches_full_run(image):
+    cache = IntermediateCache()
+    ImagePipeline().brightness(20).contrast(1.3).rotate(15).run(image, cache=cache)
+    hits = cache.hits
+
+    pipeline = ImagePipeline().brightness(20).contrast(1.3).rotate(40)
+    assert np.array_equal(pipeline.run(image, cache=cache), pipeline.run(image))
+    assert cache.hits > hits
+
+
+def test_fingerprint_never_reads_the_pixels(image, tmp_path):
+    cache = IntermediateCache()
+    copy = image.copy()
+    assert cache.fingerprint(image) == cache.fingerprint(image)
+    assert cache.fingerprint(copy) != cache.fingerprint(image)  # identité, pas contenu
+
+    # Tableau projeté : identifié par le fichier, même rechargé
+    path = tmp_path / "image.npy"
+    np.save(path, image)
+    mapped = np.load(path, mmap_mode="r")
+    assert cache.fingerprint(np.load(path, mmap_mode="r")) == cache.fingerprint(mapped)
+    assert cache.fingerprint(mapped[10:]) != cache.fingerprint(mapped)
+    assert cache.fingerprint(np.asarray(mapped)[10:]) == cache.fingerprint(mapped[10:])
+
+    # Fichier modifié depuis : nouvelle empreinte
+    fingerprint = cache.fingerprint(mapped)
+    del mapped
+    os.utime(path, ns=(0, 0))
+    assert cache.fingerprint(np.load(path, mmap_mode="r")) != fingerprint
+
+
+def test_process_with_config_starts_from_the_loaded_image(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    cv2.imwrite("input.png", np.full((40, 60, 3), 100, dtype=np.uint8))
+    process_image = ProcessImage("input.png", show=False)
+    process_image.config = Config()
+    process_image.config.brightness = 10
+
+    process_image.process_with_config()
+    process_image.process_with_config()
+    assert process_image.image[20, 30, 0] == 110  # pas de cumul
+    process_image.process_with_config(from_original=False)
+    assert process_image.image[20, 30, 0] == 120  # appliquée sur l'image courante
+    assert capsys.readouterr().out.splitlines().count("0") == 3  # angle affiché à chaque exécution
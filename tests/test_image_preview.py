@@ -0,0 +1,46 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import cv2
+import numpy as np
+import pytest
+
+import image_preview
+from example_class import ProcessImage
+from image_preview import LivePreview, LivePreviewWidget
+
+
+@pytest.fixture
+def process_image(tmp_path):
+    path = str(tmp_path / "image.png")
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8))
+    return ProcessImage(path, show=False)
+
+
+def test_preview_renders_a_downsampled_proxy(process_image, wait_until):
+    preview = LivePreview(process_image, proxy_size=64, full_resolution_delay_ms=10)
+    rendered = []
+    preview.rendered.connect(lambda image, full: rendered.append((image.shape, full)))
+    process_image.config.brightness = 10
+    preview.request()
+    wait_until(lambda: (rendered and rendered[-1][1]))
+    assert rendered[0] == ((48, 64, 3), False) and rendered[-1] == ((120, 160, 3), True)
+
+
+def test_render_error_is_reported_and_preview_keeps_updating(process_image, wait_until, monkeypatch):
+    preview = LivePreview(process_image, proxy_size=64, full_resolution_delay_ms=60_000)
+    widget = LivePreviewWidget(preview)
+    rendered = []
+    preview.rendered.connect(lambda image, full: rendered.append(image))
+
+    apply_config = image_preview.apply_config
+    monkeypatch.setattr(image_preview, "apply_config", lambda *args, **kwargs: 1 / 0)
+    preview.request()
+    wait_until(lambda: "render failed" in widget.windowTitle())
+    assert "ZeroDivisionError" in widget.windowTitle()
+
+    monkeypatch.setattr(image_preview, "apply_config", apply_config)
+    preview.request()
+    wait_until(lambda: rendered)
+    assert widget.windowTitle() == "Live preview"
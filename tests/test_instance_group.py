@@ -0,0 +1,75 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import threading
+
+import pytest
+
+from class_schema import gui_thread
+from Class_GUI_maker import DynamicConfigWindow
+from instance_group import InstanceGroup, Mixed
+
+
+class Job:
+    name: str = "job"
+    size: int = 1
+
+    # Deux instances doivent être dans run() en même temps pour franchir la barrière
+    barrier = None
+
+    def run(self, factor: int = 2):
+        if self.size < 0:
+            raise ValueError("negative size")
+        self.thread = threading.get_ident()
+        Job.barrier.wait(timeout=5)
+        return self.size * factor
+
+    @gui_thread
+    def show(self):
+        self.thread = threading.get_ident()
+        return self.name
+
+
+@pytest.fixture
+def jobs():
+    Job.barrier = threading.Barrier(2)
+    jobs = [Job(), Job()]
+    jobs[1].size = 3
+    return jobs
+
+
+def test_reads_common_values_and_writes_every_instance(jobs):
+    group = InstanceGroup(jobs)
+    assert group.name == "job"
+    assert isinstance(group.size, Mixed) and group.size.values == (1, 3)
+    group.size = 5
+    assert [job.size for job in jobs] == [5, 5]
+    group.size = Mixed([1, 3])
+    assert [job.size for job in jobs] == [1, 3]
+
+
+def test_methods_run_in_parallel_off_the_calling_thread(jobs):
+    jobs.append(Job())
+    jobs[2].size = -1
+    result = InstanceGroup(jobs, workers=2).run(factor=10)
+    assert list(result)[:2] == [10, 30] and list(result.errors) == [2]
+    assert "2/3 ok" in repr(result)
+    # Les deux premières instances ont attendu ensemble la barrière, chacune dans son thread
+    assert len({jobs[0].thread, jobs[1].thread, threading.get_ident()}) == 3
+
+
+def test_window_runs_the_group_in_parallel_off_the_gui_thread(qapp, wait_until, jobs):
+    window = DynamicConfigWindow(jobs, exec_dialog=False)
+    window.methods_combo_box.setCurrentText("run")
+    window.run_method()
+    wait_until(lambda: "done" in window.run_status_label.text())
+    assert "2/2 ok" in window.run_status_label.text()
+    assert len({job.thread for job in jobs} | {threading.get_ident()}) == 3
+
+    # Une méthode marquée gui_thread reste dans le thread de l'interface
+    window.methods_combo_box.setCurrentText("show")
+    window.run_method()
+    wait_until(lambda: "show #2 done" in window.run_status_label.text())
+    assert {job.thread for job in jobs} == {threading.get_ident()}
+    window.reject()
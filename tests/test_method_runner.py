@@ -0,0 +1,123 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import threading
+
+import cv2
+import numpy as np
+
+import example_class
+from Class_GUI_maker import DynamicConfigWindow
+from example_class import ProcessImage
+from method_runner import MethodRunner, is_running, post_to_gui_thread
+
+
+def on_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
+def test_runs_off_the_gui_thread_and_reports_the_result(wait_until):
+    runner = MethodRunner()
+    results = {}
+    runner.finished.connect(lambda run_id, result: results.update({run_id: result}))
+    run_id = runner.submit(on_main_thread)
+    wait_until(lambda: run_id in results)
+    assert results[run_id] is False
+
+
+def test_gui_thread_runs_stay_on_the_gui_thread(wait_until):
+    runner = MethodRunner()
+    results = {}
+    runner.finished.connect(lambda run_id, result: results.update({run_id: result}))
+    run_id = runner.submit(on_main_thread, in_gui_thread=True)
+    wait_until(lambda: run_id in results)
+    assert results[run_id] is True
+
+
+def test_cancel_stops_a_cooperative_run(wait_until):
+    runner = MethodRunner()
+    started, cancelled = threading.Event(), []
+    runner.cancelled.connect(cancelled.append)
+
+    def work(run_context):
+        started.set()
+        while True:
+            run_context.check()
+
+    run_id = runner.submit(work, accepts_context=True)
+    assert started.wait(5)
+    runner.cancel_all()
+    wait_until(lambda: cancelled == [run_id])
+    assert runner.wait(1000) and runner.in_flight() == 0
+
+
+def test_owner_is_running_until_the_run_ends(wait_until):
+    runner = MethodRunner()
+    owner, release, done = object(), threading.Event(), []
+    runner.finished.connect(lambda run_id, result: done.append(run_id))
+    runner.submit(release.wait, (5,), owner=owner)
+    assert is_running(owner)
+    release.set()
+    wait_until(lambda: done)
+    assert not is_running(owner)
+
+
+def test_post_to_gui_thread_from_a_worker(wait_until):
+    MethodRunner()
+    calls = []
+    thread = threading.Thread(target=lambda: post_to_gui_thread(lambda: calls.append(on_main_thread())))
+    thread.start()
+    thread.join()
+    wait_until(lambda: calls)
+    assert calls == [True]
+
+
+def test_window_runs_process_image_methods_in_a_worker(wait_until, monkeypatch, tmp_path):
+    shown = []
+    monkeypatch.setattr(cv2, "imshow", lambda title, image: shown.append((title, on_main_thread())))
+    monkeypatch.setattr(cv2, "waitKey", lambda delay: -1)
+    image_path = str(tmp_path / "image.png")
+    cv2.imwrite(image_path, np.zeros((16, 16, 3), np.uint8))
+    instance = ProcessImage(image_path, show=True)
+    shown.clear()
+
+    threads = []
+    rotate = example_class.rotate
+    monkeypatch.setattr(example_class, "rotate", lambda image, angle: threads.append(on_main_thread())
+                        or rotate(image, angle))
+    window = DynamicConfigWindow(instance, execute_method=True, exec_dialog=False)
+    window.methods_combo_box.setCurrentText("rotate_image")
+    window.run_method()
+    wait_until(lambda: shown)
+    assert threads == [False] and shown[0][1] is True
+    window.accept()
+
+
+def test_window_serializes_runs_and_defers_edits(wait_until):
+    class Slow:
+        value: int = 0
+
+        def __init__(self):
+            self.value = 0
+            self.release = threading.Event()
+            self.seen = None
+
+        def work(self):
+            self.release.wait(5)
+            self.seen = self.value
+
+    instance = Slow()
+    window = DynamicConfigWindow(instance, execute_method=True, exec_dialog=False)
+    window.methods_combo_box.setCurrentText("work")
+    window.run_method()
+    window.change_tracker.stage("value", 7)
+    window.change_tracker.commit()
+    assert instance.value == 0
+    window.run_method()
+    assert window.method_runner.in_flight() == 1 and "not started" in window.run_status_label.text()
+
+    instance.release.set()
+    wait_until(lambda: not window.runs_in_flight() and instance.value == 7)
+    assert instance.seen == 0
+    window.accept()
@@ -0,0 +1,52 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import numpy as np
+import pytest
+
+import ndarray_viewer
+from ndarray_viewer import NDArrayViewer, level_count, value_range
+
+
+@pytest.fixture
+def viewer(qapp):
+    viewer = NDArrayViewer()
+    viewer.resize(200, 150)
+    return viewer
+
+
+def test_pyramid_and_range_are_computed_once_off_the_paint_path(viewer, monkeypatch):
+    array = np.linspace(-5, 5, 1024 * 600, dtype=np.float32).reshape(600, 1024)
+    array[300, 5] = np.nan
+    viewer.set_array(array)
+    assert viewer.wait_ready(5)
+    assert len(viewer.levels) == level_count(array) == 2
+    assert viewer._value_range == (-5.0, 5.0)
+
+    # Les dessins suivants ne recalculent ni les niveaux ni la plage de valeurs
+    monkeypatch.setattr(ndarray_viewer, "downsample", lambda image: pytest.fail("pyramid rebuilt while painting"))
+    monkeypatch.setattr(ndarray_viewer, "value_range", lambda array: pytest.fail("range computed while painting"))
+    viewer.grab()
+    viewer.zoom /= 4
+    viewer.grab()
+
+
+def test_result_of_a_replaced_array_is_ignored(viewer):
+    first = np.zeros((2048, 2048), dtype=np.uint16)
+    second = np.full((300, 300), 7, dtype=np.int32)
+    viewer.set_array(first)
+    viewer.set_array(second)
+    assert viewer.wait_ready(5)
+    assert viewer.array is second and viewer.levels[0] is second
+    assert viewer._value_range == value_range(second) == (7.0, 8.0)
+
+
+def test_uint8_image_is_drawn_before_its_pyramid_is_ready(viewer):
+    image = np.full((1024, 1024, 3), 200, dtype=np.uint8)
+    viewer.set_array(image)
+    # Le dessin utilise le niveau le plus fin disponible en attendant la pyramide
+    assert viewer.grab().toImage().pixelColor(100, 75).red() == 200
+    assert viewer.wait_ready(5)
+    assert len(viewer.levels) == 3
+    assert viewer.grab().toImage().pixelColor(100, 75).red() == 200
@@ -0,0 +1,77 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from PyQt6.QtCore import QModelIndex
+
+from attribute_model import AttributeItemModel, VALUE_COLUMN
+from class_schema import assign_path, get_schema, own_attribute
+from Class_GUI_maker import DynamicConfigWindow
+from instance_group import InstanceGroup
+
+
+class Lens:
+    focal: float = 50.0
+
+
+class Optics:
+    zoom: float = 1.0
+    lens: Lens = Lens()
+
+
+class Camera:
+    name: str = "camera"
+    optics: Optics = Optics()  # objet partagé par défaut, comme ProcessImage.config
+
+
+def test_assign_path_copies_the_shared_defaults():
+    camera = Camera()
+    assign_path(camera, "optics.lens.focal", 85.0)
+    assert camera.optics.lens.focal == 85.0
+    assert Camera.optics.lens.focal == 50.0 and Optics.lens.focal == 50.0
+    assert Camera().optics is Camera.optics
+
+
+def test_own_attribute_copies_nested_objects_owned_by_the_default():
+    Camera.optics.lens = Lens()  # dans le __dict__ de l'objet partagé
+    try:
+        camera = Camera()
+        optics = own_attribute(camera, "optics")
+        assert optics is not Camera.optics and optics.lens is not Camera.optics.lens
+        assert own_attribute(camera, "optics") is optics  # déjà propre à l'instance
+
+        group = InstanceGroup([Camera(), Camera()], workers=1)
+        own_attribute(group, "optics")
+        assert len({id(camera.optics) for camera in group} | {id(Camera.optics)}) == 3
+    finally:
+        del Camera.optics.lens
+
+
+def test_inline_section_edits_leave_the_class_default_unchanged(qapp):
+    camera = Camera()
+    window = DynamicConfigWindow(camera, execute_method=False, virtualized=False, exec_dialog=False)
+    window.attribute_editors["optics"].expand()
+    window.attribute_editors["optics.lens"].expand()
+    window.attribute_editors["optics.zoom"].widget.setValue(3.0)
+    window.attribute_editors["optics.lens.focal"].widget.setValue(35.0)
+    window.commit_changes()
+
+    assert camera.optics.zoom == 3.0 and camera.optics.lens.focal == 35.0
+    assert Camera.optics.zoom == 1.0 and Optics.lens.focal == 50.0
+    window.reject()
+    assert camera.optics is Camera.optics
+
+
+def test_tree_model_edits_leave_the_class_default_unchanged(qapp):
+    camera = Camera()
+    model = AttributeItemModel(camera, get_schema(camera))
+    optics_index = model.index(1, 0, QModelIndex())
+    model.fetchMore(optics_index)
+    assert model.setData(model.index(0, VALUE_COLUMN, optics_index), 2.0)
+
+    lens_index = model.index(1, 0, optics_index)
+    model.fetchMore(lens_index)
+    assert model.setData(model.index(0, VALUE_COLUMN, lens_index), 24.0)
+
+    assert camera.optics.zoom == 2.0 and camera.optics.lens.focal == 24.0
+    assert Camera.optics.zoom == 1.0 and Optics.lens.focal == 50.0
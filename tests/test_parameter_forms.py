@@ -0,0 +1,78 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from class_schema import get_class_schema
+from field_editors import editor_for
+from parameter_forms import ParameterForms
+from sequence_editor import SequenceEditor
+
+
+class Measures:
+    counts: list[int] = None
+
+    def fill(self, values: list[int], scales: tuple[float, ...] = (1.0, 2.5)):
+        self.counts = [value * 2 for value in values]
+
+
+def test_generic_alias_gets_the_editor_of_its_origin(qapp):
+    # Sans valeur d'abord : l'éditeur trouvé ensuite ne dépend pas de l'ordre des appels
+    assert editor_for(list[int]) is SequenceEditor
+    assert editor_for(list[int], [1, 2]) is SequenceEditor
+    assert editor_for(tuple[float, ...]) is SequenceEditor
+
+
+def test_list_int_parameter_form(qapp):
+    forms = ParameterForms(get_class_schema(Measures))
+    form = forms.show_method("fill")
+    assert set(form.editors) == {"values", "scales"}
+
+    values = form.editors["values"]
+    assert isinstance(values, SequenceEditor)
+    assert values.widget.model.python_type is int
+    values.set([3, 4])
+    assert values.get() == [3, 4]
+    assert form.values() == {"values": [3, 4], "scales": (1.0, 2.5)}
+
+    instance = Measures()
+    instance.fill(**form.values())
+    assert instance.counts == [6, 8]
+
+
+class Tool:
+    def blur(self, radius: int = 3, sigma: float = 1.0):
+        pass
+
+    def sharpen(self, amount: int, sigma: float = 0.5):
+        pass
+
+    def crop(self, width: int = 10):
+        pass
+
+
+def test_switching_back_keeps_the_form_and_its_values(qapp):
+    forms = ParameterForms(get_class_schema(Tool))
+    blur = forms.show_method("blur")
+    blur.editors["radius"].set(7)
+    forms.show_method("sharpen")
+    assert forms.show_method("blur") is blur  # formulaire gardé, pas reconstruit
+    assert blur.values() == {"radius": 7, "sigma": 1.0}
+    assert forms.show_method("unknown") is None
+
+
+def test_evicted_forms_give_editors_to_the_pool_and_keep_values(qapp):
+    forms = ParameterForms(get_class_schema(Tool), max_forms=1)
+    blur = forms.show_method("blur")
+    blur.editors["radius"].set(7)
+    radius, sigma = blur.editors["radius"], blur.editors["sigma"]
+
+    # Le formulaire de blur est libéré : sharpen reprend ses deux éditeurs
+    sharpen = forms.show_method("sharpen")
+    assert list(forms.forms) == ["sharpen"] and not blur.editors
+    assert sharpen.editors["amount"] is radius and sharpen.editors["sigma"] is sigma
+    assert sharpen.values() == {"amount": 0, "sigma": 0.5}  # sans défaut : valeur vide de l'éditeur
+    assert len(forms.pool) == 0
+
+    sharpen.editors["amount"].set(4)
+    assert forms.show_method("blur").values() == {"radius": 7, "sigma": 1.0}
+    assert forms.show_method("sharpen").values() == {"amount": 4, "sigma": 0.5}
@@ -0,0 +1,88 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import pathlib
+
+import numpy as np
+import pytest
+
+from instance_group import InstanceGroup
+from presets import PresetLibrary, load_preset, mixed_attributes, save_preset
+
+
+class Stage:
+    name: str = ""
+    gain: float = 1.0
+
+
+class Pipeline:
+    label: str = "default"
+    folder: pathlib.Path = None
+    kernel: np.ndarray = None
+    window: tuple = (0, 1)
+    stages: list = None
+    first: Stage = None
+
+
+def make_pipeline():
+    pipeline = Pipeline()
+    pipeline.label = "edited"
+    pipeline.folder = pathlib.Path("data") / "scans"
+    pipeline.kernel = np.arange(12, dtype=np.float32).reshape(3, 4)
+    pipeline.window = (2, 5.5)
+    pipeline.stages = [Stage(), Stage(), 3]
+    pipeline.stages[0].name, pipeline.stages[1].gain = "blur", 2.5
+    pipeline.first = Stage()
+    pipeline.first.name = "crop"
+    return pipeline
+
+
+def test_preset_round_trip(tmp_path):
+    path = str(tmp_path / "pipeline.json")
+    save_preset(make_pipeline(), path)
+    assert (tmp_path / "pipeline.kernel.npy").exists()
+
+    loaded = Pipeline()
+    load_preset(loaded, path)
+    assert loaded.label == "edited"
+    assert loaded.folder == pathlib.Path("data") / "scans"
+    assert loaded.kernel.dtype == np.float32 and np.array_equal(loaded.kernel, make_pipeline().kernel)
+    assert loaded.window == (2, 5.5)
+    assert loaded.first.name == "crop"
+
+    # Les objets rangés dans une liste sont recréés avec leur classe
+    first, second, third = loaded.stages
+    assert type(first) is Stage and (first.name, first.gain) == ("blur", 1.0)
+    assert type(second) is Stage and (second.name, second.gain) == ("", 2.5)
+    assert third == 3
+
+
+def test_load_copies_a_shared_nested_default(tmp_path):
+    path = str(tmp_path / "pipeline.json")
+    save_preset(make_pipeline(), path)
+
+    Pipeline.first = Stage()
+    try:
+        loaded = Pipeline()
+        changes = load_preset(loaded, path)
+        assert loaded.first.name == "crop"
+        assert Pipeline.first.name == ""  # la valeur par défaut de la classe n'est pas modifiée
+        assert (loaded, "label", "default", "edited") in changes
+    finally:
+        Pipeline.first = None
+
+
+def test_group_preset_refuses_mixed_values_and_loads_every_instance(tmp_path):
+    group = InstanceGroup([Pipeline(), Pipeline()], workers=1)
+    group.first = Stage()
+    group[1].first.name = "other"
+    assert mixed_attributes(group) == ["first.name"]
+    with pytest.raises(ValueError, match="first.name"):
+        save_preset(group, str(tmp_path / "group.json"))
+
+    library = PresetLibrary(str(tmp_path))
+    library.save("single", make_pipeline())
+    assert library.names() == ["single"]
+    load_preset(group, library.path("single"))
+    assert [instance.first.name for instance in group] == ["crop", "crop"]
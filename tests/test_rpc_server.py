@@ -0,0 +1,135 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from rpc_server import SchemaRPCServer, INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR, \
+    SERVER_ERROR
+
+
+class Settings:
+    gain: float = 1.0
+
+
+class Counter:
+    label: str = "counter"
+    step: int = 1
+    settings: Settings = Settings()
+
+    created = 0
+    barrier = None
+
+    def __init__(self, start: int = 0):
+        Counter.created += 1
+        self.total = start
+
+    def add(self, count: int, twice: bool = False):
+        self.total += count * self.step * (2 if twice else 1)
+        return self.total
+
+    def fail(self):
+        raise RuntimeError("boom")
+
+    def wait(self):
+        # Bloque jusqu'à ce que deux requêtes s'exécutent en même temps
+        Counter.barrier.wait(timeout=5)
+        return threading.current_thread().name
+
+
+def call(method, params=None, request_id=1):
+    request = {"jsonrpc": "2.0", "method": method, "id": request_id}
+    if params is not None:
+        request["params"] = params
+    return request
+
+
+@pytest.fixture
+def server():
+    server = SchemaRPCServer(Counter, {"start": 10}, pool_size=2)
+    yield server
+    server.close()
+
+
+def send(server, *payloads):
+    async def run():
+        await server.start_pool()
+        responses = await asyncio.gather(*(server.handle_payload(json.dumps(payload)) for payload in payloads))
+        return [json.loads(response) if response is not None else None for response in responses]
+
+    return asyncio.run(run())
+
+
+def test_schema_describes_attributes_and_methods(server):
+    (response,) = send(server, call("rpc.schema"))
+    schema = response["result"]
+    assert schema["class"].endswith(":Counter")
+    assert [attribute["name"] for attribute in schema["attributes"]] == ["label", "step", "settings"]
+    add = next(method for method in schema["methods"] if method["name"] == "add")
+    assert add["params"] == [{"name": "count", "type": "int"}, {"name": "twice", "type": "bool", "default": False}]
+
+
+def test_batch_runs_on_one_instance_then_restores_it(server):
+    created = Counter.created
+    batch = [call("rpc.set", {"path": "step", "value": "3"}, 1),
+             call("add", [2], 2),
+             call("add", {"count": 1, "twice": "true"}, 3),
+             call("rpc.set", ["settings.gain", 2.5]),  # notification : pas de réponse
+             call("rpc.get", ["settings.gain"], 4)]
+    batch[3].pop("id")
+    (responses,) = send(server, batch)
+    assert [response["id"] for response in responses] == [1, 2, 3, 4]
+    assert [response["result"] for response in responses] == [None, 16, 22, 2.5]
+    assert Counter.created == created + 2  # instances créées une fois pour le pool
+
+    # Le lot suivant retrouve l'état initial, et la valeur par défaut partagée est intacte
+    (responses,) = send(server, [call("add", [1], 1), call("rpc.get", ["settings.gain"], 2)])
+    assert [response["result"] for response in responses] == [11, 1.0]
+    assert Settings.gain == 1.0
+
+
+@pytest.mark.parametrize("payload, code", [
+    ("{not json", PARSE_ERROR),
+    ([], INVALID_REQUEST),
+    ({"method": "add", "id": 1}, INVALID_REQUEST),
+    (call("missing"), METHOD_NOT_FOUND),
+    (call("add", {"count": "x"}), INVALID_PARAMS),
+    (call("add", {}), INVALID_PARAMS),
+    (call("add", [1, True, 3]), INVALID_PARAMS),
+    (call("rpc.get", ["total.unknown"]), INVALID_PARAMS),
+    (call("fail"), SERVER_ERROR),
+])
+def test_errors_use_json_rpc_codes(server, payload, code):
+    async def run():
+        await server.start_pool()
+        return await server.handle_payload(payload if isinstance(payload, str) else json.dumps(payload))
+
+    response = json.loads(asyncio.run(run()))
+    assert response["error"]["code"] == code
+
+
+def test_connection_runs_requests_in_parallel_in_the_executor(server, tmp_path):
+    Counter.barrier = threading.Barrier(2)
+    path = str(tmp_path / "rpc.sock")
+
+    async def run():
+        ready = asyncio.Event()
+        serving = asyncio.create_task(server.serve(unix_path=path, on_ready=lambda listener: ready.set()))
+        await ready.wait()
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b"".join(json.dumps(call("wait", [], index)).encode() + b"\n" for index in (1, 2)))
+        await writer.drain()
+        lines = [await asyncio.wait_for(reader.readline(), 10) for _ in range(2)]
+        writer.close()
+        serving.cancel()
+        return [json.loads(line) for line in lines]
+
+    responses = asyncio.run(run())
+    assert sorted(response["id"] for response in responses) == [1, 2]
+    # Les deux requêtes ont attendu ensemble la barrière, chacune dans un thread de l'exécuteur
+    assert all(response["result"].startswith("rpc") for response in responses)
+    assert len({response["result"] for response in responses}) == 2
@@ -0,0 +1,51 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import tracemalloc
+
+from call_history_panel import CallHistoryPanel, PEAK_COLUMN
+from run_profiling import RunProfiler
+
+
+def test_profile_measures_a_run():
+    with RunProfiler("allocate", cprofile=True) as profile:
+        data = bytearray(4 * 1024 * 1024)
+    del data
+    assert profile.status == "ok" and profile.wall_time >= 0
+    assert profile.peak_memory >= 4 * 1024 * 1024
+    assert not profile.peak_overlapped
+    assert not tracemalloc.is_tracing()  # arrêté par la dernière exécution mesurée
+
+
+def test_overlapping_runs_mark_their_peak():
+    first = RunProfiler("first")
+    with first:
+        with RunProfiler("second") as second:
+            pass
+    assert first.profile.peak_overlapped and second.peak_overlapped
+    assert first.profile.to_dict()["peak_overlapped"]
+
+    with RunProfiler("alone") as alone:
+        pass
+    assert not alone.peak_overlapped
+
+
+def test_export_errors_are_reported(qapp, tmp_path, monkeypatch):
+    import call_history_panel
+
+    with RunProfiler("first", cprofile=True) as profile:
+        with RunProfiler("second"):
+            pass
+    panel = CallHistoryPanel()
+    panel.add_profile(1, profile)
+    assert panel.table.item(0, PEAK_COLUMN).text().startswith("~")
+
+    warnings = []
+    missing = str(tmp_path / "missing" / "runs.json")
+    monkeypatch.setattr(call_history_panel.QFileDialog, "getSaveFileName", lambda *args: (missing, ""))
+    monkeypatch.setattr(call_history_panel.QMessageBox, "warning", lambda *args: warnings.append(args[1]))
+    panel.export_json()
+    panel.table.selectRow(0)
+    panel.export_pstats()
+    assert warnings == ["Export runs", "Export pstats"]
@@ -0,0 +1,74 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PyQt6.QtCore import Qt
+
+from ndarray_editor import NDArrayEditor, MAX_TABLE_COLUMNS
+from sequence_editor import SequenceEditor, parse_block
+
+
+@pytest.mark.parametrize("text, dtype, message", [
+    ("1\t2\n3\n", np.int64, "line 2 has 1 values instead of 2"),
+    ("1 2\nx 4\n", np.int64, "invalid int64 value 'x'"),
+    ("300\n", np.uint8, "invalid uint8 value '300'"),
+    ("\n  \n", np.float64, "no value to paste"),
+])
+def test_parse_block_reports_the_first_error(text, dtype, message):
+    with pytest.raises(ValueError, match=message):
+        parse_block(text, dtype)
+
+
+def test_parse_block_accepts_spreadsheet_and_text_separators():
+    assert parse_block("1,2;3\n4 5\t6\n", np.float64).tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert parse_block("a b\tc\n", np.dtype(str)).tolist() == [["a b", "c"]]
+    assert parse_block("True\nno\n", np.bool_).tolist() == [[True], [False]]
+
+
+def test_get_hands_out_values_that_later_edits_leave_unchanged(qapp):
+    editor = SequenceEditor("values", list[int], None)
+    original = [1, 2, 3]
+    editor.set(original)
+    model = editor.widget.model
+    assert model.setData(model.index(0, 0), "10")
+    first = editor.get()
+    assert first == [10, 2, 3] and original == [1, 2, 3]
+
+    assert model.setData(model.index(1, 0), "20")
+    assert first == [10, 2, 3] and editor.get() == [10, 20, 3]
+    assert editor.get() is editor.get()  # pas de copie sans nouvelle écriture
+
+
+def test_elements_of_other_types_are_read_only(qapp):
+    editor = SequenceEditor("paths", list, None)
+    paths = [Path("a.png"), Path("b.png")]
+    editor.set(paths)
+    model = editor.widget.model
+    assert not model.flags(model.index(0, 0)) & Qt.ItemFlag.ItemIsEditable
+    assert not model.setData(model.index(0, 0), "c.png")
+    assert editor.get() == paths and all(isinstance(path, Path) for path in editor.get())
+
+    editor.set(["a", "b"])
+    assert model.setData(model.index(1, 0), "c") and editor.get() == ["a", "c"]
+
+
+def test_array_table_is_limited_to_narrow_arrays(qapp):
+    editor = NDArrayEditor("array", np.ndarray, None)
+    table = np.arange(12.0).reshape(4, 3)
+    editor.set(table)
+    assert editor.tabs.isTabVisible(1)
+    model = editor.table.model
+    assert model.setData(model.index(1, 2), "-1")
+    result = editor.get()
+    assert result[1, 2] == -1 and table[1, 2] == 5
+    assert model.setData(model.index(0, 0), "7")
+    assert result[0, 0] == 0 and editor.get()[0, 0] == 7
+
+    image = np.zeros((64, MAX_TABLE_COLUMNS + 1), dtype=np.uint8)
+    editor.set(image)
+    assert not editor.tabs.isTabVisible(1) and editor.tabs.isTabVisible(0)
+    assert editor.get() is image
@@ -0,0 +1,112 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import numpy as np
+
+from instance_group import InstanceGroup
+from snapshot import History, take_snapshot
+
+
+class Filter:
+    size: int = 3
+    weights: list = None
+
+
+class Settings:
+    name: str = "default"
+    image: np.ndarray = None
+    filter: Filter = None
+
+
+class Link:
+    name: str = ""
+
+
+# Annotation de la classe elle-même : les objets peuvent former un cycle
+Link.__annotations__["peer"] = Link
+
+
+def make_settings():
+    settings = Settings()
+    settings.image = np.zeros((4, 4))
+    settings.filter = Filter()
+    settings.filter.weights = [1, 2]
+    return settings
+
+
+def test_snapshot_restores_nested_objects_and_containers():
+    settings = make_settings()
+    image, nested = settings.image, settings.filter
+    snapshot = take_snapshot(settings)
+    # Les tableaux sont partagés par référence, pas copiés
+    assert snapshot.values["image"] is image
+
+    settings.name = "edited"
+    settings.image = np.ones((4, 4))
+    settings.filter.size = 7
+    settings.filter.weights.append(3)
+    assert sorted(snapshot.changed_attributes()) == ["filter.size", "filter.weights", "image", "name"]
+
+    snapshot.restore()
+    assert settings.name == "default"
+    assert settings.image is image
+    assert settings.filter is nested and nested.size == 3 and nested.weights == [1, 2]
+    assert snapshot.changed_attributes() == []
+
+    # L'instantané reste réutilisable après une restauration
+    settings.filter.weights.append(4)
+    snapshot.restore()
+    assert settings.filter.weights == [1, 2]
+
+
+def test_snapshot_of_a_cyclic_graph():
+    first, second = Link(), Link()
+    first.peer, second.peer = second, first
+    snapshot = take_snapshot(first)
+    assert snapshot.values["peer"].values["peer"] is snapshot
+
+    second.name = "edited"
+    assert snapshot.changed_attributes() == ["peer.name"]
+    snapshot.restore()
+    assert second.name == "" and first.peer is second
+
+
+def test_group_snapshot_restores_each_instance():
+    group = InstanceGroup([make_settings(), make_settings()], workers=1)
+    group[1].name = "second"
+    snapshot = take_snapshot(group)
+
+    group.name = "both"
+    assert snapshot.changed_attributes() == ["name"]
+    snapshot.restore()
+    assert [instance.name for instance in group] == ["default", "second"]
+
+
+def test_history_undo_redo_and_truncate():
+    settings = make_settings()
+    history = History(max_depth=2)
+    for value in ("a", "b", "c"):
+        old, settings.name = settings.name, value
+        history.record(settings, {"name": (old, value)})
+    # Seules les max_depth dernières modifications sont conservées
+    assert len(history.undo_stack) == 2
+
+    history.undo()
+    history.undo()
+    assert settings.name == "a" and not history.can_undo()
+    assert history.undo() is None
+    history.redo()
+    assert settings.name == "b" and history.can_redo()
+
+    # Une nouvelle modification efface les rétablissements possibles
+    history.record(settings, {"name": ("b", "d")})
+    assert not history.can_redo()
+
+    # Une modification sans changement de valeur n'est pas enregistrée
+    mark = history.mark()
+    history.record(settings, {"name": ("d", "d")})
+    assert history.mark() == mark
+    history.record(settings, {"name": ("d", "e")})
+    history.truncate(mark)
+    assert history.mark() == mark and not history.can_redo()
@@ -0,0 +1,77 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import csv
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import stream_batch
+from stream_batch import list_inputs, stream_images
+
+
+def write_images(directory, names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for value, name in enumerate(names):
+        cv2.imwrite(str(directory / name), np.full((8, 8, 3), value * 10, dtype=np.uint8))
+
+
+def test_rows_follow_the_inputs_and_report_errors(tmp_path):
+    write_images(tmp_path / "in", ["a.png", "b.png", "c.png", "a.jpg"])
+    (tmp_path / "in" / "broken.png").write_bytes(b"not an image")
+    paths = list_inputs([str(tmp_path / "in")])
+    assert [os.path.basename(path) for path in paths] == ["a.jpg", "a.png", "b.png", "broken.png", "c.png"]
+
+    def process(image):
+        if image[0, 0, 0] == 20:  # c.png
+            raise ValueError("rejected")
+        return 255 - image
+
+    rows = stream_images(paths, process, str(tmp_path / "out"), readers=2, writers=2, read_ahead=2, write_queue=1)
+    assert [row["input"] for row in rows] == paths
+    assert [row["status"] for row in rows] == ["ok", "ok", "ok", "error", "error"]
+    assert "cannot read" in rows[3]["error"] and "rejected" in rows[4]["error"]
+
+    # a.jpg et a.png donnent le même nom de sortie : le second est numéroté
+    outputs = [row["output"] for row in rows[:3]]
+    assert len(set(outputs)) == 3
+    assert sorted(os.listdir(tmp_path / "out")) == sorted(os.path.basename(output) for output in outputs)
+    assert cv2.imread(rows[2]["output"])[0, 0, 0] == 255 - 10  # b.png
+
+
+def test_read_ahead_is_bounded(tmp_path, monkeypatch):
+    write_images(tmp_path, [f"{index}.png" for index in range(12)])
+    lock = threading.Lock()
+    counts = {"started": 0, "processed": 0, "ahead": 0}
+    read_image = stream_batch.read_image
+
+    def counting_read(path):
+        with lock:
+            counts["started"] += 1
+            counts["ahead"] = max(counts["ahead"], counts["started"] - counts["processed"])
+        return read_image(path)
+
+    def process(image):
+        with lock:
+            counts["processed"] += 1
+        return image
+
+    monkeypatch.setattr(stream_batch, "read_image", counting_read)
+    rows = stream_images(list_inputs([str(tmp_path)]), process, str(tmp_path / "out"), readers=4, read_ahead=3)
+    assert [row["status"] for row in rows] == ["ok"] * 12
+    assert counts["ahead"] <= 3
+
+
+def test_command_line_applies_the_config(tmp_path, capsys):
+    write_images(tmp_path / "in", ["a.png", "b.png"])
+    report = tmp_path / "report.csv"
+    stream_batch.main([str(tmp_path / "in" / "*.png"), "--output-dir", str(tmp_path / "out"),
+                       "--set", "brightness=7", "--report", str(report)])
+    with open(report) as file:
+        rows = list(csv.DictReader(file))
+    assert [row["status"] for row in rows] == ["ok", "ok"]
+    assert cv2.imread(rows[1]["output"])[4, 4, 0] == 10 + 7
+    assert "2 tasks (0 errors)" in capsys.readouterr().err
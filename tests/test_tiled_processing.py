@@ -0,0 +1,39 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import os
+
+import numpy as np
+import pytest
+
+from image_pipeline import ImagePipeline
+from tiled_processing import process_file
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (300, 200, 3), dtype=np.uint8)
+
+
+def run_tiled(image, tmp_path, pipeline):
+    input_path, output_path = str(tmp_path / "input.npy"), str(tmp_path / "output.npy")
+    np.save(input_path, image)
+    process_file(input_path, output_path, pipeline, tile_size=64, workers=2)
+    return np.load(output_path)
+
+
+def test_point_operations_match_exactly(image, tmp_path):
+    pipeline = ImagePipeline().brightness(12).contrast(1.4)
+    assert np.array_equal(run_tiled(image, tmp_path, pipeline), pipeline.run(image))
+
+
+@pytest.mark.parametrize("pipeline", [ImagePipeline().brightness(5).rotate(30).contrast(0.9),
+                                      ImagePipeline().rotate(30).brightness(3).rotate(-12)])
+def test_tiled_rotation_within_one_grey_level(image, tmp_path, pipeline):
+    result = run_tiled(image, tmp_path, pipeline)
+    expected = pipeline.run(image)
+    assert result.dtype == expected.dtype
+    assert np.abs(result.astype(np.int16) - expected).max() <= 1
+    # Les fichiers intermédiaires entre deux rotations sont supprimés
+    assert sorted(os.listdir(tmp_path)) == ["input.npy", "output.npy"]
@@ -0,0 +1,171 @@
+# Copyright CEA Grenoble 2023
+# Auteur : Yoann CURE
+# MIT Licence
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import numpy as np
+
+from batch_runner import parse_assignments
+from example_class import config_pipeline
+from stream_batch import build_config
+
+# Côté des tuiles de sortie
+TILE_SIZE = 1024
+# Pixels source ajoutés autour de la zone lue pour une tuile de sortie (voisins de l'interpolation bilinéaire)
+WARP_HALO = 2
+
+
+def split_segments(stages):
+    # Une passe par rotation : les opérations ponctuelles qui la précèdent sont appliquées à la zone source lue,
+    # celles qui la suivent à la tuile de sortie
+    segments = [[]]
+    for stage in stages:
+        if stage[0] == "warp" and any(kind == "warp" for kind, *_ in segments[-1]):
+            segments.append([])
+        segments[-1].append(stage)
+    return segments
+
+
+def output_dtype(stages, dtype):
+    return np.dtype(np.uint8) if any(kind in ("lut", "scale") for kind, *_ in stages) else np.dtype(dtype)
+
+
+def apply_points(image, stages):
+    for kind, value, *_ in stages:
+        image = cv2.LUT(image, value) if kind == "lut" else value.apply(image)
+    return image
+
+
+def tiles(shape, tile_size):
+    height, width = shape[:2]
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield y, x, min(y + tile_size, height), min(x + tile_size, width)
+
+
+def source_box(inverse, box, shape, halo=WARP_HALO):
+    # Rectangle source dont dépendent les pixels de la tuile de sortie, ou None s'il est hors de l'image
+    y0, x0, y1, x1 = box
+    corners = np.array([[x0, y0, 1], [x1, y0, 1], [x0, y1, 1], [x1, y1, 1]], dtype=np.float64)
+    points = corners @ inverse.T
+    height, width = shape[:2]
+    sx0 = max(0, int(np.floor(points[:, 0].min())) - halo)
+    sy0 = max(0, int(np.floor(points[:, 1].min())) - halo)
+    sx1 = min(width, int(np.ceil(points[:, 0].max())) + halo + 1)
+    sy1 = min(height, int(np.ceil(points[:, 1].max())) + halo + 1)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return None
+    return sy0, sx0, sy1, sx1
+
+
+def process_tile(source, output, segment, box):
+    y0, x0, y1, x1 = box
+    warp_index = next((index for index, (kind, *_) in enumerate(segment) if kind == "warp"), None)
+    if warp_index is None:
+        output[y0:y1, x0:x1] = apply_points(np.asarray(source[y0:y1, x0:x1]), segment)
+        return
+
+    before, (_, matrix, *_), after = segment[:warp_index], segment[warp_index], segment[warp_index + 1:]
+    tile_shape = (y1 - y0, x1 - x0) + source.shape[2:]
+    inverse = cv2.invertAffineTransform(matrix)
+    region_box = source_box(inverse, box, source.shape)
+    if region_box is None:
+        # Tuile entièrement hors de l'image source : valeur de bord, puis opérations suivantes
+        tile = np.zeros(tile_shape, output_dtype(before, source.dtype))
+    else:
+        sy0, sx0, sy1, sx1 = region_box
+        region = apply_points(np.ascontiguousarray(source[sy0:sy1, sx0:sx1]), before)
+        # Matrice de la tuile : coordonnées relatives à la zone source et à la tuile de sortie
+        tile_matrix = matrix.copy()
+        tile_matrix[:, 2] += matrix[:, :2] @ [sx0, sy0]
+        tile_matrix[:, 2] -= [x0, y0]
+        tile = cv2.warpAffine(region, tile_matrix, (x1 - x0, y1 - y0), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    output[y0:y1, x0:x1] = apply_points(tile, after)
+
+
+def process_array(source, output, segment, tile_size=TILE_SIZE, workers=None, on_progress=None):
+    """Apply one segment (at most one warp) to `source` tile by tile, writing into `output` (arrays or memmaps).
+
+    Tiles are processed by `workers` threads with at most 2 * workers tiles in flight, so memory use depends on the
+    tile size and not on the image size.
+    """
+    workers = workers or os.cpu_count()
+    boxes = list(tiles(source.shape, tile_size))
+    box_iter = iter(boxes)
+    done_count = 0
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for box in itertools.islice(box_iter, 2 * workers - len(pending)):
+                pending.add(executor.submit(process_tile, source, output, segment, box))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+                done_count += 1
+                if on_progress is not None:
+                    on_progress(done_count, len(boxes))
+
+
+def process_file(input_path, output_path, pipeline, tile_size=TILE_SIZE, workers=None, on_progress=None):
+    """Apply an ImagePipeline to a .npy image too large for memory, writing the result to a .npy file.
+
+    The input is memory-mapped read-only and the output created with numpy.lib.format.open_memmap, so only the
+    tiles being processed are held in memory. A chain with several rotations writes a temporary .npy file between
+    them. Point operations give the same result as ImagePipeline.run; each rotation may differ by one grey level
+    on some pixels, because each tile is warped with its own translated matrix.
+    """
+    source = np.load(input_path, mmap_mode="r")
+    segments = split_segments(pipeline.stages(source))
+    if not segments[0]:
+        segments = [[]]  # chaîne identité : simple copie tuile par tuile
+
+    temporary = []
+    try:
+        for index, segment in enumerate(segments):
+            last = index == len(segments) - 1
+            path = output_path if last else f"{output_path}.part{index}.npy"
+            if not last:
+                temporary.append(path)
+            output = np.lib.format.open_memmap(path, mode="w+", dtype=output_dtype(segment, source.dtype),
+                                               shape=source.shape)
+            process_array(source, output, segment, tile_size, workers, on_progress)
+            output.flush()
+            del output
+            source = np.load(path, mmap_mode="r")
+    finally:
+        for path in temporary:
+            if os.path.exists(path):
+                os.remove(path)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a Config tile by tile to a .npy image larger than memory.")
+    parser.add_argument("input", help=".npy image (height x width [x channels])")
+    parser.add_argument("output", help=".npy file for the result")
+    parser.add_argument("--preset", help="Config preset saved from the window")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Config attribute, e.g. angle=90 (applied after --preset)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = build_config(args.preset, {name: values[0] for name, values in parse_assignments(args.set).items()})
+    start = time.perf_counter()
+    process_file(args.input, args.output, config_pipeline(config), args.tile_size, args.workers,
+                 on_progress=lambda done, total: print(f"\r{done}/{total} tiles", end="", file=sys.stderr))
+    print(f"\n{args.output} written in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()